@@ -0,0 +1,173 @@
+"""
+Resized and WebP derivatives of uploaded images.
+
+For every preset an image is shrunk to fit the preset box (aspect ratio
+kept) and saved twice next to the original: as WebP and in the original
+format as a fallback, e.g. ``course_images/cover__card.webp`` and
+``course_images/cover__card.jpg``. Generation runs in a small thread pool
+after the saving transaction commits, so uploads never wait for Pillow;
+until the variants exist, variant_urls() points at the original file.
+
+Whether an image's variants exist is kept in the shared cache, so
+serializing a page of rows does not ask the storage backend once per row.
+generate_variants() marks an image ready once its files are written;
+readers only fill in a missing entry (cache.add), so a check that raced
+with generation cannot hide finished variants.
+
+Settings:
+    IMAGE_VARIANT_WORKERS = 2      # thread pool size
+    IMAGE_VARIANTS_ASYNC = True    # False generates inline (tests, scripts)
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+PRESETS = {
+    'thumb': (160, 160),
+    'card': (480, 270),
+    'large': (1280, 720),
+}
+# (model label, field) -> presets generated for that field
+FIELD_PRESETS = {
+    ('Course.Course', 'image'): ('thumb', 'card', 'large'),
+    ('Course.Category', 'icon'): ('thumb',),
+    ('CustomerUser.CustomerUser', 'avatar'): ('thumb',),
+}
+WEBP_QUALITY = 80
+READY_KEY = 'image-variants:{name}'
+READY_TIMEOUT = 60 * 60 * 24
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def presets_for(instance, field_name):
+    return FIELD_PRESETS.get((instance._meta.label, field_name), ())
+
+
+def variant_name(name, preset, extension):
+    stem = os.path.splitext(name)[0]
+    return f'{stem}__{preset}.{extension}'
+
+
+def fallback_extension(name):
+    extension = os.path.splitext(name)[1].lower().lstrip('.')
+    return 'png' if extension in ('png', 'gif') else 'jpg'
+
+
+def mark_ready(name):
+    cache.set(READY_KEY.format(name=name), True, timeout=READY_TIMEOUT)
+
+
+def has_variants(field_file, presets):
+    key = READY_KEY.format(name=field_file.name)
+    ready = cache.get(key)
+    if ready is None:
+        # Oxirgi yoziladigan fayl - barcha variantlar tayyorligining belgisi
+        ready = field_file.storage.exists(variant_name(field_file.name, presets[-1], 'webp'))
+        cache.add(key, ready, timeout=READY_TIMEOUT)
+    return ready
+
+
+def encode(image, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(storage, name, presets, force=False):
+    """Write the derivatives of one stored image; returns the names written."""
+    if not force and storage.exists(variant_name(name, presets[-1], 'webp')):
+        mark_ready(name)
+        return []
+    try:
+        with storage.open(name, 'rb') as source:
+            original = ImageOps.exif_transpose(Image.open(source))
+            original.load()
+    except (OSError, UnidentifiedImageError) as e:
+        logger.error(f"Image variants skipped for {name}: {str(e)}")
+        return []
+
+    fallback = fallback_extension(name)
+    fallback_format = 'PNG' if fallback == 'png' else 'JPEG'
+    written = []
+    for preset in presets:
+        image = original.copy()
+        image.thumbnail(PRESETS[preset], Image.Resampling.LANCZOS)
+        if fallback_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            flat = image.convert('RGB')
+        else:
+            flat = image
+        outputs = [
+            (fallback, encode(flat, fallback_format, optimize=True,
+                              **({'quality': 85, 'progressive': True} if fallback_format == 'JPEG' else {}))),
+            ('webp', encode(image if image.mode in ('RGB', 'RGBA') else image.convert('RGBA'),
+                            'WEBP', quality=WEBP_QUALITY, method=4)),
+        ]
+        for extension, data in outputs:
+            target = variant_name(name, preset, extension)
+            if storage.exists(target):
+                storage.delete(target)
+            written.append(storage.save(target, ContentFile(data)))
+    mark_ready(name)
+    return written
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2), thread_name_prefix='image-variants'
+            )
+        return _executor
+
+
+def _run(storage, name, presets):
+    try:
+        generate_variants(storage, name, presets)
+    except Exception as e:
+        logger.error(f"Image variant generation failed for {name}: {str(e)}")
+
+
+def schedule(instance, field_name):
+    """Generate the variants of instance.<field_name> once the transaction commits."""
+    field_file = getattr(instance, field_name)
+    presets = presets_for(instance, field_name)
+    if not field_file or not presets or has_variants(field_file, presets):
+        return
+    storage, name = field_file.storage, field_file.name
+    if getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(_run, storage, name, presets))
+    else:
+        transaction.on_commit(lambda: _run(storage, name, presets))
+
+
+def variant_urls(field_file, presets, request=None):
+    """{preset: {'webp': url, '<fallback>': url}}; the original URL until variants exist."""
+    if not field_file or not presets:
+        return None
+    build = request.build_absolute_uri if request is not None else (lambda url: url)
+    ready = has_variants(field_file, presets)
+    fallback = fallback_extension(field_file.name)
+    urls = {}
+    for preset in presets:
+        if ready:
+            urls[preset] = {
+                extension: build(field_file.storage.url(variant_name(field_file.name, preset, extension)))
+                for extension in ('webp', fallback)
+            }
+        else:
+            original = build(field_file.url)
+            urls[preset] = {'webp': original, fallback: original}
+    return urls
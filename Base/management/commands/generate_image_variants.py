@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from Base.images import FIELD_PRESETS, generate_variants
+
+
+class Command(BaseCommand):
+    help = "Generate resized and WebP variants for existing course images, category icons and avatars"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate variants that already exist")
+        parser.add_argument('--workers', type=int, default=4, help="Images processed in parallel")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Rows read per batch")
+
+    def handle(self, *args, **options):
+        force, chunk_size = options['force'], options['chunk_size']
+        total = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for (label, field_name), presets in FIELD_PRESETS.items():
+                model = apps.get_model(label)
+                queryset = (
+                    model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                    .order_by('pk').values_list('pk', field_name)
+                )
+                storage = model._meta.get_field(field_name).storage
+                last_pk, generated = None, 0
+                while True:
+                    chunk = list((queryset.filter(pk__gt=last_pk) if last_pk else queryset)[:chunk_size])
+                    if not chunk:
+                        break
+                    last_pk = chunk[-1][0]
+                    results = executor.map(lambda name: generate_variants(storage, name, presets, force),
+                                           [name for _, name in chunk])
+                    generated += sum(1 for files in results if files)
+                self.stdout.write(f"{label}.{field_name}: {generated}")
+                total += generated
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {total} images"))
@@ -0,0 +1,129 @@
+"""
+Serving of uploaded files with HTTP caching and byte ranges.
+
+serve_file() answers conditional requests (If-None-Match, If-Modified-Since,
+If-Match, If-Unmodified-Since) from the file's mtime and size, honours a
+single ``Range: bytes=`` range (and If-Range) with 206/416, and otherwise
+streams through FileResponse so servers with wsgi.file_wrapper can use
+sendfile. With MEDIA_ACCEL_REDIRECT_PREFIX set (e.g. '/protected-media/'),
+the response only carries an X-Accel-Redirect header and nginx sends the
+file itself, ranges included.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFileWrapper:
+    """File-like view of ``length`` bytes of a file, starting at ``start``."""
+
+    def __init__(self, filelike, start, length):
+        self.filelike = filelike
+        self.filelike.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.filelike.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        # sendfile uchun: fayl joriy pozitsiyadan Content-Length bayt yuboriladi
+        return self.filelike.fileno()
+
+    def close(self):
+        self.filelike.close()
+
+
+def file_etag(stat):
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive, None for no/ignored range, or False if unsatisfiable."""
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match:
+        # Bir nechta diapazon yoki noma'lum birlik - butun fayl yuboriladi
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if not length or not size:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        # Yaroqsiz diapazon e'tiborga olinmaydi (RFC 9110, 14.2)
+        return None
+    if start >= size:
+        return False
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def if_range_matches(request, etag, mtime):
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"'):
+        return value == etag
+    if value.startswith('W/'):
+        return False
+    return parse_http_date_safe(value) == int(mtime)
+
+
+def serve_file(request, field_file, private=False):
+    if not field_file:
+        raise Http404("Fayl topilmadi")
+    try:
+        path = field_file.path
+        stat = os.stat(path)
+    except (NotImplementedError, FileNotFoundError):
+        raise Http404("Fayl topilmadi")
+
+    etag = file_etag(stat)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', None)
+        if prefix:
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + field_file.name.lstrip('/')
+        else:
+            response = file_response(request, path, stat.st_size, content_type, etag, stat.st_mtime)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    patch_cache_control(response, **({'private': True, 'no_cache': True} if private
+                                     else {'public': True, 'max_age': 86400}))
+    return response
+
+
+def file_response(request, path, size, content_type, etag, mtime):
+    byte_range = None
+    if 'Range' in request.headers and if_range_matches(request, etag, mtime):
+        byte_range = parse_range(request.headers['Range'], size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(RangeFileWrapper(open(path, 'rb'), start, length),
+                                status=206, content_type=content_type)
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,117 @@
+"""
+Opt-in keyset (cursor) pagination for APIView based list endpoints.
+
+Rows are ordered by (created_at, id) and a page is fetched with a range
+condition on that pair, so deep pages cost the same as the first one and no
+COUNT(*) query is issued. Pagination only kicks in when the client sends
+``page_size`` or ``cursor``; without them the views keep returning plain lists.
+"""
+import base64
+import uuid
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    max_page_size = 100
+    invalid_cursor_message = "Noto'g'ri kursor"
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE or 10
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def is_descending(self, request):
+        return request.query_params.get(self.ordering_query_param) != 'created_at'
+
+    def encode_cursor(self, instance):
+        raw = f'{instance.created_at.isoformat()}|{instance.pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = base64.urlsafe_b64decode(encoded.encode()).decode().split('|')
+            created_at = parse_datetime(created_at)
+            pk = uuid.UUID(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        descending = self.is_descending(request)
+
+        queryset = queryset.order_by(*(('-created_at', '-id') if descending else ('created_at', 'id')))
+        cursor = self.decode_cursor(request)
+        if cursor:
+            created_at, pk = cursor
+            if descending:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+            else:
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        params = self.request.query_params.copy()
+        params[self.cursor_query_param] = self.encode_cursor(self.page[-1])
+        params[self.page_size_query_param] = self.page_size
+        return self.request.build_absolute_uri(self.request.path) + '?' + params.urlencode()
+
+    def get_paginated_response(self, data):
+        # Sideloaded payloads already carry their own 'results' key
+        payload = dict(data) if isinstance(data, dict) else {'results': data}
+        return Response({'next': self.get_next_link(), **payload})
+
+
+class KeysetPaginationMixin:
+    """
+    GenericAPIView style pagination hooks for plain APIView classes.
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(Serializer(page, many=True).data)
+    """
+    pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = self.pagination_class()
+        return self._paginator
+
+    def paginate_queryset(self, queryset):
+        return self.paginator.paginate_queryset(queryset, self.request, view=self)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
@@ -0,0 +1,174 @@
+"""
+Helpers shared by the app serializers.
+
+plan_queryset() walks a serializer tree and adds the select_related /
+prefetch_related calls the tree needs, so nested serializers stop issuing one
+query per row. Sideloader renders the same tree in a compact form: nested
+objects become ids and every related object is serialized once into an
+``included`` dictionary, one bucket per model. A model that the tree renders
+with more than one serializer class gets one bucket per class
+(``<model>:<SerializerClass>``), so every object in a bucket has the same
+fields whatever order the rows come in.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import ManyRelatedField, PKOnlyObject, RelatedField
+
+COMPACT_PARAM = 'compact'
+
+
+def _loads_related_object(field):
+    """False for relation fields that only render the primary key."""
+    if isinstance(field, ManyRelatedField):
+        return True
+    if isinstance(field, RelatedField):
+        return not field.use_pk_only_optimization()
+    return True
+
+
+def _collect(serializer, model, prefix, many, select, prefetch):
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        current_model, path, in_prefetch = model, prefix, many
+        attrs = field.source_attrs
+        for index, attr in enumerate(attrs):
+            try:
+                model_field = current_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if not model_field.is_relation:
+                break
+            if index == len(attrs) - 1 and not _loads_related_object(field):
+                break
+            path = f'{path}__{attr}' if path else attr
+            in_prefetch = in_prefetch or model_field.many_to_many or model_field.one_to_many
+            (prefetch if in_prefetch else select).add(path)
+            current_model = model_field.related_model
+        else:
+            child = getattr(field, 'child', field)
+            if isinstance(child, serializers.BaseSerializer) and path != prefix:
+                _collect(child, current_model, path, in_prefetch, select, prefetch)
+
+
+def _nested_serializers(serializer, model, found):
+    """Map model name -> nested serializer classes that render it, walking the tree like _collect()."""
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        child = getattr(field, 'child', field)
+        if not isinstance(child, serializers.BaseSerializer):
+            continue
+        current_model = model
+        for attr in field.source_attrs:
+            try:
+                model_field = current_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                break
+            if not model_field.is_relation:
+                break
+            current_model = model_field.related_model
+        else:
+            classes = found.setdefault(current_model._meta.model_name, [])
+            if type(child) not in classes:
+                classes.append(type(child))
+                _nested_serializers(child, current_model, found)
+    return found
+
+
+def plan_queryset(queryset, serializer):
+    """
+    Add the joins and prefetches a serializer (class or instance) needs.
+
+    Forward foreign keys become select_related paths; many-to-many and
+    reverse relations, and everything nested under them, become
+    prefetch_related paths. The number of queries is then constant in the
+    number of rows.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    serializer = getattr(serializer, 'child', serializer)
+    select, prefetch = set(), set()
+    _collect(serializer, queryset.model, '', False, select, prefetch)
+    if select:
+        queryset = queryset.select_related(*sorted(select))
+    if prefetch:
+        queryset = queryset.prefetch_related(*sorted(prefetch))
+    return queryset
+
+
+def wants_compact(request):
+    return request.query_params.get(COMPACT_PARAM, '').lower() in ('1', 'true', 'yes')
+
+
+class Sideloader:
+    """
+    Serialize rows with nested objects replaced by their ids.
+
+    Usage:
+        data = Sideloader().render(AnswerSerializer, queryset)
+        # {'results': [...], 'included': {'question': {...}, 'test': {...}}}
+    """
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.included = {}
+        self.serializer_classes = {}
+        self.bucket_owners = {}
+
+    def render(self, serializer_class, instances):
+        serializer = serializer_class(context=self.context)
+        model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+        if model is not None:
+            self.serializer_classes = _nested_serializers(serializer, model, {})
+        results = [self.represent(serializer, instance) for instance in instances]
+        return {'results': results, 'included': self.included}
+
+    def bucket_name(self, serializer, instance):
+        name = instance._meta.model_name
+        if len(self.serializer_classes.get(name, ())) > 1:
+            return f'{name}:{type(serializer).__name__}'
+        # Daraxtda topilmagan serializer boshqa bo'limga yoziladi
+        owner = self.bucket_owners.setdefault(name, type(serializer))
+        return name if owner is type(serializer) else f'{name}:{type(serializer).__name__}'
+
+    def represent(self, serializer, instance):
+        ret = {}
+        for field in serializer._readable_fields:
+            try:
+                attribute = field.get_attribute(instance)
+            except SkipField:
+                continue
+            check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            if check_for_none is None:
+                ret[field.field_name] = None
+            elif isinstance(field, serializers.ListSerializer):
+                items = attribute.all() if hasattr(attribute, 'all') else attribute
+                ret[field.field_name] = [self.reference(field.child, item) for item in items]
+            elif isinstance(field, serializers.BaseSerializer):
+                ret[field.field_name] = self.reference(field, attribute)
+            else:
+                ret[field.field_name] = field.to_representation(attribute)
+        return ret
+
+    def reference(self, serializer, instance):
+        bucket = self.included.setdefault(self.bucket_name(serializer, instance), {})
+        key = str(instance.pk)
+        if key not in bucket:
+            bucket[key] = None  # guards against reference cycles
+            bucket[key] = self.represent(serializer, instance)
+        return key
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    URLs of the resized/WebP derivatives of an image field (see Base/images.py):
+        avatar_variants = ImageVariantsField(source='avatar')
+    """
+
+    def to_representation(self, value):
+        from Base.images import presets_for, variant_urls
+
+        presets = presets_for(value.instance, value.field.name) if value else ()
+        return variant_urls(value, presets, self.context.get('request'))
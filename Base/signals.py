@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save
+
+from .images import FIELD_PRESETS, schedule
+
+
+def image_saved(sender, instance, **kwargs):
+    for label, field_name in FIELD_PRESETS:
+        if label == instance._meta.label:
+            schedule(instance, field_name)
+
+
+for label in {label for label, _ in FIELD_PRESETS}:
+    post_save.connect(image_saved, sender=label, dispatch_uid=f'image_variants_{label}')
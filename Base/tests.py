@@ -1,3 +1,200 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from Course.models import Category, Course, Lesson, Module
+from Course.serializers import CourseCatalogSerializer, LessonDetailSerializer
+from CustomerUser.models import CustomerUser
+from .images import variant_name
+from .media import parse_range
+
+MEDIA_ROOT = tempfile.mkdtemp()
+VIDEO = bytes(range(256)) * 40
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaServingTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.teacher = CustomerUser.objects.create_user(
+            username='teacher', email='teacher@example.com', password='testpass123', role='teacher'
+        )
+        self.student = CustomerUser.objects.create_user(
+            username='student', email='student@example.com', password='testpass123', role='student'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course', description='Test Description', price=100, category=self.category,
+            instructor=self.teacher, duration=timedelta(hours=2),
+            image=SimpleUploadedFile('cover.png', b'\x89PNG fake image', content_type='image/png'),
+        )
+        module = Module.objects.create(course=self.course, title='Module 1', order=1)
+        self.lesson = Lesson.objects.create(
+            module=module, title='Lesson 1', content='Content', duration=timedelta(minutes=10), order=1,
+            video=SimpleUploadedFile('lesson.mp4', VIDEO, content_type='video/mp4'),
+        )
+        self.url = reverse('media-lesson-video', args=[self.lesson.id])
+        self.client.force_authenticate(user=self.student)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_enrollment_required(self):
+        """Kursga yozilmagan foydalanuvchiga video berilmasligini tekshirish"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.course.enrolled_students.add(self.student)
+        response = self.client.get(self.url, HTTP_ACCEPT='video/*')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.body(response), VIDEO)
+
+    def test_lesson_serializer_links_protected_video(self):
+        """Dars serializeri video fayl o'rniga himoyalangan manzilni qaytarishini tekshirish"""
+        self.assertEqual(LessonDetailSerializer(self.lesson).data['video'], self.url)
+
+    def test_byte_ranges(self):
+        """Range so'rovlari uchun 206 va 416 javoblarini tekshirish"""
+        self.course.enrolled_students.add(self.student)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(VIDEO)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(self.body(response), VIDEO[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(self.body(response), VIDEO[-10:])
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(VIDEO)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(VIDEO)}')
+        # Yaroqsiz diapazon e'tiborga olinmaydi - butun fayl qaytadi
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5-3')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.body(response), VIDEO)
+
+    def test_conditional_requests(self):
+        """ETag, If-None-Match va If-Range sarlavhalarini tekshirish"""
+        self.course.enrolled_students.add(self.student)
+        response = self.client.get(self.url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.body(response)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.body(response)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.body(response)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_accel_redirect(self):
+        """X-Accel-Redirect orqali nginx'ga topshirishni tekshirish"""
+        self.course.enrolled_students.add(self.student)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.lesson.video.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_public_course_image(self):
+        """Kurs rasmi autentifikatsiyasiz berilishini tekshirish"""
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('media-course-image', args=[self.course.id]), HTTP_ACCEPT='image/*')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('public', response['Cache-Control'])
+        self.body(response)
+        response = self.client.get(reverse('media-category-icon', args=[self.category.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_parse_range(self):
+        """Range sarlavhasini tahlil qilishni tekshirish"""
+        self.assertEqual(parse_range('bytes=0-', 100), (0, 99))
+        self.assertEqual(parse_range('bytes=90-200', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-200', 100), (0, 99))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_range('bytes=5-4', 100))
+        self.assertIs(parse_range('bytes=100-', 100), False)
+        self.assertIs(parse_range('bytes=-10', 0), False)
+
+
+def image_upload(name, size=(2000, 1000), image_format='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, format=image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{image_format.lower()}')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_VARIANTS_ASYNC=False)
+class ImageVariantsTests(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.teacher = CustomerUser.objects.create_user(
+            username='teacher', email='teacher@example.com', password='testpass123', role='teacher'
+        )
+        self.category = Category.objects.create(name='Test Category')
+
+    def create_course(self, image):
+        return Course.objects.create(
+            title='Test Course', description='Test Description', price=100, category=self.category,
+            instructor=self.teacher, duration=timedelta(hours=2), image=image,
+        )
+
+    def test_variants_generated_after_commit(self):
+        """Rasm saqlangandan keyin o'lchamli va WebP variantlar yaratilishini tekshirish"""
+        with self.captureOnCommitCallbacks(execute=True):
+            course = self.create_course(image_upload('cover.jpg'))
+        for preset, box in (('thumb', (160, 160)), ('card', (480, 270)), ('large', (1280, 720))):
+            for extension, image_format in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+                with default_storage.open(variant_name(course.image.name, preset, extension)) as variant:
+                    image = Image.open(variant)
+                    self.assertEqual(image.format, image_format)
+                    self.assertLessEqual(image.width, box[0])
+                    self.assertLessEqual(image.height, box[1])
+        variants = CourseCatalogSerializer(course).data['image_variants']
+        self.assertTrue(variants['card']['webp'].endswith('__card.webp'))
+        self.assertTrue(variants['card']['jpg'].endswith('__card.jpg'))
+
+    def test_original_url_until_generated(self):
+        """Variantlar tayyor bo'lguncha asl rasm manzili qaytishini tekshirish"""
+        course = self.create_course(image_upload('pending.png', image_format='PNG'))
+        variants = CourseCatalogSerializer(course).data['image_variants']
+        self.assertEqual(variants['thumb'], {'webp': course.image.url, 'png': course.image.url})
+        self.assertIsNone(CourseCatalogSerializer(self.create_course(None)).data['image_variants'])
+
+    def test_readiness_cached(self):
+        """Variantlar tayyorligi har bir qator uchun xotiradan tekshirilmasligini tekshirish"""
+        with self.captureOnCommitCallbacks(execute=True):
+            course = self.create_course(image_upload('cached.jpg'))
+        with patch.object(default_storage, 'exists', side_effect=AssertionError('storage.exists')):
+            variants = CourseCatalogSerializer(course).data['image_variants']
+        self.assertTrue(variants['thumb']['webp'].endswith('__thumb.webp'))
+
+    def test_backfill_command(self):
+        """Mavjud rasmlar uchun variantlarni yaratish buyrug'ini tekshirish"""
+        course = self.create_course(image_upload('old.jpg'))
+        Category.objects.create(name='Broken', icon=SimpleUploadedFile('icon.png', b'not an image'))
+        self.assertFalse(default_storage.exists(variant_name(course.image.name, 'large', 'webp')))
+        call_command('generate_image_variants', stdout=StringIO())
+        self.assertTrue(default_storage.exists(variant_name(course.image.name, 'large', 'webp')))
@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import LessonVideoAPIView, CourseImageAPIView, CategoryIconAPIView, AvatarAPIView
+
+urlpatterns = [
+    path('lessons/<uuid:pk>/video/', LessonVideoAPIView.as_view(), name='media-lesson-video'),
+    path('courses/<uuid:pk>/image/', CourseImageAPIView.as_view(), name='media-course-image'),
+    path('categories/<uuid:pk>/icon/', CategoryIconAPIView.as_view(), name='media-category-icon'),
+    path('users/<uuid:pk>/avatar/', AvatarAPIView.as_view(), name='media-avatar'),
+]
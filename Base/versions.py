@@ -0,0 +1,45 @@
+"""
+Version counters for cached payloads.
+
+A payload is cached under a key that contains a version number kept in the
+shared Django cache. Bumping the version makes every older entry
+unreachable, so nothing has to be deleted explicitly. Writers bump after
+their transaction commits (bump_on_commit); bumping earlier would let a
+concurrent reader cache pre-commit data under the new version.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _new_version():
+    # Time based, so a version key that was evicted never comes back with a
+    # number some process still has cached.
+    return time.time_ns() // 1000
+
+
+def read_version(key):
+    """Current value of a version key, or None if the cache is down."""
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, _new_version(), timeout=None)
+            version = cache.get(key)
+        return version
+    except Exception:
+        return None
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+    except Exception:
+        pass
+
+
+def bump_on_commit(bump, *args):
+    """Call ``bump(*args)`` once the current transaction commits."""
+    transaction.on_commit(lambda: bump(*args))
@@ -1,3 +1,52 @@
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404
+from rest_framework.permissions import AllowAny
+from rest_framework.views import APIView
+from rest_framework import status
+from rest_framework.response import Response
 
-# Create your views here.
+from Base.media import serve_file
+from Course.models import Category, Course, Lesson
+from CustomerUser.models import CustomerUser
+
+
+class MediaAPIView(APIView):
+    def perform_content_negotiation(self, request, force=False):
+        # Video/rasm so'rovlarining Accept sarlavhasi JSON'ni o'z ichiga olmasligi mumkin
+        return super().perform_content_negotiation(request, force=True)
+
+
+def can_watch(user, course):
+    if user.role == 'admin' or user.is_staff or course.is_free or course.instructor_id == user.pk:
+        return True
+    return course.enrolled_students.filter(pk=user.pk).exists()
+
+
+class LessonVideoAPIView(MediaAPIView):
+    def get(self, request, pk):
+        lesson = get_object_or_404(Lesson.objects.select_related('module__course'), pk=pk)
+        if not can_watch(request.user, lesson.module.course):
+            return Response({"detail": "Bu dars videosini ko'rish uchun kursga yozilishingiz kerak"},
+                            status=status.HTTP_403_FORBIDDEN)
+        return serve_file(request, lesson.video, private=True)
+
+
+class CourseImageAPIView(MediaAPIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+        course = get_object_or_404(Course.objects.only('id', 'image'), pk=pk)
+        return serve_file(request, course.image)
+
+
+class CategoryIconAPIView(MediaAPIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+        category = get_object_or_404(Category.objects.only('id', 'icon'), pk=pk)
+        return serve_file(request, category.icon)
+
+
+class AvatarAPIView(MediaAPIView):
+    def get(self, request, pk):
+        user = get_object_or_404(CustomerUser.objects.only('id', 'avatar'), pk=pk)
+        return serve_file(request, user.avatar, private=True)
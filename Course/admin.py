@@ -1,9 +1,11 @@
 from django.contrib import admin
-from .models import Course, Category, Module, Lesson, Progress, Review
+from .models import Course, Category, Module, Lesson, Progress, Review, CourseStats, CourseProgress
 
 admin.site.register(Course)
 admin.site.register(Category)
 admin.site.register(Module)
 admin.site.register(Lesson)
 admin.site.register(Progress)
-admin.site.register(Review)
\ No newline at end of file
+admin.site.register(Review)
+admin.site.register(CourseStats)
+admin.site.register(CourseProgress)
@@ -0,0 +1,193 @@
+"""
+Course catalog: search, filters, facets and a response cache.
+
+Query parameters are normalized (unknown keys dropped, list values sorted)
+before they are used, so equivalent URLs share one cache entry. The cache key
+also carries a catalog version that Course/Category writes bump, and entries
+expire after CATALOG_CACHE_TIMEOUT so popularity sorts pick up new
+CourseStats without an explicit bump.
+"""
+import hashlib
+import json
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+
+from Base import versions
+
+from .models import Course
+from .search import NO_RANK
+
+VERSION_KEY = 'catalog:version'
+PAGE_KEY = 'catalog:v{version}:{digest}'
+DEFAULT_TIMEOUT = 60
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+LIST_PARAMS = ('category', 'level')
+SCALAR_PARAMS = ('q', 'is_free', 'price_min', 'price_max', 'sort', 'page', 'page_size')
+SORTS = {
+    'relevance': ('-rank', '-stats__enrolled_count'),
+    'popular': ('-stats__enrolled_count', '-created_at'),
+    'rating': ('-stats__rating_avg', '-stats__review_count'),
+    'newest': ('-created_at',),
+    'price': ('price', '-created_at'),
+    '-price': ('-price', '-created_at'),
+}
+# (key, lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS = (
+    ('free', None, Decimal('0.01')),
+    ('0-100000', Decimal('0.01'), Decimal('100000')),
+    ('100000-500000', Decimal('100000'), Decimal('500000')),
+    ('500000+', Decimal('500000'), None),
+)
+
+
+def normalize_params(query_params):
+    params = {}
+    for key in LIST_PARAMS:
+        values = sorted({
+            value.strip() for raw in query_params.getlist(key) for value in raw.split(',') if value.strip()
+        })
+        if values:
+            params[key] = values
+    for key in SCALAR_PARAMS:
+        value = query_params.get(key, '').strip()
+        if value:
+            params[key] = value.lower() if key != 'q' else ' '.join(value.split())
+    return params
+
+
+def get_version():
+    return versions.read_version(VERSION_KEY)
+
+
+def bump_version():
+    versions.bump_version(VERSION_KEY)
+
+
+def cache_key(params):
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:32]
+    return PAGE_KEY.format(version=get_version(), digest=digest)
+
+
+def _decimal(value):
+    try:
+        return Decimal(value)
+    except (InvalidOperation, TypeError):
+        return None
+
+
+def _uuid(value):
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        return None
+
+
+def filter_courses(queryset, params):
+    if 'category' in params:
+        queryset = queryset.filter(category_id__in=[value for value in map(_uuid, params['category']) if value])
+    if 'level' in params:
+        queryset = queryset.filter(level__in=params['level'])
+    if params.get('is_free') in ('1', 'true', 'yes'):
+        queryset = queryset.filter(is_free=True)
+    elif params.get('is_free') in ('0', 'false', 'no'):
+        queryset = queryset.filter(is_free=False)
+    price_min, price_max = _decimal(params.get('price_min')), _decimal(params.get('price_max'))
+    if price_min is not None:
+        queryset = queryset.filter(price__gte=price_min)
+    if price_max is not None:
+        queryset = queryset.filter(price__lte=price_max)
+    return queryset
+
+
+def price_bucket():
+    whens = []
+    for key, low, high in PRICE_BUCKETS:
+        condition = Q()
+        if low is not None:
+            condition &= Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        whens.append(When(condition, then=Value(key)))
+    return Case(*whens, default=Value(''), output_field=CharField())
+
+
+def facet_counts(queryset):
+    """All facet counts from one grouped query."""
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=price_bucket(), category_name=F('category__name'))
+        .values('category_id', 'category_name', 'level', 'is_free', 'price_bucket')
+        .annotate(total=Count('id'))
+    )
+    categories, levels, is_free = {}, {}, {'true': 0, 'false': 0}
+    prices = {key: 0 for key, _, _ in PRICE_BUCKETS}
+    for row in rows:
+        total = row['total']
+        category = categories.setdefault(
+            str(row['category_id']), {'id': str(row['category_id']), 'name': row['category_name'], 'count': 0}
+        )
+        category['count'] += total
+        if row['level']:
+            levels[row['level']] = levels.get(row['level'], 0) + total
+        is_free['true' if row['is_free'] else 'false'] += total
+        if row['price_bucket']:
+            prices[row['price_bucket']] += total
+    return {
+        'category': sorted(categories.values(), key=lambda item: -item['count']),
+        'level': levels,
+        'is_free': is_free,
+        'price': prices,
+    }
+
+
+def page_bounds(params):
+    try:
+        page = max(1, int(params.get('page', 1)))
+    except ValueError:
+        page = 1
+    try:
+        page_size = max(1, min(int(params.get('page_size', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+    return page, page_size
+
+
+def build_catalog(params, serializer_class, backend):
+    queryset = filter_courses(Course.objects.all(), params)
+    query = params.get('q')
+    rank = NO_RANK
+    if query:
+        queryset, rank = backend.search(queryset, query)
+    sort = params.get('sort') or ('relevance' if query else 'popular')
+    if sort not in SORTS or (sort == 'relevance' and not query):
+        sort = 'popular'
+
+    page, page_size = page_bounds(params)
+    offset = (page - 1) * page_size
+    results = (
+        queryset.annotate(rank=rank).select_related('category', 'stats')
+        .order_by(*SORTS[sort], 'id')[offset:offset + page_size]
+    )
+    return {
+        'count': queryset.count(),
+        'page': page,
+        'page_size': page_size,
+        'sort': sort,
+        'results': serializer_class(results, many=True).data,
+        'facets': facet_counts(queryset),
+    }
+
+
+def get_catalog(query_params, serializer_class, backend):
+    params = normalize_params(query_params)
+    key = cache_key(params)
+    data = cache.get(key)
+    if data is None:
+        data = build_catalog(params, serializer_class, backend)
+        cache.set(key, data, timeout=getattr(settings, 'CATALOG_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+    return data
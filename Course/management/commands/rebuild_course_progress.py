@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Course.progress import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Recount CourseProgress rollups from lesson Progress rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="User/course pairs recounted per batch")
+
+    def handle(self, *args, **options):
+        total = rebuild_all(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt progress rollups for {total} user/course pairs"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Course.stats import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Recount CourseStats for every course from enrollments, reviews and certificates"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Courses recounted per batch")
+
+    def handle(self, *args, **options):
+        total = rebuild_all(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt statistics for {total} courses"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from Course.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the course full-text search index"
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search index with {type(backend).__name__}"))
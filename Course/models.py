@@ -63,6 +63,37 @@ class Progress(BaseModel):
     class Meta:
         verbose_name = 'Progress'
         verbose_name_plural = 'Progress'
+        indexes = [models.Index(fields=['created_at', 'id'], name='progress_keyset_idx')]
+        constraints = [
+            # Rollup har bir darsni bir marta sanaydi (progress.adjust)
+            models.UniqueConstraint(fields=['user', 'lesson'], name='unique_lesson_progress'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # CourseProgress deltalari uchun asl qiymatlar
+        instance._loaded_completion = (instance.__dict__.get('is_completed'), instance.__dict__.get('score'))
+        return instance
+
+class CourseProgress(BaseModel):
+    """
+    Per-user, per-course rollup of Progress, maintained incrementally by
+    Course/signals.py (see Course/progress.py).
+    """
+    user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='course_progress')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='progress_rollups')
+    completed_lessons = models.PositiveIntegerField(default=0)
+    score_sum = models.IntegerField(default=0)
+    last_lesson = models.ForeignKey(Lesson, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Course Progress'
+        verbose_name_plural = 'Course Progress'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_course_progress'),
+        ]
 
 class Review(BaseModel):
     user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='reviews')
@@ -72,4 +103,52 @@ class Review(BaseModel):
 
     class Meta:
         verbose_name = 'Review'
-        verbose_name_plural = 'Reviews'
\ No newline at end of file
+        verbose_name_plural = 'Reviews'
+        indexes = [models.Index(fields=['created_at', 'id'], name='review_keyset_idx')]
+
+class CourseStats(BaseModel):
+    """
+    Denormalized popularity counters of a course, maintained by Course/signals.py
+    (see Course/stats.py) and repaired by the rebuild_course_stats command.
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, related_name='stats')
+    enrolled_count = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    completion_count = models.PositiveIntegerField(default=0)
+
+    @property
+    def rating_histogram(self):
+        return {rating: getattr(self, f'rating_{rating}') for rating in range(1, 6)}
+
+    class Meta:
+        verbose_name = 'Course Stats'
+        verbose_name_plural = 'Course Stats'
+        indexes = [
+            models.Index(fields=['-enrolled_count'], name='coursestats_popular_idx'),
+            models.Index(fields=['-rating_avg', '-review_count'], name='coursestats_rating_idx'),
+        ]
+
+class CourseSearchRow(models.Model):
+    """
+    A row of the course_fts FTS5 table (see Course/search.py). The table is
+    created by the search backend, not by migrations; the model only lets
+    the catalog join it in SQL.
+    """
+    rowid = models.IntegerField(primary_key=True)
+    course = models.ForeignKey(Course, on_delete=models.DO_NOTHING, db_constraint=False,
+                               related_name='search_rows')
+    title = models.TextField()
+    description = models.TextField()
+    # FTS5 jadvali bilan bir xil nomli yashirin ustun - MATCH va bm25() uchun
+    document = models.TextField(db_column='course_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'course_fts'
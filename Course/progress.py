@@ -0,0 +1,123 @@
+"""
+Maintenance and reads of the CourseProgress rollup.
+
+A Progress row contributes to its user's rollup only while it is completed:
+one lesson to completed_lessons and its score to score_sum. A user has at
+most one row per lesson (unique_lesson_progress), so counting rows and
+counting lessons agree. Signals apply
+the difference between the loaded and the saved state of a row with a
+single UPDATE ... SET col = col + n; rollups that do not exist yet, and the
+rebuild_course_progress command, recount from Progress with grouped queries.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import CourseProgress, Lesson, Progress
+
+
+def contribution(is_completed, score):
+    return (1, score or 0) if is_completed else (0, 0)
+
+
+def adjust(user_id, course_id, completed=0, score=0, last_lesson_id=None, at=None):
+    """Add deltas to one rollup; a newly completed lesson becomes last_lesson."""
+    if not completed and not score and not last_lesson_id:
+        return
+    values = {
+        'completed_lessons': F('completed_lessons') + completed if completed >= 0
+        else Greatest(F('completed_lessons') + completed, Value(0)),
+        'score_sum': F('score_sum') + score,
+    }
+    if last_lesson_id:
+        values.update(last_lesson_id=last_lesson_id, last_completed_at=at)
+    updated = CourseProgress.objects.filter(user_id=user_id, course_id=course_id).update(**values)
+    if not updated and (completed > 0 or score > 0):
+        # Rollup qatori yo'q - Progress jadvalidan quramiz
+        recount([(user_id, course_id)])
+
+
+def recount(pairs):
+    """Recompute the rollups of the given (user_id, course_id) pairs."""
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    condition = Q()
+    for user_id, course_id in pairs:
+        condition |= Q(user_id=user_id, course_id=course_id)
+    completed = Progress.objects.filter(condition, is_completed=True)
+    totals = {
+        (row['user_id'], row['course_id']): row
+        for row in completed.values('user_id', 'course_id').annotate(
+            total=Count('lesson', distinct=True), score=Coalesce(Sum('score'), 0)
+        )
+    }
+    last = {}
+    for user_id, course_id, lesson_id, completed_at in (
+        completed.order_by(F('completion_date').desc(nulls_last=True), '-updated_at')
+        .values_list('user_id', 'course_id', 'lesson_id', 'completion_date')
+    ):
+        last.setdefault((user_id, course_id), (lesson_id, completed_at))
+
+    CourseProgress.objects.bulk_create(
+        [CourseProgress(user_id=user_id, course_id=course_id) for user_id, course_id in pairs],
+        ignore_conflicts=True,
+    )
+    rows = list(CourseProgress.objects.filter(condition))
+    for row in rows:
+        key = (row.user_id, row.course_id)
+        row.completed_lessons = totals[key]['total'] if key in totals else 0
+        row.score_sum = totals[key]['score'] if key in totals else 0
+        row.last_lesson_id, row.last_completed_at = last.get(key, (None, None))
+    CourseProgress.objects.bulk_update(rows, ['completed_lessons', 'score_sum', 'last_lesson', 'last_completed_at'])
+    return len(rows)
+
+
+def rebuild_all(chunk_size=1000):
+    """Recount every (user, course) pair that has Progress rows."""
+    total = 0
+    pairs = Progress.objects.values_list('user_id', 'course_id').distinct().order_by('user_id', 'course_id')
+    chunk = []
+    for pair in pairs.iterator(chunk_size=chunk_size):
+        chunk.append(pair)
+        if len(chunk) >= chunk_size:
+            total += recount(chunk)
+            chunk = []
+    return total + recount(chunk)
+
+
+def total_lessons():
+    lessons = (
+        Lesson.objects.filter(module__course=OuterRef('course'))
+        .order_by().values('module__course').annotate(total=Count('id')).values('total')
+    )
+    return Coalesce(Subquery(lessons, output_field=IntegerField()), 0)
+
+
+def summaries(user):
+    """The user's rollups with the lesson total of each course, in one query."""
+    return (
+        CourseProgress.objects.filter(user=user)
+        .select_related('course', 'last_lesson')
+        .annotate(total_lessons=total_lessons())
+        .order_by(F('last_completed_at').desc(nulls_last=True), '-updated_at')
+    )
+
+
+def module_breakdown(user, course_id):
+    """Per-module lesson totals and the user's completed lessons, in one grouped query."""
+    return list(
+        Lesson.objects.filter(module__course_id=course_id)
+        .values('module_id', 'module__title', 'module__order')
+        .annotate(
+            total_lessons=Count('id', distinct=True),
+            completed_lessons=Count(
+                'progress__lesson', distinct=True,
+                filter=Q(progress__user=user, progress__is_completed=True),
+            ),
+        )
+        .order_by('module__order', 'module_id')
+    )
+
+
+def percent(completed, total):
+    return round(min(100.0, 100.0 * completed / total), 1) if total else 0.0
@@ -0,0 +1,154 @@
+"""
+Full-text search over course titles and descriptions.
+
+The backend is chosen by the COURSE_SEARCH_BACKEND setting (dotted path).
+By default SQLite databases with FTS5 use SQLiteFTSBackend, a ``course_fts``
+virtual table ranked with bm25(); everything else falls back to
+IcontainsBackend. The FTS table is created on post_migrate and kept in sync
+from the Course signals; the rebuild() method repopulates it. Searches join
+the table through the unmanaged CourseSearchRow model, so matching, counting
+and ranking all happen in one SQL query with no cap on the number of hits.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Case, F, FloatField, Func, Lookup, Q, Subquery, Value, When
+from django.db.models.lookups import In
+from django.utils.module_loading import import_string
+
+from .models import Course, CourseSearchRow
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+NO_RANK = Value(0.0, output_field=FloatField())
+
+
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+CourseSearchRow._meta.get_field('document').register_lookup(Match)
+
+
+class SearchBackend:
+    def setup(self):
+        pass
+
+    def index(self, courses):
+        pass
+
+    def remove(self, course_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, query):
+        """
+        Return (matches, rank): the queryset filtered to matching courses and
+        an expression scoring them, higher is better.
+        """
+        raise NotImplementedError
+
+
+class IcontainsBackend(SearchBackend):
+    def search(self, queryset, query):
+        tokens = TOKEN_RE.findall(query)
+        condition, title_match = Q(), Q()
+        for token in tokens:
+            condition &= Q(title__icontains=token) | Q(description__icontains=token)
+            title_match &= Q(title__icontains=token)
+        if not tokens:
+            return queryset, NO_RANK
+        rank = Case(When(title_match, then=Value(2.0)), default=Value(1.0), output_field=FloatField())
+        return queryset.filter(condition), rank
+
+
+class SQLiteFTSBackend(SearchBackend):
+    table = 'course_fts'
+    # bm25 column weights: title, description
+    weights = (10.0, 1.0)
+    # bm25 clamps the IDF of terms found in over half the rows to ~0, so a
+    # full title match gets a fixed boost on top of the bm25 score
+    title_boost = 1000.0
+
+    def _db_id(self, pk):
+        return Course._meta.pk.get_db_prep_value(pk, connection)
+
+    def setup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                f"USING fts5(course_id UNINDEXED, title, description, tokenize='unicode61')"
+            )
+
+    def index(self, courses):
+        rows = [(self._db_id(course.pk), course.title, course.description) for course in courses]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE course_id = %s", [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {self.table} (course_id, title, description) VALUES (%s, %s, %s)", rows
+            )
+
+    def remove(self, course_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE course_id = %s", [(self._db_id(pk),) for pk in course_ids]
+            )
+
+    def rebuild(self, chunk_size=1000):
+        self.setup()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+        last_pk = None
+        queryset = Course.objects.order_by('pk').only('pk', 'title', 'description')
+        while True:
+            chunk = list((queryset.filter(pk__gt=last_pk) if last_pk else queryset)[:chunk_size])
+            if not chunk:
+                return
+            self.index(chunk)
+            last_pk = chunk[-1].pk
+
+    def match_expression(self, query):
+        # Har bir so'z prefiks bo'yicha, barchasi AND bilan; FTS sintaksisi foydalanuvchidan kelmaydi
+        return ' '.join(f'"{token}"*' for token in TOKEN_RE.findall(query.replace('"', ' ')))
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset, NO_RANK
+        title_hits = CourseSearchRow.objects.filter(document__match=f'title : ({expression})').values('rowid')
+        # bm25 qiymati qanchalik kichik bo'lsa, shunchalik mos keladi
+        rank = Case(
+            When(In(F('search_rows__rowid'), Subquery(title_hits)), then=Value(self.title_boost)),
+            default=Value(0.0), output_field=FloatField(),
+        ) - Func(F('search_rows__document'), *[Value(weight) for weight in self.weights],
+                 function='bm25', output_field=FloatField())
+        return queryset.filter(search_rows__document__match=expression), rank
+
+
+@lru_cache(maxsize=1)
+def fts5_available():
+    if connection.vendor != 'sqlite':
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            return bool(cursor.fetchone()[0])
+    except DatabaseError:
+        return False
+
+
+def get_backend():
+    path = getattr(settings, 'COURSE_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    return SQLiteFTSBackend() if fts5_available() else IcontainsBackend()
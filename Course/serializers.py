@@ -1,5 +1,7 @@
+from django.urls import reverse
 from rest_framework import serializers
-from Course import models
+from Course import models, progress
+from Base.serializers import ImageVariantsField
 from CustomerUser.models import CustomerUser
 
 
@@ -10,17 +12,42 @@ class CategoryCreateSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class CategoryListSerializer(serializers.ModelSerializer):
+    icon_variants = ImageVariantsField(source='icon')
+
     class Meta:
         model = models.Category
-        fields = 'id', 'name', 'icon'
+        fields = 'id', 'name', 'icon', 'icon_variants'
 
 
 # === COURSE ===
 class CourseSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='image')
+
     class Meta:
         model = models.Course
         fields = '__all__'
 
+class CourseStatsSerializer(serializers.ModelSerializer):
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta:
+        model = models.CourseStats
+        fields = 'course', 'enrolled_count', 'review_count', 'rating_avg', 'rating_histogram', 'completion_count'
+
+class CourseCatalogSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    enrolled_count = serializers.IntegerField(source='stats.enrolled_count', read_only=True)
+    rating_avg = serializers.FloatField(source='stats.rating_avg', read_only=True)
+    review_count = serializers.IntegerField(source='stats.review_count', read_only=True)
+    image_variants = ImageVariantsField(source='image')
+
+    class Meta:
+        model = models.Course
+        fields = (
+            'id', 'title', 'description', 'category', 'category_name', 'price', 'is_free', 'level',
+            'image', 'image_variants', 'duration', 'enrolled_count', 'rating_avg', 'review_count',
+        )
+
 # === MODULE ===
 class ModuleCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -43,8 +70,50 @@ class ModulePutSerializer(serializers.ModelSerializer):
         fields = 'id', 'title', 'course', 'order'
 
 
+class LessonSummarySerializer(serializers.ModelSerializer):
+    has_video = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.Lesson
+        fields = 'id', 'title', 'order', 'duration', 'has_video'
+
+    def get_has_video(self, obj):
+        return bool(obj.video)
+
+
+class ModuleTreeSerializer(serializers.ModelSerializer):
+    lessons = LessonSummarySerializer(many=True, read_only=True)
+
+    class Meta:
+        model = models.Module
+        fields = 'id', 'title', 'order', 'lessons'
+
+
+class CourseTreeSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    modules = ModuleTreeSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = models.Course
+        fields = (
+            'id', 'title', 'description', 'category', 'category_name', 'price', 'is_free', 'level',
+            'image', 'duration', 'instructor', 'modules',
+        )
+
+
 # === LESSON ===
-class LessonCreateSerializer(serializers.ModelSerializer):
+class ProtectedVideoMixin:
+    """Video fayl manzili o'rniga yozilganlikni tekshiradigan api/media/ manzilini qaytaradi."""
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if data.get('video'):
+            url = reverse('media-lesson-video', args=[instance.pk])
+            request = self.context.get('request')
+            data['video'] = request.build_absolute_uri(url) if request else url
+        return data
+
+class LessonCreateSerializer(ProtectedVideoMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Lesson
         fields = '__all__'
@@ -54,12 +123,12 @@ class LessonListSerializer(serializers.ModelSerializer):
         model = models.Lesson
         fields = 'id', 'title', 'module', 'order'
 
-class LessonDetailSerializer(serializers.ModelSerializer):
+class LessonDetailSerializer(ProtectedVideoMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Lesson
         fields = 'id', 'title', 'module', 'content', 'video', 'duration'
 
-class LessonPutSerializer(serializers.ModelSerializer):
+class LessonPutSerializer(ProtectedVideoMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Lesson   
         fields = 'id', 'title', 'module', 'content', 'video', 'duration', 'order'
@@ -76,6 +145,33 @@ class ProgressCreateSerializer(serializers.ModelSerializer):
         model = models.Progress
         fields = 'completion_date','is_completed'
 
+class CourseProgressSerializer(serializers.ModelSerializer):
+    course_title = serializers.CharField(source='course.title', read_only=True)
+    last_lesson_title = serializers.CharField(source='last_lesson.title', read_only=True, default=None)
+    total_lessons = serializers.IntegerField(read_only=True)
+    percent = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.CourseProgress
+        fields = (
+            'course', 'course_title', 'completed_lessons', 'total_lessons', 'percent', 'score_sum',
+            'last_lesson', 'last_lesson_title', 'last_completed_at',
+        )
+
+    def get_percent(self, obj):
+        return progress.percent(obj.completed_lessons, obj.total_lessons)
+
+class ModuleProgressSerializer(serializers.Serializer):
+    module = serializers.UUIDField(source='module_id')
+    title = serializers.CharField(source='module__title')
+    order = serializers.IntegerField(source='module__order')
+    completed_lessons = serializers.IntegerField()
+    total_lessons = serializers.IntegerField()
+    percent = serializers.SerializerMethodField()
+
+    def get_percent(self, obj):
+        return progress.percent(obj['completed_lessons'], obj['total_lessons'])
+
 # === REVIEW ===
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
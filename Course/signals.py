@@ -0,0 +1,146 @@
+import logging
+
+from django.db import DatabaseError, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from Base.versions import bump_on_commit
+
+from . import catalog, progress, search, stats, tree
+from .models import Category, Course, CourseStats, Lesson, Module, Progress, Review
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Course)
+def course_created(sender, instance, created, **kwargs):
+    if created:
+        CourseStats.objects.get_or_create(course=instance)
+
+
+@receiver(post_save, sender=Course)
+def course_index_saved(sender, instance, **kwargs):
+    bump_on_commit(catalog.bump_version)
+    try:
+        with transaction.atomic():
+            search.get_backend().index([instance])
+    except DatabaseError as e:
+        logger.error(f"Course search index update failed: {str(e)}")
+
+
+@receiver(post_delete, sender=Course)
+def course_index_deleted(sender, instance, **kwargs):
+    bump_on_commit(catalog.bump_version)
+    try:
+        with transaction.atomic():
+            search.get_backend().remove([instance.pk])
+    except DatabaseError as e:
+        logger.error(f"Course search index update failed: {str(e)}")
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+    # Facet nomlari kategoriyadan olinadi
+    bump_on_commit(catalog.bump_version)
+    if not kwargs.get('created'):
+        for course_id in Course.objects.filter(category=instance).values_list('pk', flat=True):
+            bump_on_commit(tree.bump_version, course_id)
+
+
+@receiver([post_save, post_delete], sender=Course)
+def course_tree_changed(sender, instance, **kwargs):
+    bump_on_commit(tree.bump_version, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Module)
+def module_tree_changed(sender, instance, **kwargs):
+    bump_on_commit(tree.bump_version, instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def lesson_tree_changed(sender, instance, **kwargs):
+    if Lesson.module.is_cached(instance):
+        course_id = instance.module.course_id
+    else:
+        course_id = Module.objects.filter(pk=instance.module_id).values_list('course_id', flat=True).first()
+    # Modul bilan birga o'chirilgan darslar uchun modulning o'z signali yetarli
+    if course_id:
+        bump_on_commit(tree.bump_version, course_id)
+
+
+def setup_search_index(sender, **kwargs):
+    search.get_backend().setup()
+
+
+@receiver(m2m_changed, sender=Course.enrolled_students.through)
+def enrollment_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # Foydalanuvchi barcha kurslardan chiqarilmoqda - kurslarni oldindan eslab qolamiz
+        instance._cleared_course_ids = list(instance.enrolled_courses.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    course_ids = [instance.pk] if not reverse else list(pk_set or getattr(instance, '_cleared_course_ids', []))
+    if action == 'post_add':
+        # post_add faqat haqiqatan qo'shilgan id'larni beradi
+        if not pk_set:
+            return
+        if reverse:
+            for course_id in course_ids:
+                stats.adjust(course_id, enrolled_count=1)
+        else:
+            stats.adjust(instance.pk, enrolled_count=len(pk_set))
+    else:
+        stats.recount(course_ids)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.review_changed(instance.course_id, instance.rating)
+    else:
+        # Baho tahrirlangan bo'lishi mumkin - eski qiymat noma'lum, qayta sanaymiz
+        stats.recount([instance.course_id])
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    stats.review_changed(instance.course_id, instance.rating, sign=-1)
+
+
+@receiver(post_save, sender='Certificate.Certificate')
+def certificate_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.adjust(instance.course_id, completion_count=1)
+
+
+@receiver(post_delete, sender='Certificate.Certificate')
+def certificate_deleted(sender, instance, **kwargs):
+    stats.adjust(instance.course_id, completion_count=-1)
+
+
+@receiver(post_save, sender=Progress)
+def progress_saved(sender, instance, created, **kwargs):
+    old = (False, 0) if created else getattr(instance, '_loaded_completion', None)
+    if old is None:
+        # Asl holat noma'lum (masalan, qo'lda yaratilgan obyekt) - qayta sanaymiz
+        progress.recount([(instance.user_id, instance.course_id)])
+    else:
+        old_completed, old_score = progress.contribution(*old)
+        new_completed, new_score = progress.contribution(instance.is_completed, instance.score)
+        newly_completed = instance.is_completed and not old[0]
+        progress.adjust(
+            instance.user_id, instance.course_id,
+            completed=new_completed - old_completed,
+            score=new_score - old_score,
+            last_lesson_id=instance.lesson_id if newly_completed else None,
+            at=(instance.completion_date or instance.updated_at) if newly_completed else None,
+        )
+    instance._loaded_completion = (instance.is_completed, instance.score)
+
+
+@receiver(post_delete, sender=Progress)
+def progress_deleted(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_completion', (instance.is_completed, instance.score))
+    completed, score = progress.contribution(*loaded)
+    progress.adjust(instance.user_id, instance.course_id, completed=-completed, score=-score)
@@ -0,0 +1,104 @@
+"""
+Maintenance of CourseStats.
+
+Signals apply small deltas with a single UPDATE ... SET col = col + n, so
+concurrent enrollments and reviews never overwrite each other. Whenever a
+delta is not known exactly (M2M remove/clear, a review whose rating was
+edited, bulk inserts that bypass signals) the affected courses are recounted
+from the source tables with grouped queries instead.
+"""
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast, Greatest
+
+from .models import Course, CourseStats, Review
+
+RATING_FIELDS = [f'rating_{rating}' for rating in range(1, 6)]
+COUNTER_FIELDS = ['enrolled_count', 'review_count', 'rating_sum', *RATING_FIELDS, 'completion_count', 'rating_avg']
+
+
+def _average():
+    return Case(
+        When(review_count__gt=0, then=Cast(F('rating_sum'), FloatField()) / F('review_count')),
+        default=0.0,
+        output_field=FloatField(),
+    )
+
+
+def ensure_stats(course_ids):
+    course_ids = set(course_ids)
+    existing = set(CourseStats.objects.filter(course_id__in=course_ids).values_list('course_id', flat=True))
+    missing = course_ids - existing
+    if missing:
+        CourseStats.objects.bulk_create(
+            [CourseStats(course_id=course_id) for course_id in missing], ignore_conflicts=True
+        )
+
+
+def adjust(course_id, **deltas):
+    """Add deltas to the counters of one course."""
+    updated = CourseStats.objects.filter(course_id=course_id).update(**{
+        field: F(field) + delta if delta >= 0 else Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items()
+    })
+    if not updated:
+        # Statistika qatori yo'q (eski kurs) - manba jadvallardan quramiz.
+        # Kurs o'chirilayotganda (manfiy delta) hech narsa qilinmaydi.
+        if any(delta > 0 for delta in deltas.values()):
+            recount([course_id])
+        return
+    if 'rating_sum' in deltas or 'review_count' in deltas:
+        CourseStats.objects.filter(course_id=course_id).update(rating_avg=_average())
+
+
+def review_changed(course_id, rating, sign=1):
+    adjust(course_id, review_count=sign, rating_sum=sign * rating, **{f'rating_{rating}': sign})
+
+
+def recount(course_ids):
+    """Recompute the counters of the given courses from the source tables."""
+    course_ids = list(set(course_ids))
+    if not course_ids:
+        return 0
+    from Certificate.models import Certificate
+
+    Enrollment = Course.enrolled_students.through
+    enrolled = dict(
+        Enrollment.objects.filter(course_id__in=course_ids)
+        .values('course_id').annotate(total=Count('id')).values_list('course_id', 'total')
+    )
+    histogram = {}
+    for course_id, rating, total in (
+        Review.objects.filter(course_id__in=course_ids)
+        .values('course_id', 'rating').annotate(total=Count('id')).values_list('course_id', 'rating', 'total')
+    ):
+        histogram.setdefault(course_id, {})[rating] = total
+    completions = dict(
+        Certificate.objects.filter(course_id__in=course_ids)
+        .values('course_id').annotate(total=Count('id')).values_list('course_id', 'total')
+    )
+
+    ensure_stats(course_ids)
+    rows = list(CourseStats.objects.filter(course_id__in=course_ids))
+    for row in rows:
+        ratings = histogram.get(row.course_id, {})
+        row.enrolled_count = enrolled.get(row.course_id, 0)
+        row.completion_count = completions.get(row.course_id, 0)
+        row.review_count = sum(ratings.values())
+        row.rating_sum = sum(rating * total for rating, total in ratings.items())
+        row.rating_avg = row.rating_sum / row.review_count if row.review_count else 0.0
+        for rating in range(1, 6):
+            setattr(row, f'rating_{rating}', ratings.get(rating, 0))
+    CourseStats.objects.bulk_update(rows, COUNTER_FIELDS)
+    return len(rows)
+
+
+def rebuild_all(chunk_size=1000):
+    """Recount every course, chunk by chunk; returns the number of rows."""
+    total, last_pk = 0, None
+    queryset = Course.objects.order_by('pk').values_list('pk', flat=True)
+    while True:
+        chunk = list((queryset.filter(pk__gt=last_pk) if last_pk else queryset)[:chunk_size])
+        if not chunk:
+            return total
+        total += recount(chunk)
+        last_pk = chunk[-1]
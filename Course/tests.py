@@ -1,3 +1,438 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from .models import Course, Category, Module, Lesson, Progress, Review, CourseStats, CourseProgress
+from .stats import rebuild_all
+from .progress import rebuild_all as rebuild_progress
+from .search import SQLiteFTSBackend, fts5_available
+from Certificate.models import Certificate
+from CustomerUser.models import CustomerUser
+from datetime import timedelta
 
-# Create your tests here.
+
+class ProgressPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            role='student'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100,
+            category=self.category,
+            instructor=self.user,
+            duration=timedelta(hours=2)
+        )
+        self.module = Module.objects.create(course=self.course, title='Module 1', order=1)
+        for order in range(3):
+            lesson = Lesson.objects.create(
+                module=self.module, title=f'Lesson {order}', content='Content',
+                duration=timedelta(minutes=10), order=order
+            )
+            Progress.objects.create(user=self.user, course=self.course, module=self.module, lesson=lesson)
+        self.client.force_authenticate(user=self.user)
+
+    def test_progress_keyset_pagination(self):
+        """Progress ro'yxatini kursor bilan sahifalashni tekshirish"""
+        response = self.client.get(reverse('progress-list') + '?page_size=2&ordering=created_at')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_course_list_without_pagination(self):
+        """Kurslar ro'yxati parametrsiz to'liq qaytishini tekshirish"""
+        response = self.client.get(reverse('course-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+
+class CourseStatsTests(APITestCase):
+    def setUp(self):
+        self.instructor = CustomerUser.objects.create_user(
+            username='teacher',
+            email='teacher@example.com',
+            password='testpass123',
+            role='teacher'
+        )
+        self.students = [
+            CustomerUser.objects.create_user(
+                username=f'student{i}', email=f'student{i}@example.com', password='testpass123', role='student'
+            )
+            for i in range(3)
+        ]
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100,
+            category=self.category,
+            instructor=self.instructor,
+            duration=timedelta(hours=2)
+        )
+        self.client.force_authenticate(user=self.students[0])
+
+    def stats(self):
+        return CourseStats.objects.get(course=self.course)
+
+    def test_enrollment_counters(self):
+        """Kursga yozilish va chiqarish hisoblagichlarini tekshirish"""
+        self.course.enrolled_students.add(*self.students)
+        self.course.enrolled_students.add(self.students[0])  # takroriy qo'shish sanalmaydi
+        self.assertEqual(self.stats().enrolled_count, 3)
+        self.course.enrolled_students.remove(self.students[0])
+        self.assertEqual(self.stats().enrolled_count, 2)
+        self.students[1].enrolled_courses.clear()
+        self.assertEqual(self.stats().enrolled_count, 1)
+        self.students[1].enrolled_courses.add(self.course)
+        self.assertEqual(self.stats().enrolled_count, 2)
+
+    def test_review_counters(self):
+        """Sharhlar soni, o'rtacha baho va gistogrammani tekshirish"""
+        Review.objects.create(user=self.students[0], course=self.course, rating=5)
+        review = Review.objects.create(user=self.students[1], course=self.course, rating=3)
+        course_stats = self.stats()
+        self.assertEqual(course_stats.review_count, 2)
+        self.assertEqual(course_stats.rating_avg, 4.0)
+        self.assertEqual(course_stats.rating_histogram, {1: 0, 2: 0, 3: 1, 4: 0, 5: 1})
+        review.rating = 1
+        review.save()
+        self.assertEqual(self.stats().rating_avg, 3.0)
+        review.delete()
+        course_stats = self.stats()
+        self.assertEqual(course_stats.review_count, 1)
+        self.assertEqual(course_stats.rating_avg, 5.0)
+        self.assertEqual(course_stats.rating_1, 0)
+
+    def test_completion_counter(self):
+        """Sertifikatlar bo'yicha tugatganlar sonini tekshirish"""
+        certificate = Certificate.objects.create(user=self.students[0], course=self.course)
+        self.assertEqual(self.stats().completion_count, 1)
+        certificate.delete()
+        self.assertEqual(self.stats().completion_count, 0)
+
+    def test_rebuild_repairs_drift(self):
+        """Qayta qurish buyrug'i farqlarni tuzatishini tekshirish"""
+        self.course.enrolled_students.add(*self.students)
+        Review.objects.create(user=self.students[0], course=self.course, rating=4)
+        CourseStats.objects.all().delete()
+        self.assertEqual(rebuild_all(), 1)
+        course_stats = self.stats()
+        self.assertEqual(course_stats.enrolled_count, 3)
+        self.assertEqual(course_stats.rating_4, 1)
+
+    def test_stats_endpoint(self):
+        """Kurs statistikasi endpointini tekshirish"""
+        self.course.enrolled_students.add(self.students[0])
+        CourseStats.objects.all().delete()
+        response = self.client.get(reverse('course-stats', args=[self.course.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['enrolled_count'], 1)
+        self.assertEqual(response.data['rating_histogram'], {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0})
+
+
+class CourseCatalogTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomerUser.objects.create_user(
+            username='teacher',
+            email='teacher@example.com',
+            password='testpass123',
+            role='teacher'
+        )
+        self.programming = Category.objects.create(name='Dasturlash')
+        self.design = Category.objects.create(name='Dizayn')
+        self.python = self.create_course('Python asoslari', 'Boshlang\'ichlar uchun kurs', self.programming, 0, 'beginner')
+        self.django = self.create_course('Django', 'Python web framework bilan ishlash', self.programming, 250000, 'intermediate')
+        self.figma = self.create_course('Figma', 'Interfeys dizayni', self.design, 700000, 'beginner')
+        self.client.force_authenticate(user=self.user)
+
+    def create_course(self, title, description, category, price, level):
+        return Course.objects.create(
+            title=title, description=description, category=category, price=price, is_free=price == 0,
+            level=level, instructor=self.user, duration=timedelta(hours=2)
+        )
+
+    def catalog(self, query=''):
+        response = self.client.get(reverse('course-catalog') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_search_ranks_title_matches_first(self):
+        """Sarlavhadagi moslik tavsifdagidan yuqori turishini tekshirish"""
+        data = self.catalog('?q=python')
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['sort'], 'relevance')
+        self.assertEqual([item['title'] for item in data['results']], ['Python asoslari', 'Django'])
+
+    def test_search_prefix_and_syntax_safety(self):
+        """Prefiks qidiruv va FTS maxsus belgilarini tekshirish"""
+        self.assertEqual(self.catalog('?q=pyth')['count'], 2)
+        self.assertEqual(self.catalog('?q="python" (*')['count'], 2)
+        self.assertEqual(self.catalog('?q=kotlin')['count'], 0)
+
+    @override_settings(COURSE_SEARCH_BACKEND='Course.search.IcontainsBackend')
+    def test_icontains_backend(self):
+        """Zaxira qidiruv backendini tekshirish"""
+        data = self.catalog('?q=python')
+        self.assertEqual([item['title'] for item in data['results']], ['Python asoslari', 'Django'])
+
+    def test_filters_and_facets(self):
+        """Filtrlar va facet hisoblarini tekshirish"""
+        data = self.catalog(f'?category={self.programming.id}&sort=price')
+        self.assertEqual([item['title'] for item in data['results']], ['Python asoslari', 'Django'])
+        self.assertEqual(data['facets']['level'], {'beginner': 1, 'intermediate': 1})
+        self.assertEqual(data['facets']['is_free'], {'true': 1, 'false': 1})
+
+        data = self.catalog('?level=beginner,intermediate&price_min=100000')
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['facets']['price'], {'free': 0, '0-100000': 0, '100000-500000': 1, '500000+': 1})
+        self.assertEqual({item['name']: item['count'] for item in data['facets']['category']},
+                         {'Dasturlash': 1, 'Dizayn': 1})
+        self.assertEqual(self.catalog('?is_free=true')['count'], 1)
+        self.assertEqual(self.catalog('?category=not-a-uuid')['count'], 0)
+
+    def test_pagination(self):
+        """Sahifalash parametrlarini tekshirish"""
+        data = self.catalog('?sort=newest&page=2&page_size=2')
+        self.assertEqual(data['count'], 3)
+        self.assertEqual([item['title'] for item in data['results']], ['Python asoslari'])
+
+    def test_cache_and_invalidation(self):
+        """Javob keshlanishi va kurs o'zgarganda yangilanishini tekshirish"""
+        self.catalog('?q=figma')
+        with self.assertNumQueries(0):
+            self.catalog('?q=figma')
+        self.figma.title = 'Sketch'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.figma.save()
+        self.assertEqual(self.catalog('?q=figma')['count'], 0)
+        self.assertEqual(self.catalog('?q=sketch')['count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.figma.delete()
+        self.assertEqual(self.catalog('?q=sketch')['count'], 0)
+
+    def test_search_count_not_capped(self):
+        """Ko'p mos keluvchi kurslar soni va facet'lari to'liq hisoblanishini tekshirish"""
+        if not fts5_available():
+            self.skipTest('FTS5 mavjud emas')
+        courses = Course.objects.bulk_create([
+            Course(title=f'Python {number}', description='Amaliy kurs', category=self.programming, price=0,
+                   is_free=True, level='beginner', instructor=self.user, duration=timedelta(hours=1))
+            for number in range(1200)
+        ])
+        SQLiteFTSBackend().index(courses)
+        data = self.catalog('?q=python&page_size=5')
+        self.assertEqual(data['count'], 1202)
+        self.assertEqual(data['facets']['category'][0]['count'], 1202)
+
+    def test_rebuild_index(self):
+        """Qidiruv indeksini qayta qurishni tekshirish"""
+        if not fts5_available():
+            self.skipTest('FTS5 mavjud emas')
+        backend = SQLiteFTSBackend()
+        backend.remove([self.python.pk, self.django.pk, self.figma.pk])
+        self.assertEqual(self.catalog('?q=python')['count'], 0)
+        backend.rebuild()
+        cache.clear()
+        self.assertEqual(self.catalog('?q=python')['count'], 2)
+
+
+class CourseTreeTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomerUser.objects.create_user(
+            username='teacher',
+            email='teacher@example.com',
+            password='testpass123',
+            role='teacher'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100,
+            category=self.category,
+            instructor=self.user,
+            duration=timedelta(hours=2)
+        )
+        self.other_course = Course.objects.create(
+            title='Other Course',
+            description='Other Description',
+            price=100,
+            category=self.category,
+            instructor=self.user,
+            duration=timedelta(hours=2)
+        )
+        self.modules = [
+            Module.objects.create(course=self.course, title=f'Module {order}', order=order) for order in (2, 1)
+        ]
+        for module in self.modules:
+            for order in (3, 1, 2):
+                Lesson.objects.create(
+                    module=module, title=f'{module.title} Lesson {order}', content='Content',
+                    duration=timedelta(minutes=10), order=order
+                )
+        Module.objects.create(course=self.other_course, title='Other Module', order=1)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('course-tree', args=[self.course.id])
+
+    def test_tree_is_ordered(self):
+        """Modullar va darslar tartib bo'yicha qaytishini tekshirish"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([module['title'] for module in response.data['modules']], ['Module 1', 'Module 2'])
+        self.assertEqual([lesson['order'] for lesson in response.data['modules'][0]['lessons']], [1, 2, 3])
+        self.assertNotIn('content', response.data['modules'][0]['lessons'][0])
+
+    def test_tree_query_count(self):
+        """Daraxt doimiy sondagi so'rovlar bilan yuklanishini tekshirish"""
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_etag_and_invalidation(self):
+        """ETag, 304 javobi va o'zgarishda yangilanishni tekshirish"""
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        lesson = Lesson.objects.filter(module=self.modules[0]).first()
+        lesson.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Renamed', [item['title'] for item in response.data['modules'][1]['lessons']])
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.modules[1].delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['modules']), 1)
+
+    def test_tree_not_found(self):
+        """Mavjud bo'lmagan kurs uchun 404 ni tekshirish"""
+        response = self.client.get(reverse('course-tree', args=['00000000-0000-0000-0000-000000000000']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_module_list_course_filter(self):
+        """Modullar ro'yxatini kurs bo'yicha filtrlashni tekshirish"""
+        response = self.client.get(reverse('module-list') + f'?course={self.course.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([module['title'] for module in response.data], ['Module 1', 'Module 2'])
+
+
+class CourseProgressTests(APITestCase):
+    def setUp(self):
+        self.user = CustomerUser.objects.create_user(
+            username='student',
+            email='student@example.com',
+            password='testpass123',
+            role='student'
+        )
+        self.other = CustomerUser.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='testpass123',
+            role='student'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100,
+            category=self.category,
+            instructor=self.user,
+            duration=timedelta(hours=2)
+        )
+        self.modules = [Module.objects.create(course=self.course, title=f'Module {order}', order=order)
+                        for order in (1, 2)]
+        self.lessons = [
+            Lesson.objects.create(module=module, title=f'{module.title} Lesson {order}', content='Content',
+                                  duration=timedelta(minutes=10), order=order)
+            for module in self.modules for order in (1, 2)
+        ]
+        self.client.force_authenticate(user=self.user)
+
+    def progress_for(self, lesson, user=None, **fields):
+        return Progress.objects.create(user=user or self.user, course=self.course, module=lesson.module,
+                                       lesson=lesson, **fields)
+
+    def rollup(self, user=None):
+        return CourseProgress.objects.get(user=user or self.user, course=self.course)
+
+    def test_rollup_follows_completion_flips(self):
+        """is_completed o'zgarganda rollup yangilanishini tekshirish"""
+        first = self.progress_for(self.lessons[0], is_completed=True, score=80)
+        second = self.progress_for(self.lessons[1])
+        self.assertEqual((self.rollup().completed_lessons, self.rollup().score_sum), (1, 80))
+
+        second = Progress.objects.get(pk=second.pk)
+        second.is_completed = True
+        second.score = 60
+        second.save()
+        second.save()  # takroriy saqlash sanalmaydi
+        rollup = self.rollup()
+        self.assertEqual((rollup.completed_lessons, rollup.score_sum), (2, 140))
+        self.assertEqual(rollup.last_lesson, self.lessons[1])
+
+        first = Progress.objects.get(pk=first.pk)
+        first.is_completed = False
+        first.save()
+        self.assertEqual((self.rollup().completed_lessons, self.rollup().score_sum), (1, 60))
+        second.delete()
+        self.assertEqual((self.rollup().completed_lessons, self.rollup().score_sum), (0, 0))
+
+    def test_lesson_progress_is_unique(self):
+        """Bitta dars uchun ikkinchi progress yozuvi rollupni ikki marta sanamasligini tekshirish"""
+        self.progress_for(self.lessons[0], is_completed=True, score=80)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.progress_for(self.lessons[0], is_completed=True, score=80)
+        self.assertEqual((self.rollup().completed_lessons, self.rollup().score_sum), (1, 80))
+
+    def test_rebuild_repairs_drift(self):
+        """Rollup jadvalini qayta qurishni tekshirish"""
+        self.progress_for(self.lessons[0], is_completed=True, score=50)
+        self.progress_for(self.lessons[2], is_completed=True, score=70)
+        CourseProgress.objects.update(completed_lessons=0, score_sum=0)
+        self.assertEqual(rebuild_progress(), 1)
+        rollup = self.rollup()
+        self.assertEqual((rollup.completed_lessons, rollup.score_sum), (2, 120))
+
+    def test_summary_endpoints(self):
+        """Progress xulosasi va modullar kesimini tekshirish"""
+        self.progress_for(self.lessons[0], is_completed=True, score=90)
+        self.progress_for(self.lessons[1], user=self.other, is_completed=True)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('progress-summary'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['total_lessons'], 4)
+        self.assertEqual(response.data[0]['percent'], 25.0)
+        self.assertEqual(response.data[0]['last_lesson_title'], 'Module 1 Lesson 1')
+
+        response = self.client.get(reverse('course-progress-summary', args=[self.course.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(module['completed_lessons'], module['total_lessons'], module['percent'])
+                          for module in response.data['modules']], [(1, 2, 50.0), (0, 2, 0.0)])
+
+    def test_progress_list_is_scoped(self):
+        """Oddiy foydalanuvchi faqat o'z progressini ko'rishini tekshirish"""
+        self.progress_for(self.lessons[0])
+        self.progress_for(self.lessons[0], user=self.other)
+        response = self.client.get(reverse('progress-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
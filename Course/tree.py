@@ -0,0 +1,61 @@
+"""
+Course tree (course -> modules -> lesson summaries) for the course player.
+
+The tree is loaded in three queries with ordered Prefetch objects and
+cached per course under a version key that Course/Module/Lesson writes
+bump. The ETag is derived from the newest updated_at in the subtree plus
+the node counts, so deletions change it as well.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from Base import versions
+
+from .models import Course, Lesson, Module
+
+VERSION_KEY = 'course_tree:{course_id}:version'
+TREE_KEY = 'course_tree:{course_id}:v{version}'
+DEFAULT_TIMEOUT = 60 * 60
+
+
+def get_version(course_id):
+    return versions.read_version(VERSION_KEY.format(course_id=course_id))
+
+
+def bump_version(course_id):
+    versions.bump_version(VERSION_KEY.format(course_id=course_id))
+
+
+def load_course(course_id):
+    lessons = Lesson.objects.order_by('order', 'created_at').defer('content')
+    modules = Module.objects.order_by('order', 'created_at').prefetch_related(Prefetch('lessons', queryset=lessons))
+    return (
+        Course.objects.select_related('category')
+        .prefetch_related(Prefetch('modules', queryset=modules))
+        .filter(pk=course_id)
+        .first()
+    )
+
+
+def tree_etag(course):
+    modules = list(course.modules.all())
+    lessons = [lesson for module in modules for lesson in module.lessons.all()]
+    newest = max(node.updated_at for node in [course, *modules, *lessons])
+    raw = f'{course.pk}:{newest.isoformat()}:{len(modules)}:{len(lessons)}'
+    return '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+
+def get_tree(course_id, serializer_class):
+    """Return {'etag', 'data'} for the course, or None if it does not exist."""
+    key = TREE_KEY.format(course_id=course_id, version=get_version(course_id))
+    payload = cache.get(key)
+    if payload is None:
+        course = load_course(course_id)
+        if course is None:
+            return None
+        payload = {'etag': tree_etag(course), 'data': serializer_class(course).data}
+        cache.set(key, payload, timeout=getattr(settings, 'COURSE_TREE_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+    return payload
@@ -2,9 +2,11 @@ from django.urls import path
 from .views import (
     CategoryListAPIView, CategoryCreateAPIView, CategoryDetailAPIView, CategoryPutAPIView, CategoryDeleteAPIView,
     CourseListAPIView, CourseCreateAPIView, CourseDetailAPIView, CoursePutAPIView, CourseDeleteAPIView,
+    CourseStatsAPIView, CourseCatalogAPIView, CourseTreeAPIView,
     ModuleListAPIView, ModuleCreateAPIView, ModuleDetailAPIView, ModulePutAPIView, ModuleDeleteAPIView,
     LessonCreateAPIView, LessonListAPIView, LessonDetailAPIView, LessonPutAPIView, LessonDeleteAPIView,
     ProgressListAPIView, ProgressDetailAPIView,ProgresscreateAPIView,
+    ProgressSummaryAPIView, CourseProgressSummaryAPIView,
     ReviewListAPIView, ReviewCreateAPIView, ReviewDetailAPIView, ReviewDeleteAPIView
 )
 
@@ -19,9 +21,12 @@ urlpatterns = [
     # Course
     path('courses/', CourseListAPIView.as_view(), name='course-list'),
     path('courses/create/', CourseCreateAPIView.as_view(), name='course-create'),
+    path('courses/catalog/', CourseCatalogAPIView.as_view(), name='course-catalog'),
     path('courses/<uuid:pk>/', CourseDetailAPIView.as_view(), name='course-detail'),
+    path('courses/<uuid:pk>/tree/', CourseTreeAPIView.as_view(), name='course-tree'),
     path('courses/<uuid:pk>/put/', CoursePutAPIView.as_view(), name='course-put'),
     path('courses/<uuid:pk>/delete/', CourseDeleteAPIView.as_view(), name='course-delete'),
+    path('courses/<uuid:pk>/stats/', CourseStatsAPIView.as_view(), name='course-stats'),
 
     # Module
     path('modules/', ModuleListAPIView.as_view(), name='module-list'),
@@ -40,6 +45,8 @@ urlpatterns = [
     # Progress
     path('progress/', ProgressListAPIView.as_view(), name='progress-list'),
     path('progress/<uuid:pk>/', ProgressDetailAPIView.as_view(), name='progress-detail'),
+    path('progress/summary/', ProgressSummaryAPIView.as_view(), name='progress-summary'),
+    path('progress/summary/<uuid:course_id>/', CourseProgressSummaryAPIView.as_view(), name='course-progress-summary'),
     path('progress/create/', LessonCreateAPIView.as_view(), name='progress-create'),
 
     # Review
@@ -2,8 +2,11 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from Course import serializers, models
+import uuid
+from django.utils.http import parse_etags
+from Course import serializers, models, stats, catalog, search, tree, progress
 from .permissions import IsCustomAdminUser
+from Base.pagination import KeysetPaginationMixin
 
 
 
@@ -65,13 +68,43 @@ class CategoryDeleteAPIView(APIView):
 
 
 # === COURSE ===
-class CourseListAPIView(APIView):
+class CourseListAPIView(KeysetPaginationMixin, APIView):
     def get(self, request):
         courses = models.Course.objects.all()
+        page = self.paginate_queryset(courses)
+        if page is not None:
+            return self.get_paginated_response(serializers.CourseSerializer(page, many=True).data)
         serializer = serializers.CourseSerializer(courses, many=True)
         return Response(serializer.data)
 
 
+class CourseCatalogAPIView(APIView):
+    """
+    Katalog: ?q= (to'liq matnli qidiruv), ?category=, ?level=, ?is_free=,
+    ?price_min=, ?price_max=, ?sort=relevance|popular|rating|newest|price|-price,
+    ?page=, ?page_size=. Javobda facet hisoblari ham qaytadi.
+    """
+    def get(self, request):
+        data = catalog.get_catalog(request.query_params, serializers.CourseCatalogSerializer, search.get_backend())
+        return Response(data)
+
+
+class CourseTreeAPIView(APIView):
+    """Kurs, uning modullari va darslar ro'yxati bitta so'rovda"""
+    def get(self, request, pk):
+        payload = tree.get_tree(pk, serializers.CourseTreeSerializer)
+        if payload is None:
+            return Response({"detail": "Kurs topilmadi"}, status=status.HTTP_404_NOT_FOUND)
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if payload['etag'] in if_none_match or '*' in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(payload['data'])
+        response['ETag'] = payload['etag']
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
 class CourseCreateAPIView(APIView):
     def post(self, request):
         # Faqat admin foydalanuvchi
@@ -93,6 +126,18 @@ class CourseDetailAPIView(APIView):
         return Response(serializer.data)
 
 
+class CourseStatsAPIView(APIView):
+    def get(self, request, pk):
+        course = get_object_or_404(models.Course, pk=pk)
+        course_stats = models.CourseStats.objects.filter(course=course).first()
+        if course_stats is None:
+            # Eski kurslar uchun statistika manba jadvallardan quriladi
+            stats.recount([course.pk])
+            course_stats = models.CourseStats.objects.get(course=course)
+        serializer = serializers.CourseStatsSerializer(course_stats)
+        return Response(serializer.data)
+
+
 class CoursePutAPIView(APIView):
     def put(self, request, pk):
         # Faqat admin foydalanuvchi
@@ -123,7 +168,13 @@ class CourseDeleteAPIView(APIView):
 class ModuleListAPIView(APIView):
     def get(self, request):
         
-        modules = models.Module.objects.all()
+        modules = models.Module.objects.order_by('order', 'created_at')
+        course_id = request.query_params.get('course')
+        if course_id:
+            try:
+                modules = modules.filter(course_id=uuid.UUID(course_id))
+            except ValueError:
+                return Response({"detail": "Noto'g'ri kurs identifikatori"}, status=status.HTTP_400_BAD_REQUEST)
         serializer = serializers.ModuleListSerializer(modules, many=True)
         return Response(serializer.data)
 
@@ -172,9 +223,12 @@ class ModuleDeleteAPIView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 # === LESSON ===
-class LessonListAPIView(APIView):
+class LessonListAPIView(KeysetPaginationMixin, APIView):
     def get(self, request):
         lessons = models.Lesson.objects.all()
+        page = self.paginate_queryset(lessons)
+        if page is not None:
+            return self.get_paginated_response(serializers.LessonListSerializer(page, many=True).data)
         serializer = serializers.LessonListSerializer(lessons, many=True)
         return Response(serializer.data)
 
@@ -220,12 +274,39 @@ class LessonDeleteAPIView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 # === PROGRESS ===
-class ProgressListAPIView(APIView):
+class ProgressListAPIView(KeysetPaginationMixin, APIView):
     def get(self, request):
         progresses = models.Progress.objects.all()
+        # Oddiy foydalanuvchi faqat o'z yozuvlarini ko'radi
+        if request.user.role != 'admin' and not request.user.is_staff:
+            progresses = progresses.filter(user=request.user)
+        page = self.paginate_queryset(progresses)
+        if page is not None:
+            return self.get_paginated_response(serializers.ProgressSerializer(page, many=True).data)
         serializer = serializers.ProgressSerializer(progresses, many=True)
         return Response(serializer.data)
 
+class ProgressSummaryAPIView(APIView):
+    """Foydalanuvchining har bir kurs bo'yicha umumiy progressi"""
+    def get(self, request):
+        summaries = progress.summaries(request.user)
+        serializer = serializers.CourseProgressSerializer(summaries, many=True)
+        return Response(serializer.data)
+
+class CourseProgressSummaryAPIView(APIView):
+    """Bitta kurs bo'yicha progress va modullar kesimi"""
+    def get(self, request, course_id):
+        course = get_object_or_404(models.Course, pk=course_id)
+        summary = progress.summaries(request.user).filter(course=course).first()
+        if summary is None:
+            summary = models.CourseProgress(user=request.user, course=course)
+            summary.total_lessons = models.Lesson.objects.filter(module__course=course).count()
+        data = serializers.CourseProgressSerializer(summary).data
+        data['modules'] = serializers.ModuleProgressSerializer(
+            progress.module_breakdown(request.user, course.pk), many=True
+        ).data
+        return Response(data)
+
 class ProgresscreateAPIView(APIView):
     def post(self, request):
         serializer = serializers.ProgressCreateSerializer(data=request.data)
@@ -242,9 +323,12 @@ class ProgressDetailAPIView(APIView):
 
 
 # === REVIEW ===
-class ReviewListAPIView(APIView):
+class ReviewListAPIView(KeysetPaginationMixin, APIView):
     def get(self, request):
         reviews = models.Review.objects.all()
+        page = self.paginate_queryset(reviews)
+        if page is not None:
+            return self.get_paginated_response(serializers.ReviewSerializer(page, many=True).data)
         serializer = serializers.ReviewSerializer(reviews, many=True)
         return Response(serializer.data)
 
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished
 
 
 class CustomeruserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'CustomerUser'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .audit import flush_on_request_finished
+        request_finished.connect(flush_on_request_finished, dispatch_uid='audit_log_flush')
@@ -0,0 +1,192 @@
+"""
+Buffered UserActivity audit log.
+
+Views call record_activity(), which only appends an unsaved UserActivity to an
+in-process buffer. The buffer is written with bulk_create once it holds
+BATCH_SIZE events or FLUSH_INTERVAL seconds have passed; the check runs on
+request_finished, i.e. after the response has been sent, and every
+FLUSH_TICK seconds on a daemon thread, so an idle worker still writes its
+events. Everything left is written at interpreter exit.
+
+A failed flush puts its batch back in front of newer events. Events that
+failed MAX_RETRIES times are dropped, and the re-queued buffer is trimmed to
+MAX_BUFFER the same way back-pressure does.
+
+Back-pressure: once MAX_BUFFER events are queued, low-value events are dropped
+first and only then does a caller flush synchronously. SAMPLE_RATES keeps only
+a fraction of noisy event types such as profile views.
+
+Settings:
+    AUDIT_LOG = {...}              # overrides DEFAULTS below
+    AUDIT_LOG_ASYNC = True         # False leaves flushing to requests and exit (tests, scripts)
+"""
+import atexit
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import UserActivity
+
+logger = logging.getLogger(__name__)
+
+FLUSH_TICK = 1
+
+DEFAULTS = {
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 5,
+    'MAX_BUFFER': 10000,
+    'MAX_RETRIES': 3,
+    'SAMPLE_RATES': {'profile_view': 0.1},
+    'LOW_PRIORITY': ('profile_view',),
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'AUDIT_LOG', {})}
+
+
+class ActivityBuffer:
+    def __init__(self):
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flusher = None
+        self._stopped = threading.Event()
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._events)
+
+    def record(self, activity_type, ip_address, user_agent='', user=None):
+        """Queue an event; returns False if it was sampled out or dropped."""
+        config = get_config()
+        rate = config['SAMPLE_RATES'].get(activity_type, 1.0)
+        if rate < 1 and random.random() >= rate:
+            return False
+
+        event = UserActivity(
+            user=user,
+            activity_type=activity_type,
+            ip_address=ip_address,
+            user_agent=user_agent,
+        )
+        must_flush = False
+        with self._lock:
+            if len(self._events) >= config['MAX_BUFFER']:
+                if activity_type in config['LOW_PRIORITY']:
+                    self.dropped += 1
+                    return False
+                if not self._evict_low_priority(config):
+                    must_flush = True
+            self._events.append(event)
+        if must_flush:
+            self.flush()
+        self._start_flusher()
+        return True
+
+    def _start_flusher(self):
+        if self._flusher is not None or not getattr(settings, 'AUDIT_LOG_ASYNC', True):
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, name='audit-log', daemon=True)
+                self._flusher.start()
+
+    def stop(self):
+        """Stop the flush thread; queued events stay in the buffer."""
+        self._stopped.set()
+        with self._lock:
+            flusher, self._flusher = self._flusher, None
+        if flusher is not None:
+            flusher.join()
+        self._stopped.clear()
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(FLUSH_TICK):
+            if not getattr(settings, 'AUDIT_LOG_ASYNC', True):
+                continue
+            try:
+                if self.flush_if_due():
+                    close_old_connections()
+            except Exception as e:
+                logger.error(f"Audit log flush thread error: {str(e)}")
+
+    def _evict_low_priority(self, config):
+        for index, queued in enumerate(self._events):
+            if queued.activity_type in config['LOW_PRIORITY']:
+                del self._events[index]
+                self.dropped += 1
+                return True
+        return False
+
+    def flush_if_due(self):
+        config = get_config()
+        if not self._events:
+            return 0
+        if len(self._events) >= config['BATCH_SIZE'] or time.monotonic() - self._last_flush >= config['FLUSH_INTERVAL']:
+            return self.flush()
+        return 0
+
+    def flush(self):
+        with self._lock:
+            batch = list(self._events)
+            self._events.clear()
+            self._last_flush = time.monotonic()
+        if not batch:
+            return 0
+        try:
+            UserActivity.objects.bulk_create(batch, batch_size=get_config()['BATCH_SIZE'])
+        except Exception as e:
+            lost = self._requeue(batch)
+            logger.error(f"Audit log flush failed, {len(batch) - lost} events re-queued, {lost} lost: {str(e)}")
+            return 0
+        return len(batch)
+
+    def _requeue(self, batch):
+        """Put a failed batch back in front of the buffer; returns the number of events dropped."""
+        config = get_config()
+        retried = []
+        for event in batch:
+            event._flush_failures = getattr(event, '_flush_failures', 0) + 1
+            if event._flush_failures < config['MAX_RETRIES']:
+                retried.append(event)
+        with self._lock:
+            events = retried + list(self._events)
+            overflow = len(events) - config['MAX_BUFFER']
+            if overflow > 0:
+                # Avval past ustuvor, keyin eng eski hodisalar tashlanadi
+                low = [index for index, event in enumerate(events) if event.activity_type in config['LOW_PRIORITY']]
+                low = set(low[:overflow])
+                events = [event for index, event in enumerate(events) if index not in low][overflow - len(low):]
+            self._events = deque(events)
+            lost = len(batch) - len(retried) + max(overflow, 0)
+            self.dropped += lost
+        return lost
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+
+
+activity_buffer = ActivityBuffer()
+
+
+def record_activity(request, activity_type, user=None):
+    return activity_buffer.record(
+        activity_type=activity_type,
+        ip_address=request.META.get('REMOTE_ADDR') or '127.0.0.1',
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        user=user,
+    )
+
+
+def flush_on_request_finished(sender, **kwargs):
+    activity_buffer.flush_if_due()
+
+
+atexit.register(activity_buffer.flush)
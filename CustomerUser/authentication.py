@@ -0,0 +1,58 @@
+"""
+JWT authentication that serves the user from the cache.
+
+JWTAuthentication loads the user row on every request. Here the loaded user
+is kept in the cache under its id for AUTH_USER_CACHE_TIMEOUT seconds, so a
+steady stream of requests with the same token costs no queries. Entries are
+dropped from the CustomerUser signals (save, delete, password change,
+deactivation), on logout and when a refresh token is blacklisted; the
+is_active and revoke checks still run against the cached copy.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+KEY_PREFIX = 'auth_user'
+DEFAULT_TIMEOUT = 60
+
+
+def user_cache_key(user_id):
+    return f'{KEY_PREFIX}:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    if user_id is not None:
+        cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = user_cache_key(user_id)
+        try:
+            user = cache.get(key)
+        except Exception:
+            user = None
+        if user is None:
+            # Birinchi so'rov: bazadan olinadi va barcha tekshiruvlar bajariladi
+            user = super().get_user(validated_token)
+            try:
+                cache.set(key, user, timeout=getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+            except Exception:
+                pass
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,45 @@
+"""
+Cache of login identifier (username or email) -> user id.
+
+CustomerUserManager.resolve() reads this first and then fetches the user by
+primary key; on a miss it runs a single username-OR-email query and stores the
+id here. Entries are short lived and are dropped from the model signals
+whenever a user's username or email changes, so a stale id can only survive
+for the TTL and is still re-checked against the fetched row.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = 'user_ident'
+DEFAULT_TIMEOUT = 300
+
+
+def _timeout():
+    return getattr(settings, 'USER_LOOKUP_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def identifier_key(identifier):
+    digest = hashlib.sha256(str(identifier).encode()).hexdigest()[:32]
+    return f'{KEY_PREFIX}:{digest}'
+
+
+def get_cached_user_id(identifier):
+    try:
+        return cache.get(identifier_key(identifier))
+    except Exception:
+        return None
+
+
+def cache_user_id(identifier, user_id):
+    try:
+        cache.set(identifier_key(identifier), user_id, timeout=_timeout())
+    except Exception:
+        pass
+
+
+def forget_identifiers(*identifiers):
+    keys = [identifier_key(value) for value in identifiers if value]
+    if keys:
+        cache.delete_many(keys)
@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+from django.db.models import Q
+from django.utils import timezone
 from Base.models import BaseModel
+from .lookups import cache_user_id, forget_identifiers, get_cached_user_id
 
 class CustomerUserManager(BaseUserManager):
     def create_user(self, username, email=None, phone_number=None, password=None, **extra_fields):
@@ -31,11 +34,34 @@ class CustomerUserManager(BaseUserManager):
             raise ValueError('Superuser must have is_superuser=True.')
         return self.create_user(username, email, phone_number, password, **extra_fields)
 
+    def resolve(self, identifier):
+        """
+        Username yoki email bo'yicha foydalanuvchini topish (bitta so'rov).
+        Identifier -> id kesh orqali olinadi; topilmasa username OR email so'rovi ishlaydi.
+        """
+        if not identifier:
+            return None
+        user_id = get_cached_user_id(identifier)
+        if user_id is not None:
+            user = self.filter(pk=user_id).first()
+            # Keshdagi id eskirgan bo'lishi mumkin - qatorni qayta tekshiramiz
+            if user and identifier in (user.username, user.email):
+                return user
+            forget_identifiers(identifier)
+        candidates = list(self.filter(Q(username=identifier) | Q(email=identifier))[:2])
+        if not candidates:
+            return None
+        # Username bo'yicha moslik email mosligidan ustun
+        user = next((candidate for candidate in candidates if candidate.username == identifier), candidates[0])
+        cache_user_id(identifier, user.pk)
+        if user.username != identifier:
+            # authenticate() foydalanuvchini username bo'yicha qayta qidiradi
+            cache_user_id(user.username, user.pk)
+        return user
+
     def get_by_natural_key(self, username):
         # Username yoki email bo'yicha qidirish
-        user_by_username = self.filter(username=username).first()
-        user_by_email = self.filter(email=username).first()
-        user = user_by_username or user_by_email
+        user = self.resolve(username)
         if user:
             return user
         raise self.model.DoesNotExist("Foydalanuvchi topilmadi.")
@@ -65,6 +91,13 @@ class CustomerUser(AbstractBaseUser, PermissionsMixin, BaseModel):
 
     objects = CustomerUserManager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Login identifikatorlari o'zgarganda keshni tozalash uchun asl qiymatlar
+        instance._loaded_identifiers = (instance.__dict__.get('username'), instance.__dict__.get('email'))
+        return instance
+
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
 
@@ -97,7 +130,8 @@ class UserActivity(models.Model):
     activity_type = models.CharField(max_length=50, choices=ACTIVITY_TYPES)
     ip_address = models.GenericIPAddressField()
     user_agent = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # default instead of auto_now_add: buffered events keep the time they happened
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         verbose_name = 'User Activity'
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from Base.serializers import ImageVariantsField
 from .models import CustomerUser, UserActivity, Notification
 
 class CustomerUserSerializer(serializers.Serializer):
@@ -18,6 +19,7 @@ class CustomerUserSerializer(serializers.Serializer):
     is_staff = serializers.BooleanField(read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
     last_login = serializers.DateTimeField(read_only=True)
+    avatar_variants = ImageVariantsField(source='avatar')
 
     def create(self, validated_data):
         return CustomerUser.objects.create(**validated_data)
@@ -71,18 +73,12 @@ class LoginSerializer(serializers.Serializer):
         password = data.get('password')
 
         # Username yoki email orqali foydalanuvchini qidirish
-        user = None
-        if login_input:
-            # Avval username bo'yicha qidiramiz
-            user_by_username = CustomerUser.objects.filter(username=login_input).first()
-            # Agar username bo'yicha topilmasa, email bo'yicha qidiramiz
-            user_by_email = CustomerUser.objects.filter(email=login_input).first()
-            # Ikkalasidan birini tanlaymiz
-            user = user_by_username or user_by_email
+        # Username bo'yicha moslik ustun, aks holda email bo'yicha (bitta so'rov)
+        user = CustomerUser.objects.resolve(login_input)
 
         if user:
             # Django autentifikatsiyasidan foydalanamiz
-            authenticated_user = authenticate(username=user.username, password=password)
+            authenticated_user = authenticate(self.context.get('request'), username=user.username, password=password)
             if authenticated_user and authenticated_user.is_active:
                 return authenticated_user
             raise serializers.ValidationError("Parol noto'g'ri.")
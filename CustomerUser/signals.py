@@ -0,0 +1,34 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+from .lookups import forget_identifiers
+from .models import CustomerUser
+
+
+@receiver(post_save, sender=CustomerUser)
+def user_saved(sender, instance, created, **kwargs):
+    current = (instance.username, instance.email)
+    loaded = getattr(instance, '_loaded_identifiers', None)
+    if loaded and loaded != current:
+        forget_identifiers(*loaded, *current)
+    elif created:
+        forget_identifiers(*current)
+    instance._loaded_identifiers = current
+    # Rol, is_active yoki parol o'zgargan bo'lishi mumkin
+    invalidate_cached_user(str(instance.pk))
+
+
+@receiver(post_delete, sender=CustomerUser)
+def user_deleted(sender, instance, **kwargs):
+    forget_identifiers(instance.username, instance.email)
+    invalidate_cached_user(str(instance.pk))
+
+
+if apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+    @receiver(post_save, sender=BlacklistedToken)
+    def token_blacklisted(sender, instance, created, **kwargs):
+        invalidate_cached_user(str(instance.token.user_id) if instance.token.user_id else None)
@@ -1,8 +1,27 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from .models import CustomerUser, Notification, UserActivity
+from .throttling import login_limiter
+from .audit import activity_buffer, ActivityBuffer
+from .authentication import user_cache_key
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.contrib.auth.signals import user_login_failed
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
+import time
+
+class ActivityBufferMixin:
+    """Buferdagi hodisalar keyingi testlarga o'tmasligi uchun bufer tozalanadi"""
+
+    def setUp(self):
+        activity_buffer.clear()
+        self.addCleanup(activity_buffer.clear)
+        super().setUp()
+
 
 class CustomerUserModelTests(TestCase):
     def setUp(self):
@@ -51,8 +70,10 @@ class CustomerUserModelTests(TestCase):
         self.assertTrue(superuser.is_staff)
         self.assertTrue(superuser.is_superuser)
 
-class CustomerUserAPITests(APITestCase):
+@override_settings(AUDIT_LOG_ASYNC=False)
+class CustomerUserAPITests(ActivityBufferMixin, APITestCase):
     def setUp(self):
+        super().setUp()
         self.register_url = reverse('user-list')
         self.login_url = reverse('login')
         self.user_data = {
@@ -262,11 +283,284 @@ class CustomerUserAPITests(APITestCase):
         self.client.force_authenticate(user=user)
         
         # Bir nechta amallarni bajaramiz
-        self.client.get('/users/me/')  # Profilni olish
-        self.client.post('/logout/')  # Tizimdan chiqish
+        with self.settings(AUDIT_LOG={'SAMPLE_RATES': {}}):
+            self.client.get('/users/me/')  # Profilni olish
+            self.client.post('/logout/')  # Tizimdan chiqish
+        activity_buffer.flush()  # Bufer ma'lumotlari bazaga yoziladi
         
         # Faoliyatlarni tekshiramiz
         activities = UserActivity.objects.filter(user=user).order_by('created_at')
         self.assertEqual(activities.count(), 2)  # 2 ta faoliyat: profil olish va chiqish
         self.assertEqual(activities[0].activity_type, 'profile_view')
         self.assertEqual(activities[1].activity_type, 'logout')
+
+@override_settings(AUDIT_LOG_ASYNC=False)
+class LoginThrottleTests(ActivityBufferMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.login_url = reverse('login')
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def test_blocked_after_failed_attempts(self):
+        """Test 5 ta muvaffaqiyatsiz urinishdan keyin bloklash"""
+        for _ in range(5):
+            response = self.client.post(self.login_url, {'username': 'testuser', 'password': 'wrong'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(self.login_url, {'username': 'testuser', 'password': 'testpass123'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_username_bucket_across_ips(self):
+        """Test bitta akkauntga turli IP lardan urinishlar ham hisoblanishi"""
+        for i in range(5):
+            self.client.post(self.login_url, {'username': 'testuser', 'password': 'wrong'},
+                             format='json', REMOTE_ADDR=f'10.0.0.{i}')
+        response = self.client.post(self.login_url, {'username': 'testuser', 'password': 'testpass123'},
+                                    format='json', REMOTE_ADDR='10.0.0.99')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_throttle_does_not_read_activity_table(self):
+        """Test login tekshiruvi UserActivity jadvalini o'qimasligi"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.login_url, {'username': 'testuser', 'password': 'wrong'}, format='json')
+        self.assertFalse([q for q in queries.captured_queries
+                          if 'useractivity' in q['sql'].lower() and q['sql'].lstrip().upper().startswith('SELECT')])
+        activity_buffer.flush()
+        self.assertTrue(UserActivity.objects.filter(activity_type='login_attempt').exists())
+
+    def test_success_resets_username_bucket(self):
+        """Test muvaffaqiyatli kirish akkaunt hisoblagichini tozalashi"""
+        for _ in range(4):
+            self.client.post(self.login_url, {'username': 'testuser', 'password': 'wrong'},
+                             format='json', REMOTE_ADDR='10.0.0.1')
+        response = self.client.post(self.login_url, {'username': 'testuser', 'password': 'testpass123'},
+                                    format='json', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(login_limiter.count('user', 'testuser'), 0)
+
+
+@override_settings(AUDIT_LOG_ASYNC=False)
+class ActivityBufferTests(ActivityBufferMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_profile_view_does_not_insert(self):
+        """Test profilni ko'rish so'rov ichida bazaga yozmasligi"""
+        with self.settings(AUDIT_LOG={'SAMPLE_RATES': {}, 'FLUSH_INTERVAL': 3600}), CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/users/me/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in queries.captured_queries if 'INSERT' in q['sql'].upper()])
+        self.assertEqual(len(activity_buffer), 1)
+
+    def test_flush_in_batches(self):
+        """Test hodisalar bulk_create bilan paket holida yozilishi"""
+        with self.settings(AUDIT_LOG={'SAMPLE_RATES': {}, 'BATCH_SIZE': 3, 'FLUSH_INTERVAL': 3600}):
+            for _ in range(3):
+                self.client.get('/users/me/')
+        self.assertEqual(len(activity_buffer), 0)
+        self.assertEqual(UserActivity.objects.filter(user=self.user, activity_type='profile_view').count(), 3)
+
+    def test_sampling_drops_low_value_events(self):
+        """Test past qiymatli hodisalar namunaga olinishi"""
+        buffer = ActivityBuffer()
+        with self.settings(AUDIT_LOG={'SAMPLE_RATES': {'profile_view': 0}}):
+            self.assertFalse(buffer.record('profile_view', '127.0.0.1', user=self.user))
+            self.assertTrue(buffer.record('logout', '127.0.0.1', user=self.user))
+        self.assertEqual(len(buffer), 1)
+
+    def test_back_pressure(self):
+        """Test bufer to'lganda past ustuvor hodisalar chiqarib yuborilishi"""
+        buffer = ActivityBuffer()
+        with self.settings(AUDIT_LOG={'SAMPLE_RATES': {}, 'MAX_BUFFER': 2}):
+            buffer.record('profile_view', '127.0.0.1', user=self.user)
+            buffer.record('login', '127.0.0.1', user=self.user)
+            self.assertFalse(buffer.record('profile_view', '127.0.0.1', user=self.user))
+            self.assertTrue(buffer.record('logout', '127.0.0.1', user=self.user))
+            self.assertEqual([e.activity_type for e in buffer._events], ['login', 'logout'])
+            # Chiqarib yuboriladigan hodisa yo'q - bufer darhol yoziladi
+            self.assertTrue(buffer.record('password_change', '127.0.0.1', user=self.user))
+        self.assertEqual(buffer.dropped, 2)
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(len(buffer), 0)
+
+    def test_failed_flush_requeues_batch(self):
+        """Test yozilmagan paket buferga qaytarilishi va cheklanishi"""
+        buffer = ActivityBuffer()
+        with self.settings(AUDIT_LOG={'SAMPLE_RATES': {}, 'MAX_BUFFER': 3, 'MAX_RETRIES': 2}):
+            for activity_type in ('login', 'profile_view', 'logout'):
+                buffer.record(activity_type, '127.0.0.1', user=self.user)
+            with patch.object(UserActivity.objects, 'bulk_create', side_effect=DatabaseError('locked')):
+                self.assertEqual(buffer.flush(), 0)
+                self.assertEqual(len(buffer), 3)
+                buffer.record('password_change', '127.0.0.1', user=self.user)
+                self.assertEqual(buffer.flush(), 0)
+            # Ikkinchi muvaffaqiyatsizlikdan keyin eski hodisalar tashlanadi
+            self.assertEqual([e.activity_type for e in buffer._events], ['password_change'])
+            self.assertEqual(buffer.dropped, 3)
+            self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 1)
+
+    def test_requeue_keeps_buffer_bounded(self):
+        """Test qaytarilgan paket MAX_BUFFER dan oshmasligi"""
+        buffer = ActivityBuffer()
+        with self.settings(AUDIT_LOG={'SAMPLE_RATES': {}, 'MAX_BUFFER': 3}):
+            for activity_type in ('login', 'profile_view', 'logout'):
+                buffer.record(activity_type, '127.0.0.1', user=self.user)
+            batch = list(buffer._events)
+            buffer.clear()
+            buffer.record('password_change', '127.0.0.1', user=self.user)
+            self.assertEqual(buffer._requeue(batch), 1)
+        self.assertEqual([e.activity_type for e in buffer._events], ['login', 'logout', 'password_change'])
+
+    @override_settings(AUDIT_LOG_ASYNC=True, AUDIT_LOG={'SAMPLE_RATES': {}, 'FLUSH_INTERVAL': 0})
+    def test_idle_buffer_flushed_by_thread(self):
+        """Test so'rovlarsiz ham bufer vaqt bo'yicha yozilishi"""
+        buffer = ActivityBuffer()
+        with patch.object(buffer, 'flush_if_due', return_value=0) as flush_if_due:
+            buffer.record('logout', '127.0.0.1', user=self.user)
+            flusher = buffer._flusher
+            try:
+                deadline = time.monotonic() + 5
+                while not flush_if_due.called and time.monotonic() < deadline:
+                    time.sleep(0.05)
+            finally:
+                buffer.stop()
+        self.assertTrue(flush_if_due.called)
+        self.assertTrue(flusher.daemon)
+        self.assertFalse(flusher.is_alive())
+
+
+@override_settings(AUDIT_LOG_ASYNC=False)
+class UserResolverTests(ActivityBufferMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def test_resolve_single_query(self):
+        """Test username yoki email bitta so'rov bilan topilishi"""
+        with self.assertNumQueries(1):
+            self.assertEqual(CustomerUser.objects.resolve('test@example.com'), self.user)
+        # Keshdan id olinadi, so'ng faqat pk bo'yicha so'rov
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(CustomerUser.objects.resolve('test@example.com'), self.user)
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertNotIn(' OR ', queries.captured_queries[0]['sql'])
+        self.assertIsNone(CustomerUser.objects.resolve('missing@example.com'))
+
+    def test_username_match_preferred(self):
+        """Test username mosligi email mosligidan ustun bo'lishi"""
+        other = CustomerUser.objects.create_user(username='test@example.org', email='other@example.com', password='x')
+        CustomerUser.objects.filter(pk=self.user.pk).update(email='test@example.org')
+        self.assertEqual(CustomerUser.objects.resolve('test@example.org'), other)
+
+    def test_email_change_invalidates_cache(self):
+        """Test email o'zgarganda kesh tozalanishi"""
+        CustomerUser.objects.resolve('test@example.com')
+        user = CustomerUser.objects.get(pk=self.user.pk)
+        user.email = 'new@example.com'
+        user.save()
+        self.assertIsNone(CustomerUser.objects.resolve('test@example.com'))
+        self.assertEqual(CustomerUser.objects.resolve('new@example.com'), self.user)
+
+    def test_stale_cache_entry_is_rechecked(self):
+        """Test keshdagi eskirgan id qayta tekshirilishi"""
+        CustomerUser.objects.resolve('test@example.com')
+        # Signal ishlamaydigan update() - kesh eskiradi
+        CustomerUser.objects.filter(pk=self.user.pk).update(email='moved@example.com')
+        self.assertIsNone(CustomerUser.objects.resolve('test@example.com'))
+
+    def test_login_flows_use_resolver(self):
+        """Test login va JWT token olish email orqali ishlashi"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('login'), {'username': 'test@example.com', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lookups = [q['sql'] for q in queries.captured_queries
+                   if q['sql'].lstrip().upper().startswith('SELECT') and 'customeruser_customeruser' in q['sql'].lower()]
+        # Username/email bo'yicha bitta qidiruv; authenticate() id bo'yicha keshdan o'qiydi
+        self.assertEqual(len([sql for sql in lookups if ' OR ' in sql]), 1)
+        self.assertEqual(len(lookups), 2)
+
+        received = []
+        user_login_failed.connect(lambda sender, **kwargs: received.append(kwargs), weak=False,
+                                 dispatch_uid='test_login_failed')
+        try:
+            response = self.client.post(reverse('login'), {'username': 'test@example.com', 'password': 'wrong'})
+        finally:
+            user_login_failed.disconnect(dispatch_uid='test_login_failed')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(len(received), 1)
+
+        response = self.client.post('/api/token/', {'username': 'test@example.com', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.data)
+
+
+@override_settings(AUDIT_LOG_ASYNC=False)
+class CachedJWTAuthenticationTests(ActivityBufferMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            role='student'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/users/me/')
+        selects = [q for q in queries.captured_queries
+                   if 'from "customeruser_customeruser"' in q['sql'].lower()]
+        return response, selects
+
+    def test_user_served_from_cache(self):
+        """Test ikkinchi so'rovda foydalanuvchi bazadan o'qilmasligi"""
+        response, selects = self.user_queries()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(selects), 1)
+        response, selects = self.user_queries()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(selects, [])
+
+    def test_role_change_invalidates_cache(self):
+        """Test rol o'zgarganda kesh yangilanishi"""
+        self.user_queries()
+        self.user.role = 'teacher'
+        self.user.save()
+        response, selects = self.user_queries()
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(response.data['role'], 'teacher')
+
+    def test_deactivated_user_rejected(self):
+        """Test faolsizlantirilgan foydalanuvchi rad etilishi"""
+        self.user_queries()
+        self.user.is_active = False
+        self.user.save()
+        response, _ = self.user_queries()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_inactive_user_rejected(self):
+        """Test keshdagi nusxa uchun ham is_active tekshirilishi"""
+        self.user.is_active = False
+        cache.set(user_cache_key(str(self.user.pk)), self.user)
+        response, selects = self.user_queries()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(selects, [])
@@ -0,0 +1,68 @@
+"""
+Sliding-window limiter for failed logins, kept in the Django cache.
+
+The window is split into fixed sub-buckets; a failure increments the current
+bucket atomically (cache.add + cache.incr) and the window count is the sum of
+the live buckets read with one get_many. Separate buckets are kept per client
+IP and per username, so neither a single address nor a distributed attack on
+one account can keep guessing. Nothing here touches the database.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULTS = {
+    'LIMIT': 5,
+    'WINDOW': 15 * 60,
+    'BUCKETS': 15,
+}
+
+
+class LoginAttemptLimiter:
+    key_prefix = 'login_attempts'
+
+    def __init__(self, limit=None, window=None, buckets=None):
+        config = {**DEFAULTS, **getattr(settings, 'LOGIN_THROTTLE', {})}
+        self.limit = limit or config['LIMIT']
+        self.window = window or config['WINDOW']
+        self.buckets = buckets or config['BUCKETS']
+        self.bucket_seconds = max(1, self.window // self.buckets)
+
+    def _ident(self, value):
+        return hashlib.sha256(str(value).strip().lower().encode()).hexdigest()[:32]
+
+    def _keys(self, scope, value, now=None):
+        current = int((now or time.time()) // self.bucket_seconds)
+        ident = self._ident(value)
+        return [f'{self.key_prefix}:{scope}:{ident}:{bucket}' for bucket in range(current - self.buckets + 1, current + 1)]
+
+    def _scopes(self, ip_address, username):
+        scopes = [('ip', ip_address)]
+        if username:
+            scopes.append(('user', username))
+        return scopes
+
+    def count(self, scope, value):
+        return sum(cache.get_many(self._keys(scope, value)).values())
+
+    def is_blocked(self, ip_address, username=None):
+        return any(self.count(scope, value) >= self.limit for scope, value in self._scopes(ip_address, username))
+
+    def register_failure(self, ip_address, username=None):
+        timeout = self.window + self.bucket_seconds
+        for scope, value in self._scopes(ip_address, username):
+            key = self._keys(scope, value)[-1]
+            cache.add(key, 0, timeout=timeout)
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Bucket expired between add() and incr()
+                cache.set(key, 1, timeout=timeout)
+
+    def reset(self, username):
+        cache.delete_many(self._keys('user', username))
+
+
+login_limiter = LoginAttemptLimiter()
@@ -1,11 +1,11 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.contrib.auth import login, logout
+from django.contrib.auth import authenticate, login, logout
 from django.core.mail import send_mail
 import random
 import string
-from .models import CustomerUser, UserActivity, Notification
+from .models import CustomerUser, Notification
 from .serializers import (
     CustomerUserSerializer, 
     ChangePasswordSerializer,
@@ -15,10 +15,12 @@ from .serializers import (
 )
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
-from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
 import logging
 from django.utils import timezone
+from .throttling import login_limiter
+from .audit import record_activity
+from .authentication import invalidate_cached_user
 
 logger = logging.getLogger(__name__)
 
@@ -56,14 +58,8 @@ class CustomerUserView(APIView):
         # /users/me/ yoki /users/ (profil) uchun
         if pk == 'me' or pk is None:
             user = request.user
-            # Profil ko'rilishini log qilish
-            ip_address = request.META.get('REMOTE_ADDR') or '127.0.0.1'
-            UserActivity.objects.create(
-                user=request.user,
-                activity_type='profile_view',
-                ip_address=ip_address,
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
-            )
+            # Profil ko'rilishini log qilish (bufer orqali, so'rov ichida yozilmaydi)
+            record_activity(request, 'profile_view', user=request.user)
             return Response(CustomerUserSerializer(user).data)
         else:
             # Faqat staff boshqa userlarni ko'ra oladi
@@ -73,14 +69,8 @@ class CustomerUserView(APIView):
                     status=status.HTTP_403_FORBIDDEN
                 )
             user = get_object_or_404(CustomerUser, pk=pk)
-            # Profil ko'rilishini log qilish
-            ip_address = request.META.get('REMOTE_ADDR') or '127.0.0.1'
-            UserActivity.objects.create(
-                user=request.user,
-                activity_type='profile_view',
-                ip_address=ip_address,
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
-            )
+            # Profil ko'rilishini log qilish (bufer orqali, so'rov ichida yozilmaydi)
+            record_activity(request, 'profile_view', user=request.user)
             return Response(CustomerUserSerializer(user).data)
 
     def put(self, request, *args, **kwargs):
@@ -123,51 +113,35 @@ class LoginView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        # Login urinishlarini tekshirish
+        # Login urinishlarini tekshirish (kesh asosida, UserActivity o'qilmaydi)
         ip_address = request.META.get('REMOTE_ADDR') or '127.0.0.1'
-        login_attempts = UserActivity.objects.filter(
-            ip_address=ip_address,
-            activity_type='login_attempt',
-            created_at__gte=timezone.now() - timezone.timedelta(minutes=15)
-        ).count()
-        
-        if login_attempts >= 5:
+        if login_limiter.is_blocked(ip_address, username):
             return Response(
                 {"detail": "Juda ko'p marta urinish. Iltimos, 15 daqiqa kutib turing."},
                 status=status.HTTP_429_TOO_MANY_REQUESTS
             )
             
-        user = None
-        user_by_username = CustomerUser.objects.filter(username=username).first()
-        user_by_email = CustomerUser.objects.filter(email=username).first()
-        user = user_by_username or user_by_email
+        # Username yoki email bo'yicha bitta so'rov (kesh orqali)
+        user = CustomerUser.objects.resolve(username)
         
         # Login urinishini log qilish
-        UserActivity.objects.create(
-            user=user,  # Agar user topilgan bo'lsa, uni log qilish
-            ip_address=ip_address,
-            activity_type='login_attempt',
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
-        )
+        record_activity(request, 'login_attempt', user=user)  # Agar user topilgan bo'lsa, uni log qilish
         
         if user:
-            authenticated_user = authenticate(username=user.username, password=password)
+            # get_by_natural_key ham resolve() orqali keshdan o'qiydi
+            authenticated_user = authenticate(request, username=user.username, password=password)
             if authenticated_user and authenticated_user.is_active:
                 # Login muvaffaqiyatli bo'ldi
                 login(request, authenticated_user)
                 
                 # Login faoliyatini log qilish
-                UserActivity.objects.create(
-                    user=authenticated_user,
-                    activity_type='login',
-                    ip_address=ip_address,
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
-                )
+                record_activity(request, 'login', user=authenticated_user)
                 
                 # Login vaqtini yangilash
                 authenticated_user.last_login = timezone.now()
                 authenticated_user.last_login_ip = ip_address
                 authenticated_user.save()
+                login_limiter.reset(username)
                 
                 refresh = RefreshToken.for_user(authenticated_user)
                 return Response({
@@ -175,10 +149,12 @@ class LoginView(APIView):
                     'refresh': str(refresh),
                     'access': str(refresh.access_token),
                 })
+            login_limiter.register_failure(ip_address, username)
             return Response(
                 {"detail": "Noto'g'ri parol"},
                 status=status.HTTP_401_UNAUTHORIZED
             )
+        login_limiter.register_failure(ip_address, username)
         return Response(
             {"detail": "Bunday foydalanuvchi topilmadi"},
             status=status.HTTP_401_UNAUTHORIZED
@@ -190,18 +166,13 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             # Logout faoliyatini log qilish
-            ip_address = request.META.get('REMOTE_ADDR') or '127.0.0.1'
-            UserActivity.objects.create(
-                user=request.user,
-                activity_type='logout',
-                ip_address=ip_address,
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
-            )
+            record_activity(request, 'logout', user=request.user)
             
             refresh_token = request.data.get('refresh')
             if refresh_token:
                 token = RefreshToken(refresh_token)
                 token.blacklist()
+                invalidate_cached_user(str(request.user.pk))
             
             logout(request)
             return Response(
@@ -231,13 +202,7 @@ class ChangePasswordView(APIView):
             user.save()
             
             # Parol o'zgartirish faoliyatini log qilish
-            ip_address = request.META.get('REMOTE_ADDR') or '127.0.0.1'
-            UserActivity.objects.create(
-                user=user,
-                activity_type='password_change',
-                ip_address=ip_address,
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
-            )
+            record_activity(request, 'password_change', user=user)
             
             return Response(
                 {"detail": "Parol muvaffaqiyatli o'zgartirildi"},
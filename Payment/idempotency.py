@@ -0,0 +1,94 @@
+"""
+Idempotency-Key support for the payment endpoints.
+
+A request carrying an ``Idempotency-Key`` header first inserts an
+IdempotencyKey row; the unique (user, key) constraint makes that insert the
+lock, so it holds across workers and nodes. The winner runs the view and
+stores its response, retries with the same key and body get that response
+replayed without calling the provider again. Reusing a key for a different
+request is rejected with 422, a retry while the first request is still
+running with 409. Server errors release the key so the client can retry.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL = timedelta(hours=24)
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, separators=(',', ':'), default=str)
+    raw = f'{request.method}:{request.path}:{body}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _claim(user, key, fingerprint):
+    """Return (record, created); created is True only for the first request."""
+    ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', DEFAULT_TTL)
+    # Muddati o'tgan kalitni qayta ishlatishga ruxsat beramiz
+    IdempotencyKey.objects.filter(user=user, key=key, created_at__lt=timezone.now() - ttl).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(user=user, key=key, fingerprint=fingerprint), True
+    except IntegrityError:
+        return IdempotencyKey.objects.filter(user=user, key=key).first(), False
+
+
+def idempotent(view_method):
+    """Decorator for APIView post() handlers."""
+
+    @functools.wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(view, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{HEADER} {MAX_KEY_LENGTH} belgidan oshmasligi kerak"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = request_fingerprint(request)
+        record, created = _claim(request.user, key, fingerprint)
+        if not created:
+            if record is not None and record.fingerprint != fingerprint:
+                return Response(
+                    {"detail": f"Bu {HEADER} boshqa so'rov uchun ishlatilgan"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record is None or record.status != 'completed':
+                return Response(
+                    {"detail": "Bu so'rov hali qayta ishlanmoqda"},
+                    status=status.HTTP_409_CONFLICT
+                )
+            response = Response(record.response_body, status=record.response_status)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = view_method(view, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            # Server xatosi - mijoz shu kalit bilan qayta urinishi mumkin
+            record.delete()
+            return response
+        record.status = 'completed'
+        record.response_status = response.status_code
+        record.response_body = response.data
+        record.save(update_fields=['status', 'response_status', 'response_body', 'updated_at'])
+        return response
+
+    return wrapper
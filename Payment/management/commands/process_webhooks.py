@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Payment.webhooks import BATCH_SIZE, MAX_WORKERS, process_webhook_inbox
+
+
+class Command(BaseCommand):
+    help = "Process queued payment provider webhooks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Payments claimed per batch")
+        parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Concurrent provider status lookups")
+        parser.add_argument('--loop', action='store_true', help="Keep polling the inbox")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep when the inbox is empty")
+
+    def handle(self, *args, **options):
+        total = {'events': 0, 'payments': 0, 'completed': 0, 'failed': 0}
+        while True:
+            stats = process_webhook_inbox(batch_size=options['batch_size'], max_workers=options['workers'])
+            for key, value in stats.items():
+                total[key] += value
+            if not stats['events']:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {total['events']} events for {total['payments']} payments "
+            f"({total['completed']} completed, {total['failed']} failed)"
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from Payment.reconciliation import CHUNK_SIZE, MAX_WORKERS, OLDER_THAN_MINUTES, reconcile_pending_payments
+
+
+class Command(BaseCommand):
+    help = "Resolve pending payments older than N minutes against the payment providers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=OLDER_THAN_MINUTES, help="Age in minutes")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Payments loaded per chunk")
+        parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Concurrent provider status lookups")
+
+    def handle(self, *args, **options):
+        stats = reconcile_pending_payments(
+            older_than_minutes=options['older_than'],
+            chunk_size=options['chunk_size'],
+            max_workers=options['workers'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {stats['scanned']} payments in {stats['elapsed_seconds']}s "
+            f"({stats['per_second']}/s): {stats['completed']} completed, {stats['failed']} failed, "
+            f"{stats['cancelled']} cancelled, {stats['unchanged']} unchanged, "
+            f"{stats['skipped']} skipped, {stats['errors']} errors"
+        ))
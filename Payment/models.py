@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from Base.models import BaseModel
 from CustomerUser.models import CustomerUser
@@ -64,4 +65,74 @@ class Payment(BaseModel):
     class Meta:
         verbose_name = 'Payment'
         verbose_name_plural = 'Payments'
-        ordering = ['-payment_date']
\ No newline at end of file
+        ordering = ['-payment_date']
+        indexes = [models.Index(fields=['created_at', 'id'], name='payment_keyset_idx')]
+        constraints = [
+            # Bir kurs uchun foydalanuvchida faqat bitta kutilayotgan to'lov
+            models.UniqueConstraint(fields=['user', 'course'], condition=models.Q(status='pending'),
+                                    name='payment_one_pending_per_course'),
+        ]
+
+class WebhookEvent(BaseModel):
+    """
+    Durable inbox for provider webhooks. The webhook view only stores the
+    event; process_webhooks drains the inbox (see Payment/webhooks.py).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+
+    provider = models.CharField(max_length=20)
+    event_id = models.CharField(max_length=128)
+    payment_provider_id = models.CharField(max_length=100, db_index=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claim_token = models.CharField(max_length=36, blank=True, null=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.provider} - {self.event_id} - {self.status}"
+
+    class Meta:
+        verbose_name = 'Webhook Event'
+        verbose_name_plural = 'Webhook Events'
+        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'event_id'], name='webhook_event_unique'),
+        ]
+        indexes = [models.Index(fields=['status', 'created_at'], name='webhook_event_status_idx')]
+
+
+class IdempotencyKey(BaseModel):
+    """
+    Idempotency-Key header of a payment request. The unique (user, key) row
+    is the lock: only the request that inserts it runs the view, retries get
+    the stored response back.
+    """
+    STATUS_CHOICES = [
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+    ]
+
+    user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key} - {self.status}"
+
+    class Meta:
+        verbose_name = 'Idempotency Key'
+        verbose_name_plural = 'Idempotency Keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_key_unique'),
+        ]
@@ -2,13 +2,70 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional
 from decimal import Decimal
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import hmac
 import hashlib
+import random
+import threading
+import time
 from datetime import datetime
 
+# (connect, read) soniyalarda; PAYMENT_PROVIDER_TIMEOUT bilan o'zgartiriladi
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_RETRIES = 3
+DEFAULT_POOL_SIZE = 10
+RETRY_BACKOFF = 0.2
+RETRY_BACKOFF_MAX = 2.0
+RETRY_STATUS_CODES = {502, 503, 504}
+
 class PaymentProvider(ABC):
+    """
+    Providers are cached per process by get_provider(), so each one keeps a
+    pooled keep-alive session and reuses TLS connections between requests.
+    """
+    api_url = None
+
+    @property
+    def session(self) -> requests.Session:
+        if getattr(self, '_session', None) is None:
+            pool_size = getattr(settings, 'PAYMENT_PROVIDER_POOL_SIZE', DEFAULT_POOL_SIZE)
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update(self._get_headers())
+            self._session = session
+        return self._session
+
+    def _post(self, payload: Dict[str, Any], idempotent: bool = False) -> requests.Response:
+        """
+        POST to the provider API with connect/read timeouts. Only idempotent
+        calls (status lookups) are retried, with jittered exponential backoff;
+        creating or refunding twice is never safe.
+        """
+        timeout = getattr(settings, 'PAYMENT_PROVIDER_TIMEOUT', DEFAULT_TIMEOUT)
+        attempts = getattr(settings, 'PAYMENT_PROVIDER_RETRIES', DEFAULT_RETRIES) if idempotent else 1
+        for attempt in range(1, attempts + 1):
+            try:
+                response = self.session.post(self.api_url, json=payload, timeout=timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= attempts:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= attempts:
+                    response.raise_for_status()  # HTTP xatolarini ushlaydi
+                    return response
+            # Full jitter: bir vaqtda qayta urinishlar to'planib qolmasligi uchun
+            time.sleep(random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** (attempt - 1))))
+
+    def _get_headers(self) -> Dict[str, str]:
+        return {'Content-Type': 'application/json'}
+
     @abstractmethod
     def create_payment(self, amount: Decimal, currency: str, description: str) -> Dict[str, Any]:
         pass
@@ -43,12 +100,7 @@ class PaymeProvider(PaymentProvider):
         }
         
         try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=self._get_headers()
-            )
-            response.raise_for_status()  # HTTP xatolarini ushlaydi
+            response = self._post(payload)
             data = response.json()
             if data.get('result', {}).get('receipt', {}).get('_id'):
                 return {
@@ -72,12 +124,7 @@ class PaymeProvider(PaymentProvider):
         }
         
         try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
+            response = self._post(payload, idempotent=True)
             data = response.json()
             status = data.get('result', {}).get('receipt', {}).get('status')
             if status:
@@ -100,12 +147,7 @@ class PaymeProvider(PaymentProvider):
         }
         
         try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
+            response = self._post(payload)
             return response.status_code == 200
         except requests.exceptions.RequestException as e:
             raise Exception(f"Payme refund failed: {str(e)}")
@@ -162,12 +204,7 @@ class ClickProvider(PaymentProvider):
         payload['sign_string'] = self._generate_signature(payload)
         
         try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
+            response = self._post(payload)
             data = response.json()
             if data.get('result', {}).get('invoice_id'):
                 return {
@@ -193,12 +230,7 @@ class ClickProvider(PaymentProvider):
         payload['sign_string'] = self._generate_signature(payload)
         
         try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
+            response = self._post(payload, idempotent=True)
             data = response.json()
             status = data.get('result', {}).get('status')
             if status:
@@ -223,12 +255,7 @@ class ClickProvider(PaymentProvider):
         payload['sign_string'] = self._generate_signature(payload)
         
         try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
+            response = self._post(payload)
             return response.status_code == 200
         except requests.exceptions.RequestException as e:
             raise Exception(f"Click refund failed: {str(e)}")
@@ -275,14 +302,46 @@ class ClickProvider(PaymentProvider):
         }
         return status_map.get(click_status, 'failed')
 
-def get_provider(provider_name: str) -> Optional[PaymentProvider]:
+_provider_instances: Dict[str, PaymentProvider] = {}
+_provider_lock = threading.Lock()
+
+def get_provider_class(provider_name: str):
     providers = {
         'payme': PaymeProvider,
         'click': ClickProvider
     }
-    
+    # settings.PAYMENT_PROVIDERS: {'payme': 'Payment.simulator.SimulatedPaymeProvider'}
+    providers.update(getattr(settings, 'PAYMENT_PROVIDERS', {}))
     provider_class = providers.get(provider_name.lower())
-    if provider_class:
-        return provider_class()
-    
-    return None 
\ No newline at end of file
+    if isinstance(provider_class, str):
+        provider_class = import_string(provider_class)
+    return provider_class
+
+def get_provider(provider_name: str) -> Optional[PaymentProvider]:
+    name = provider_name.lower()
+    provider_class = get_provider_class(name)
+    if not provider_class:
+        return None
+
+    # Har bir jarayonda bitta provider (va uning ulanishlar puli)
+    provider = _provider_instances.get(name)
+    if provider is None:
+        with _provider_lock:
+            provider = _provider_instances.get(name)
+            if provider is None:
+                provider = _provider_instances[name] = provider_class()
+    return provider
+
+def reset_providers() -> None:
+    """Drop cached providers, e.g. after the provider settings change."""
+    with _provider_lock:
+        for provider in _provider_instances.values():
+            session = getattr(provider, '_session', None)
+            if session is not None:
+                session.close()
+        _provider_instances.clear() 
+
+@receiver(setting_changed)
+def provider_settings_changed(setting, **kwargs):
+    if setting.startswith(('PAYMENT_', 'PAYME_', 'CLICK_')):
+        reset_providers()
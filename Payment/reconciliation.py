@@ -0,0 +1,120 @@
+"""
+Reconciliation of payments stuck in ``pending``.
+
+Pending payments older than a cut-off are walked in primary-key chunks, so
+only one chunk is in memory at a time. The provider status of every payment
+in a chunk is fetched through a bounded thread pool; the resulting
+transitions are written with one bulk_update per chunk and the enrollments
+with one bulk_create on the M2M through table. A payment that a webhook
+completed in the meantime is left alone.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from Course.models import Course
+from Course.stats import recount as recount_course_stats
+from .models import Payment
+from .providers import get_provider
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+MAX_WORKERS = 8
+OLDER_THAN_MINUTES = 30
+FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+def _lookup(provider_factory, payment):
+    try:
+        provider = provider_factory(payment.method)
+        if not provider:
+            raise ValueError(f"Unknown payment provider: {payment.method}")
+        return payment, provider.check_payment_status(payment.payment_provider_id), None
+    except Exception as e:
+        return payment, None, e
+
+
+def _apply(changes, stats):
+    """Write the status transitions of one chunk."""
+    now = timezone.now()
+    with transaction.atomic():
+        still_pending = set(
+            Payment.objects.select_for_update()
+            .filter(pk__in=[payment.pk for payment, _ in changes], status='pending')
+            .values_list('pk', flat=True)
+        )
+        updated = []
+        for payment, new_status in changes:
+            if payment.pk not in still_pending:
+                stats['skipped'] += 1
+                continue
+            payment.status = new_status
+            payment.updated_at = now
+            if new_status == 'completed':
+                payment.payment_date = now
+                payment.completed_at = now
+            updated.append(payment)
+            stats[new_status] += 1
+        if not updated:
+            return
+        # Faqat o'zgargan (va .only() bilan yuklangan) maydonlar yoziladi
+        completed = [payment for payment in updated if payment.status == 'completed']
+        closed = [payment for payment in updated if payment.status != 'completed']
+        Payment.objects.bulk_update(completed, ['status', 'payment_date', 'completed_at', 'updated_at'])
+        Payment.objects.bulk_update(closed, ['status', 'updated_at'])
+
+        Enrollment = Course.enrolled_students.through
+        enrollments = [
+            Enrollment(course_id=payment.course_id, customeruser_id=payment.user_id) for payment in completed
+        ]
+        Enrollment.objects.bulk_create(enrollments, ignore_conflicts=True)
+        # bulk_create m2m_changed signalini yubormaydi - kurs statistikasi qayta sanaladi
+        recount_course_stats({enrollment.course_id for enrollment in enrollments})
+
+
+def reconcile_pending_payments(older_than_minutes=OLDER_THAN_MINUTES, chunk_size=CHUNK_SIZE,
+                               max_workers=MAX_WORKERS, provider_factory=get_provider):
+    """Resolve stale pending payments against the provider; returns counters."""
+    started = time.monotonic()
+    stats = {'scanned': 0, 'completed': 0, 'failed': 0, 'cancelled': 0,
+             'unchanged': 0, 'skipped': 0, 'errors': 0}
+    cutoff = timezone.now() - timedelta(minutes=older_than_minutes)
+    queryset = (
+        Payment.objects.filter(status='pending', created_at__lt=cutoff)
+        .exclude(payment_provider_id__isnull=True)
+        .exclude(payment_provider_id='')
+        .only('id', 'method', 'payment_provider_id', 'user_id', 'course_id', 'status')
+        .order_by('pk')
+    )
+
+    last_pk = None
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            chunk_qs = queryset.filter(pk__gt=last_pk) if last_pk else queryset
+            chunk = list(chunk_qs[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            stats['scanned'] += len(chunk)
+
+            changes = []
+            for payment, new_status, error in executor.map(lambda p: _lookup(provider_factory, p), chunk):
+                if error is not None:
+                    logger.error(f"Reconciliation status check failed for {payment.pk}: {str(error)}")
+                    stats['errors'] += 1
+                elif new_status in FINAL_STATUSES:
+                    changes.append((payment, new_status))
+                else:
+                    stats['unchanged'] += 1
+            if changes:
+                _apply(changes, stats)
+
+    elapsed = time.monotonic() - started
+    stats['elapsed_seconds'] = round(elapsed, 3)
+    stats['per_second'] = round(stats['scanned'] / elapsed, 1) if elapsed else 0.0
+    return stats
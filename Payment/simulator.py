@@ -0,0 +1,259 @@
+"""
+In-process stand-ins for the Payme and Click APIs.
+
+The simulated providers subclass the real ones and only swap the HTTP
+session for SimulatedSession, so payload building, response parsing,
+timeouts and retries are exercised exactly as in production. Select them
+through settings:
+
+    PAYMENT_PROVIDERS = {
+        'payme': 'Payment.simulator.SimulatedPaymeProvider',
+        'click': 'Payment.simulator.SimulatedClickProvider',
+    }
+    PAYMENT_SIMULATOR = {
+        'LATENCY': {'distribution': 'lognormal', 'median_ms': 80, 'sigma': 0.5},
+        'ERROR_RATE': 0.01,       # share of calls answered with HTTP 503
+        'TIMEOUT_RATE': 0.0,      # share of calls that hit the read timeout
+        'PAY_AFTER': 2.0,         # seconds until a receipt becomes paid
+        'FAILURE_RATE': 0.05,     # share of receipts that end up failed
+        'WEBHOOK_URL': 'http://127.0.0.1:8000/api/payments/webhook/{provider}/',
+    }
+
+With WEBHOOK_URL set, a signed webhook is posted once a receipt is settled.
+build_webhook() returns the same signed payload for in-process delivery.
+
+A receipt id carries its settle time and outcome, so any process (the web
+worker, process_webhooks, reconcile_payments) answers status lookups the
+same way without a shared ledger. Only cancellations are stored, in the
+Django cache.
+"""
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from .providers import ClickProvider, PaymeProvider
+
+DEFAULTS = {
+    'LATENCY': {'distribution': 'lognormal', 'median_ms': 80, 'sigma': 0.5},
+    'ERROR_RATE': 0.0,
+    'TIMEOUT_RATE': 0.0,
+    'PAY_AFTER': 0.0,
+    'FAILURE_RATE': 0.0,
+    'WEBHOOK_URL': None,
+    'SEED': None,
+}
+CANCELLED_KEY = 'payment-simulator:cancelled:{receipt_id}'
+CANCELLED_TIMEOUT = 60 * 60 * 24 * 7
+OUTCOMES = {'p': 'paid', 'f': 'failed'}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PAYMENT_SIMULATOR', {})}
+
+
+class LatencyModel:
+    """Samples a delay in seconds: none, fixed, uniform or lognormal."""
+
+    def __init__(self, distribution='none', rng=None, **params):
+        self.distribution = distribution
+        self.params = params
+        self.rng = rng or random.Random()
+
+    def sample(self):
+        p = self.params
+        if self.distribution == 'fixed':
+            delay_ms = p.get('ms', 0)
+        elif self.distribution == 'uniform':
+            delay_ms = self.rng.uniform(p.get('min_ms', 0), p.get('max_ms', 100))
+        elif self.distribution == 'lognormal':
+            # median = exp(mu)
+            delay_ms = p.get('median_ms', 80) * self.rng.lognormvariate(0, p.get('sigma', 0.5))
+        else:
+            delay_ms = 0
+        return delay_ms / 1000
+
+
+class Receipt:
+    """A receipt whose id is ``<token>.<settle time in ms>.<outcome code>``."""
+    __slots__ = ('id', 'settle_at', 'outcome')
+
+    def __init__(self, receipt_id, settle_at, outcome):
+        self.id = receipt_id
+        self.settle_at = settle_at
+        self.outcome = outcome
+
+    @classmethod
+    def create(cls, pay_after, outcome):
+        settle_at = time.time() + pay_after
+        code = next(code for code, name in OUTCOMES.items() if name == outcome)
+        return cls(f'{uuid.uuid4().hex}.{int(settle_at * 1000)}.{code}', settle_at, outcome)
+
+    @classmethod
+    def parse(cls, receipt_id):
+        """The receipt behind an id, or None if the simulator did not issue it."""
+        parts = str(receipt_id or '').split('.')
+        if len(parts) != 3 or not parts[1].isdigit() or parts[2] not in OUTCOMES:
+            return None
+        return cls(receipt_id, int(parts[1]) / 1000, OUTCOMES[parts[2]])
+
+    @property
+    def status(self):
+        if cache.get(CANCELLED_KEY.format(receipt_id=self.id)):
+            return 'cancelled'
+        return self.outcome if time.time() >= self.settle_at else 'waiting'
+
+    def cancel(self):
+        cache.set(CANCELLED_KEY.format(receipt_id=self.id), True, timeout=CANCELLED_TIMEOUT)
+
+
+class SimulatedSession:
+    """Drop-in for requests.Session that answers from an in-memory ledger."""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.config = get_config()
+        self.rng = random.Random(self.config['SEED'])
+        self.latency = LatencyModel(rng=self.rng, **self.config['LATENCY'])
+        self.headers = {}
+        self.calls = 0
+
+    def close(self):
+        pass
+
+    def post(self, url, json=None, timeout=None, **kwargs):
+        self.calls += 1
+        read_timeout = timeout[1] if isinstance(timeout, (tuple, list)) else timeout
+        delay = self.latency.sample()
+        if self.rng.random() < self.config['TIMEOUT_RATE'] or (read_timeout and delay > read_timeout):
+            time.sleep(read_timeout or delay)
+            raise requests.exceptions.ReadTimeout(f"Simulated read timeout after {read_timeout}s")
+        time.sleep(delay)
+        if self.rng.random() < self.config['ERROR_RATE']:
+            return self._response(503, {'error': {'message': 'Simulated provider error'}})
+        status_code, data = self.provider.simulate(self, json or {})
+        return self._response(status_code, data)
+
+    def create_receipt(self):
+        outcome = 'failed' if self.rng.random() < self.config['FAILURE_RATE'] else 'paid'
+        receipt = Receipt.create(self.config['PAY_AFTER'], outcome)
+        if self.config['WEBHOOK_URL']:
+            timer = threading.Timer(max(0.0, self.config['PAY_AFTER']), self._notify, args=[receipt])
+            timer.daemon = True
+            timer.start()
+        return receipt
+
+    def _notify(self, receipt):
+        payload, signature = self.provider.build_webhook(receipt.id, receipt.status)
+        url = self.config['WEBHOOK_URL'].format(provider=self.provider.name)
+        try:
+            requests.post(url, json=payload, headers={'X-Signature': signature}, timeout=5)
+        except requests.exceptions.RequestException:
+            pass
+
+    def _response(self, status_code, data):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(data).encode()
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+
+class SimulatedProviderMixin(ABC):
+    name = None
+
+    @property
+    def session(self):
+        if getattr(self, '_session', None) is None:
+            self._session = SimulatedSession(self)
+        return self._session
+
+    @abstractmethod
+    def simulate(self, session, payload):
+        """Answer one API call; returns (HTTP status, JSON body)."""
+        pass
+
+    @abstractmethod
+    def build_webhook(self, payment_id, status='paid'):
+        """Signed webhook payload in the shape verify_webhook() expects."""
+        pass
+
+
+class SimulatedPaymeProvider(SimulatedProviderMixin, PaymeProvider):
+    name = 'payme'
+
+    def __init__(self):
+        self.merchant_id = getattr(settings, 'PAYME_MERCHANT_ID', 'simulator')
+        self.secret_key = getattr(settings, 'PAYME_SECRET_KEY', 'simulator-secret')
+        self.api_url = getattr(settings, 'PAYME_API_URL', 'http://payme.simulator/api/')
+
+    def simulate(self, session, payload):
+        method = payload.get('method')
+        params = payload.get('params', {})
+        if method == 'receipts.create':
+            receipt = session.create_receipt()
+            return 200, {'result': {'receipt': {
+                '_id': receipt.id,
+                'url': f'{self.api_url}checkout/{receipt.id}',
+                'state': 0,
+            }}}
+        receipt = Receipt.parse(params.get('id'))
+        if receipt is None:
+            return 200, {'error': {'code': -31050, 'message': 'Receipt not found'}}
+        if method == 'receipts.get':
+            return 200, {'result': {'receipt': {'_id': receipt.id, 'status': receipt.status}}}
+        if method == 'receipts.cancel':
+            receipt.cancel()
+            return 200, {'result': {'receipt': {'_id': receipt.id, 'status': 'cancelled'}}}
+        return 400, {'error': {'code': -32601, 'message': 'Method not found'}}
+
+    def build_webhook(self, payment_id, status='paid'):
+        payload = {'event_id': uuid.uuid4().hex, 'payment_id': payment_id, 'status': status}
+        signature = self._sign(payload)
+        return payload, signature
+
+    def _sign(self, payload):
+        data = json.dumps(payload, separators=(',', ':'))
+        return hmac.new(self.secret_key.encode(), data.encode(), hashlib.sha1).hexdigest()
+
+
+class SimulatedClickProvider(SimulatedProviderMixin, ClickProvider):
+    name = 'click'
+
+    def __init__(self):
+        self.merchant_id = getattr(settings, 'CLICK_MERCHANT_ID', 'simulator')
+        self.service_id = getattr(settings, 'CLICK_SERVICE_ID', 'simulator')
+        self.secret_key = getattr(settings, 'CLICK_SECRET_KEY', 'simulator-secret')
+        self.api_url = getattr(settings, 'CLICK_API_URL', 'http://click.simulator/api/')
+
+    def simulate(self, session, payload):
+        signature = payload.get('sign_string')
+        if signature != self._generate_signature(dict(payload)):
+            return 200, {'error': {'code': -1, 'message': 'SIGN CHECK FAILED'}}
+        if 'invoice_id' not in payload:
+            receipt = session.create_receipt()
+            return 200, {'result': {'invoice_id': receipt.id, 'url': f'{self.api_url}checkout/{receipt.id}'}}
+        receipt = Receipt.parse(payload['invoice_id'])
+        if receipt is None:
+            return 200, {'error': {'code': -5, 'message': 'Invoice not found'}}
+        if 'reason' in payload:
+            receipt.cancel()
+            return 200, {'result': {'invoice_id': receipt.id, 'status': 'cancelled'}}
+        return 200, {'result': {'invoice_id': receipt.id, 'status': receipt.status}}
+
+    def build_webhook(self, payment_id, status='paid'):
+        payload = {
+            'event_id': uuid.uuid4().hex,
+            'payment_id': payment_id,
+            'status': status,
+            'timestamp': int(time.time()),
+        }
+        return payload, self._generate_signature(dict(payload))
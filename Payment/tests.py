@@ -2,14 +2,25 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Payment
+from .models import Payment, WebhookEvent, IdempotencyKey
 from CustomerUser.models import CustomerUser
 from Course.models import Course, Category
 from decimal import Decimal
+import json
 from django.utils import timezone
 from datetime import timedelta
 from django.conf import settings
 from unittest.mock import patch
+from django.test import override_settings
+from django.db import connection
+from django.db.models import Exists
+from django.test.utils import CaptureQueriesContext
+import requests
+from .providers import PaymeProvider, get_provider, reset_providers
+from .webhooks import _complete_payment, busy_payments, claim_events, process_webhook_inbox
+from . import reconciliation
+from .simulator import SimulatedClickProvider, SimulatedPaymeProvider, LatencyModel
+from .reconciliation import reconcile_pending_payments
 
 # Add required payment settings
 settings.PAYME_MERCHANT_ID = 'test_merchant_id'
@@ -88,6 +99,8 @@ class PaymentAPITests(APITestCase):
             'checkout_url': 'http://test.com',
             'provider_data': {}
         }
+        self.payment.status = 'cancelled'
+        self.payment.save()
         url = reverse('payment-list')
         data = {
             'course': self.course.id,
@@ -97,12 +110,42 @@ class PaymentAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Payment.objects.count(), 2)
 
+    @patch('Payment.providers.PaymeProvider.create_payment')
+    def test_create_payment_pending_in_database(self, mock_create_payment):
+        """Kesh kaliti bo'lmasa ham bazadagi faol to'lov takroriy to'lovni to'xtatishini tekshirish"""
+        mock_create_payment.return_value = {
+            'provider_id': 'test_id',
+            'checkout_url': 'http://test.com',
+            'provider_data': {}
+        }
+        response = self.client.post(reverse('payment-list'), {'course': self.course.id, 'method': 'payme'},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Sizda bu kurs uchun faol to'lov mavjud", str(response.data))
+        self.assertEqual(Payment.objects.count(), 1)
+
     def test_list_payments(self):
         url = reverse('payment-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
 
+    def test_list_payments_keyset_page(self):
+        Payment.objects.create(user=self.user, course=self.course, amount=100000, method='click', status='failed')
+        url = reverse('payment-list') + '?page_size=1'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_list_payments_invalid_cursor(self):
+        url = reverse('payment-list') + '?cursor=invalid'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_retrieve_payment(self):
         url = reverse('payment-detail', args=[self.payment.id])
         response = self.client.get(url)
@@ -208,6 +251,8 @@ class PaymentAPITests(APITestCase):
             'checkout_url': 'http://test.com',
             'provider_data': {}
         }
+        self.payment.status = 'cancelled'
+        self.payment.save()
         # Birinchi to'lov
         url = reverse('payment-list')
         data = {
@@ -415,4 +460,444 @@ class PaymentValidationTests(APITestCase):
         }
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn('Qaytarish sababi kamida 10 ta belgidan iborat bo\'lishi kerak', str(response.data))
\ No newline at end of file
+        self.assertIn('Qaytarish sababi kamida 10 ta belgidan iborat bo\'lishi kerak', str(response.data))
+
+class PaymentProviderSessionTests(TestCase):
+    def setUp(self):
+        reset_providers()
+        self.provider = get_provider('payme')
+
+    def tearDown(self):
+        reset_providers()
+
+    def response(self, status_code=200, data=None):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(data or {}).encode()
+        return response
+
+    def test_provider_cached_per_process(self):
+        """Provider va uning sessiyasi qayta ishlatilishini tekshirish"""
+        self.assertIsInstance(self.provider, PaymeProvider)
+        self.assertIs(get_provider('PAYME'), self.provider)
+        self.assertIs(self.provider.session, self.provider.session)
+        self.assertIsNone(get_provider('unknown'))
+
+    def test_request_has_timeout(self):
+        """So'rovlarga connect/read timeout berilishini tekshirish"""
+        data = {'result': {'receipt': {'status': 'paid'}}}
+        with patch.object(self.provider.session, 'post', return_value=self.response(data=data)) as post:
+            self.assertEqual(self.provider.check_payment_status('receipt-1'), 'completed')
+        self.assertEqual(post.call_args.kwargs['timeout'], (3.05, 10))
+
+    @patch('Payment.providers.time.sleep')
+    def test_status_check_retried(self, sleep):
+        """Holatni tekshirish ulanish xatosida qayta urinilishini tekshirish"""
+        data = {'result': {'receipt': {'status': 'waiting'}}}
+        side_effect = [requests.exceptions.ConnectionError(), self.response(503), self.response(data=data)]
+        with patch.object(self.provider.session, 'post', side_effect=side_effect) as post:
+            self.assertEqual(self.provider.check_payment_status('receipt-1'), 'pending')
+        self.assertEqual(post.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    @patch('Payment.providers.time.sleep')
+    def test_create_payment_not_retried(self, sleep):
+        """To'lov yaratish qayta urinilmasligini tekshirish"""
+        with patch.object(self.provider.session, 'post', side_effect=requests.exceptions.Timeout()) as post:
+            with self.assertRaises(Exception):
+                self.provider.create_payment(Decimal('100'), 'UZS', 'Test')
+        self.assertEqual(post.call_count, 1)
+        sleep.assert_not_called()
+
+
+class WebhookInboxTests(APITestCase):
+    def setUp(self):
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100000,
+            duration=timedelta(hours=2),
+            category=self.category,
+            instructor=self.user
+        )
+        self.payment = Payment.objects.create(
+            user=self.user,
+            course=self.course,
+            amount=100000,
+            status='pending',
+            method='payme',
+            payment_provider_id='receipt-1'
+        )
+        self.url = reverse('payment-webhook', args=['payme'])
+        self.headers = {'X-Signature': 'test_signature'}
+
+    def post_webhook(self, data):
+        with patch('Payment.providers.PaymeProvider.verify_webhook', return_value=True):
+            return self.client.post(self.url, data, format='json', headers=self.headers)
+
+    @patch('Payment.providers.PaymeProvider.check_payment_status')
+    def test_webhook_only_queues_event(self, check_status):
+        """Webhook provayderga so'rov yubormasdan navbatga yozilishini tekshirish"""
+        response = self.post_webhook({'payment_id': 'receipt-1', 'event_id': 'evt-1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        check_status.assert_not_called()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+        self.assertEqual(WebhookEvent.objects.filter(status='pending').count(), 1)
+
+    def test_duplicate_event_ignored(self):
+        """Bir xil hodisa ikki marta yozilmasligini tekshirish"""
+        self.post_webhook({'payment_id': 'receipt-1', 'status': 'paid'})
+        response = self.post_webhook({'payment_id': 'receipt-1', 'status': 'paid'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['duplicate'])
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+    @patch('Payment.providers.PaymeProvider.check_payment_status', return_value='completed')
+    def test_process_inbox(self, check_status):
+        """Navbat qayta ishlanib to'lov yakunlanishi va kursga yozilishini tekshirish"""
+        self.post_webhook({'payment_id': 'receipt-1', 'event_id': 'evt-1'})
+        self.post_webhook({'payment_id': 'receipt-1', 'event_id': 'evt-2'})
+        stats = process_webhook_inbox()
+        self.assertEqual(stats, {'events': 2, 'payments': 1, 'completed': 1, 'failed': 0})
+        # Bitta to'lov uchun provayderga bitta so'rov
+        self.assertEqual(check_status.call_count, 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertIn(self.user, self.course.enrolled_students.all())
+        self.assertEqual(WebhookEvent.objects.filter(status='processed').count(), 2)
+        self.assertEqual(process_webhook_inbox()['events'], 0)
+
+    @patch('Payment.providers.PaymeProvider.check_payment_status', side_effect=Exception('timeout'))
+    def test_failed_lookup_requeued(self, check_status):
+        """Provayder xatosida hodisa qayta navbatga qo'yilishini tekshirish"""
+        self.post_webhook({'payment_id': 'receipt-1', 'event_id': 'evt-1'})
+        process_webhook_inbox()
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.status, 'pending')
+        self.assertEqual(event.attempts, 1)
+        self.assertIsNone(event.claim_token)
+
+    def test_claim_skips_payment_held_by_other_worker(self):
+        """Boshqa worker ushlab turgan to'lovning yangi hodisasi olinmasligini tekshirish"""
+        self.post_webhook({'payment_id': 'receipt-1', 'event_id': 'evt-1'})
+        WebhookEvent.objects.update(status='processing', claim_token='other', claimed_at=timezone.now())
+        self.post_webhook({'payment_id': 'receipt-1', 'event_id': 'evt-2'})
+        # O'qish paytida band emas edi, UPDATE paytida band bo'lib qoldi
+        with patch('Payment.webhooks.busy_payments',
+                   side_effect=[Exists(WebhookEvent.objects.filter(status='unknown')), busy_payments()]):
+            self.assertEqual(claim_events(), [])
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt-2').status, 'pending')
+
+    def test_busy_payment_matched_per_provider(self):
+        """Boshqa provayderdagi bir xil to'lov identifikatori hodisani to'sib qo'ymasligini tekshirish"""
+        WebhookEvent.objects.create(provider='payme', event_id='evt-1', payment_provider_id='receipt-1',
+                                    status='processing', claim_token='other', claimed_at=timezone.now())
+        WebhookEvent.objects.create(provider='payme', event_id='evt-2', payment_provider_id='receipt-1')
+        click = WebhookEvent.objects.create(provider='click', event_id='evt-3', payment_provider_id='receipt-1')
+        self.assertEqual(claim_events(), [click])
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt-2').status, 'pending')
+
+    def test_complete_payment_rechecks_status(self):
+        """Allaqachon yakunlangan to'lov qayta yakunlanmasligini tekshirish"""
+        stale = Payment.objects.get(pk=self.payment.pk)
+        Payment.objects.filter(pk=self.payment.pk).update(status='completed')
+        self.assertFalse(_complete_payment(stale))
+        self.assertNotIn(self.user, self.course.enrolled_students.all())
+
+
+class IdempotencyKeyTests(APITestCase):
+    def setUp(self):
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100000,
+            duration=timedelta(hours=2),
+            category=self.category,
+            instructor=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('payment-list')
+        self.data = {'course': str(self.course.id), 'method': 'payme'}
+
+    def create(self, data=None, key='key-1'):
+        return self.client.post(self.url, data or self.data, format='json', headers={'Idempotency-Key': key})
+
+    @patch('Payment.providers.PaymeProvider.create_payment')
+    def test_retry_replays_response(self, mock_create_payment):
+        """Bir xil kalit bilan qayta so'rov saqlangan javobni qaytarishini tekshirish"""
+        mock_create_payment.return_value = {
+            'provider_id': 'test_id',
+            'checkout_url': 'http://test.com',
+            'provider_data': {}
+        }
+        first = self.create()
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        second = self.create()
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(mock_create_payment.call_count, 1)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    @patch('Payment.providers.PaymeProvider.create_payment')
+    def test_key_reused_for_other_request(self, mock_create_payment):
+        """Kalit boshqa so'rov uchun ishlatilsa 422 qaytishini tekshirish"""
+        mock_create_payment.return_value = {
+            'provider_id': 'test_id',
+            'checkout_url': 'http://test.com',
+            'provider_data': {}
+        }
+        self.create()
+        response = self.create({**self.data, 'method': 'click'})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_in_progress_key_conflict(self):
+        """Qayta ishlanayotgan kalit uchun 409 qaytishini tekshirish"""
+        IdempotencyKey.objects.create(user=self.user, key='key-1', fingerprint='f' * 64)
+        with patch('Payment.idempotency.request_fingerprint', return_value='f' * 64):
+            response = self.create()
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    @patch('Payment.providers.PaymeProvider.create_payment', side_effect=Exception('provider down'))
+    def test_server_error_releases_keys(self, mock_create_payment):
+        """Provayder xatosida kalitlar bo'shatilishini tekshirish"""
+        response = self.create()
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        # Faol to'lov kaliti ham bo'shatilgan - qayta urinish mumkin
+        mock_create_payment.side_effect = None
+        mock_create_payment.return_value = {
+            'provider_id': 'test_id',
+            'checkout_url': 'http://test.com',
+            'provider_data': {}
+        }
+        response = self.create()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class FakeProvider:
+    """Mahalliy soxta provayder: holatlar lug'atdan olinadi"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.calls = []
+
+    def check_payment_status(self, payment_id):
+        self.calls.append(payment_id)
+        status_result = self.statuses.get(payment_id, 'pending')
+        if isinstance(status_result, Exception):
+            raise status_result
+        return status_result
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100000,
+            duration=timedelta(hours=2),
+            category=self.category,
+            instructor=self.user
+        )
+        self.old = timezone.now() - timedelta(hours=2)
+
+    def make_payment(self, provider_id, age=None):
+        # Bitta kursga faqat bitta kutilayotgan to'lov - har bir to'lov o'z kursi uchun
+        course = Course.objects.create(
+            title=f'Course {provider_id}', description='Test Description', price=100000,
+            duration=timedelta(hours=2), category=self.category, instructor=self.user
+        )
+        payment = Payment.objects.create(
+            user=self.user,
+            course=course,
+            amount=100000,
+            method='payme',
+            payment_provider_id=provider_id
+        )
+        Payment.objects.filter(pk=payment.pk).update(created_at=age or self.old)
+        return payment
+
+    def test_reconcile_in_chunks(self):
+        """Eski kutilayotgan to'lovlar bo'laklab yangilanishini tekshirish"""
+        paid = self.make_payment('paid-1')
+        failed = self.make_payment('failed-1')
+        waiting = self.make_payment('waiting-1')
+        broken = self.make_payment('broken-1')
+        fresh = self.make_payment('paid-2', age=timezone.now())
+        provider = FakeProvider({
+            'paid-1': 'completed', 'paid-2': 'completed', 'failed-1': 'failed',
+            'broken-1': Exception('timeout'),
+        })
+
+        stats = reconcile_pending_payments(chunk_size=2, max_workers=2, provider_factory=lambda name: provider)
+
+        self.assertEqual(stats['scanned'], 4)
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(stats['unchanged'], 1)
+        self.assertEqual(stats['errors'], 1)
+        self.assertNotIn('paid-2', provider.calls)
+        paid.refresh_from_db()
+        self.assertEqual(paid.status, 'completed')
+        self.assertIsNotNone(paid.completed_at)
+        self.assertIn(self.user, paid.course.enrolled_students.all())
+        for payment, expected in ((failed, 'failed'), (waiting, 'pending'), (broken, 'pending'), (fresh, 'pending')):
+            payment.refresh_from_db()
+            self.assertEqual(payment.status, expected)
+
+    def test_query_count_does_not_grow_with_chunk(self):
+        """Yangilanish so'rovlari soni bo'lakdagi to'lovlar soniga bog'liq emasligini tekshirish"""
+        def run(count, prefix):
+            statuses = {}
+            for number in range(count):
+                provider_id = f'{prefix}-{number}'
+                self.make_payment(provider_id)
+                statuses[provider_id] = 'completed' if number % 2 else 'failed'
+            provider = FakeProvider(statuses)
+            with CaptureQueriesContext(connection) as queries:
+                stats = reconcile_pending_payments(max_workers=2, provider_factory=lambda name: provider)
+            self.assertEqual(stats['completed'] + stats['failed'], count)
+            return len(queries)
+
+        self.assertEqual(run(4, 'small'), run(20, 'large'))
+        self.assertFalse(Payment.objects.filter(status='completed', completed_at__isnull=True).exists())
+
+    def test_already_resolved_payment_skipped(self):
+        """Webhook orqali yakunlangan to'lov qayta yozilmasligini tekshirish"""
+        payment = self.make_payment('paid-1')
+        provider = FakeProvider({'paid-1': 'completed'})
+        apply_changes = reconciliation._apply
+
+        def cancel_then_apply(changes, stats):
+            # Holat so'ralgandan keyin to'lov bekor qilingan
+            Payment.objects.filter(pk=payment.pk).update(status='cancelled')
+            return apply_changes(changes, stats)
+
+        with patch('Payment.reconciliation._apply', side_effect=cancel_then_apply):
+            stats = reconcile_pending_payments(provider_factory=lambda name: provider)
+        self.assertEqual(stats['skipped'], 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'cancelled')
+        self.assertNotIn(self.user, payment.course.enrolled_students.all())
+
+
+SIMULATED_PROVIDERS = {
+    'payme': 'Payment.simulator.SimulatedPaymeProvider',
+    'click': 'Payment.simulator.SimulatedClickProvider',
+}
+NO_LATENCY = {'LATENCY': {'distribution': 'none'}, 'SEED': 1}
+
+
+@override_settings(PAYMENT_PROVIDERS=SIMULATED_PROVIDERS, PAYMENT_SIMULATOR=NO_LATENCY)
+class PaymentSimulatorTests(APITestCase):
+    def setUp(self):
+        reset_providers()
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100000,
+            duration=timedelta(hours=2),
+            category=self.category,
+            instructor=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        reset_providers()
+
+    def test_provider_selected_from_settings(self):
+        """Sozlamalar orqali simulyator tanlanishini tekshirish"""
+        self.assertIsInstance(get_provider('payme'), SimulatedPaymeProvider)
+        self.assertIsInstance(get_provider('click'), SimulatedClickProvider)
+
+    def test_checkout_and_webhook_flow(self):
+        """Simulyator bilan to'lov, imzolangan webhook va navbatni tekshirish"""
+        response = self.client.post(reverse('payment-list'), {'course': self.course.id, 'method': 'payme'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('checkout', response.data['checkout_url'])
+        payment = Payment.objects.get(pk=response.data['id'])
+
+        provider = get_provider('payme')
+        self.assertEqual(provider.check_payment_status(payment.payment_provider_id), 'completed')
+        payload, signature = provider.build_webhook(payment.payment_provider_id)
+        self.assertTrue(provider.verify_webhook(payload, signature))
+
+        url = reverse('payment-webhook', args=['payme'])
+        response = self.client.post(url, payload, format='json', headers={'X-Signature': signature})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        process_webhook_inbox()
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+
+    def test_click_payload_shapes(self):
+        """Click so'rov shakllari va imzosini tekshirish"""
+        provider = get_provider('click')
+        created = provider.create_payment(Decimal('100'), 'UZS', 'Test')
+        self.assertEqual(provider.check_payment_status(created['provider_id']), 'completed')
+        self.assertTrue(provider.process_refund(created['provider_id'], Decimal('100'), 'Test refund'))
+        self.assertEqual(provider.check_payment_status(created['provider_id']), 'cancelled')
+        payload, signature = provider.build_webhook(created['provider_id'])
+        self.assertTrue(provider.verify_webhook(dict(payload), signature))
+
+    @patch('Payment.providers.time.sleep')
+    def test_error_injection(self, sleep):
+        """Xatolik ulushi 503 javoblarini va qayta urinishlarni keltirib chiqarishini tekshirish"""
+        with self.settings(PAYMENT_SIMULATOR={**NO_LATENCY, 'ERROR_RATE': 1}):
+            provider = get_provider('payme')
+            with self.assertRaises(Exception):
+                provider.check_payment_status('receipt-1')
+            self.assertEqual(provider.session.calls, 3)
+            with self.assertRaises(Exception):
+                provider.create_payment(Decimal('100'), 'UZS', 'Test')
+            self.assertEqual(provider.session.calls, 4)
+
+    def test_receipt_status_in_other_process(self):
+        """Boshqa jarayondagi provayder chekni bir xil holatda ko'rishini tekshirish"""
+        created = get_provider('payme').create_payment(Decimal('100'), 'UZS', 'Test')
+        # process_webhooks / reconcile_payments - yangi sessiya, umumiy xotirasiz
+        reset_providers()
+        self.assertEqual(get_provider('payme').check_payment_status(created['provider_id']), 'completed')
+        with self.settings(PAYMENT_SIMULATOR={**NO_LATENCY, 'FAILURE_RATE': 1}):
+            created = get_provider('click').create_payment(Decimal('100'), 'UZS', 'Test')
+        reset_providers()
+        self.assertEqual(get_provider('click').check_payment_status(created['provider_id']), 'failed')
+
+    def test_pending_until_settled(self):
+        """To'lov PAY_AFTER o'tguncha kutilayotgan holatda qolishini tekshirish"""
+        with self.settings(PAYMENT_SIMULATOR={**NO_LATENCY, 'PAY_AFTER': 60}):
+            provider = get_provider('payme')
+            created = provider.create_payment(Decimal('100'), 'UZS', 'Test')
+            self.assertEqual(provider.check_payment_status(created['provider_id']), 'pending')
+
+    def test_latency_distributions(self):
+        """Kechikish taqsimotlarini tekshirish"""
+        self.assertEqual(LatencyModel('fixed', ms=50).sample(), 0.05)
+        self.assertTrue(0.01 <= LatencyModel('uniform', min_ms=10, max_ms=20).sample() <= 0.02)
+        self.assertGreater(LatencyModel('lognormal', median_ms=80, sigma=0.5).sample(), 0)
+        self.assertEqual(LatencyModel().sample(), 0)
@@ -2,16 +2,21 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.exceptions import NotFound
 from django.shortcuts import get_object_or_404
 from .models import Payment, Course
 from .serializers import PaymentSerializer, PaymentRefundSerializer
 from .permissions import IsOwnerOrAdmin, IsCourseInstructorOrAdmin, IsPaymentProvider
 from .providers import get_provider
+from .webhooks import enqueue_webhook
+from .idempotency import idempotent
+from Base.pagination import KeysetPaginationMixin
 from django.utils import timezone
 import logging
 from rest_framework.throttling import UserRateThrottle
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 import requests
 import json
 from datetime import timedelta
@@ -23,15 +28,20 @@ logger = logging.getLogger(__name__)
 class PaymentRateThrottle(UserRateThrottle):
     rate = '10/minute'
 
-class PaymentListView(APIView):
+class PaymentListView(KeysetPaginationMixin, APIView):
     permission_classes = [IsAuthenticated]
     throttle_classes = [PaymentRateThrottle]
 
     def get(self, request):
         try:
-            payments = Payment.objects.filter(user=request.user)
+            payments = Payment.objects.filter(user=request.user).select_related('user', 'course')
+            page = self.paginate_queryset(payments)
+            if page is not None:
+                return self.get_paginated_response(PaymentSerializer(page, many=True).data)
             serializer = PaymentSerializer(payments, many=True)
             return Response(serializer.data)
+        except NotFound:
+            raise
         except Exception as e:
             logger.error(f"Error fetching payments: {str(e)}")
             return Response(
@@ -39,7 +49,9 @@ class PaymentListView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @idempotent
     def post(self, request):
+        release_key = None
         try:
             # Validate course exists
             course_id = request.data.get('course')
@@ -78,13 +90,14 @@ class PaymentListView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Check for existing active payment
+            # Check for existing active payment (cache.add atomik: faqat bitta so'rov kalitni oladi)
             cache_key = f"payment_course_{course.id}_user_{request.user.id}"
-            if cache.get(cache_key):
+            if not cache.add(cache_key, True, timeout=3600):  # 1 hour
                 return Response(
                     {"detail": "Sizda bu kurs uchun faol to'lov mavjud"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            release_key = cache_key
             
             # Get payment provider
             provider = get_provider(method)
@@ -119,10 +132,16 @@ class PaymentListView(APIView):
             
             serializer = PaymentSerializer(data=payment_data, context={'request': request})
             serializer.is_valid(raise_exception=True)
-            payment = serializer.save(user=request.user)
-            
-            # Set cache to prevent multiple payments
-            cache.set(cache_key, True, timeout=3600)  # 1 hour
+            try:
+                with transaction.atomic():
+                    payment = serializer.save(user=request.user)
+            except IntegrityError:
+                # Kesh kaliti yo'qolgan bo'lsa ham bazadagi cheklov takroriy to'lovni to'xtatadi
+                return Response(
+                    {"detail": "Sizda bu kurs uchun faol to'lov mavjud"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            release_key = None  # Kalit to'lov bekor qilinguncha saqlanadi
             
             return Response({
                 **serializer.data,
@@ -138,6 +157,10 @@ class PaymentListView(APIView):
                 {"detail": "To'lov yaratishda xatolik yuz berdi"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        finally:
+            # To'lov yaratilmagan bo'lsa, faol to'lov kalitini bo'shatamiz
+            if release_key:
+                cache.delete(release_key)
 
 class PaymentDetailView(APIView):
     permission_classes = [IsAuthenticated]
@@ -176,6 +199,7 @@ class PaymentRefundView(APIView):
     def get_object(self, pk):
         return get_object_or_404(Payment, pk=pk)
 
+    @idempotent
     def post(self, request, pk):
         payment = self.get_object(pk)
         if payment.user != request.user and not request.user.is_staff:
@@ -229,6 +253,7 @@ class PaymentCancelView(APIView):
     def get_object(self, pk):
         return get_object_or_404(Payment, pk=pk)
 
+    @idempotent
     def post(self, request, pk):
         payment = self.get_object(pk)
         if payment.user != request.user and not request.user.is_staff:
@@ -280,27 +305,18 @@ class PaymentWebhookView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             payment_id = request.data.get('payment_id')
-            try:
-                payment = Payment.objects.get(payment_provider_id=payment_id)
-            except Payment.DoesNotExist:
+            if not payment_id or not Payment.objects.filter(payment_provider_id=payment_id).exists():
                 return Response(
                     {"detail": "To'lov topilmadi"},
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            status_result = provider_instance.check_payment_status(payment_id)
-            if status_result == 'completed':
-                payment.status = 'completed'
-                payment.payment_date = timezone.now()
-                payment.save()
-                
-                # Add user to course enrolled students
-                if payment.course:
-                    payment.course.enrolled_students.add(payment.user)
-                
-                return Response({"status": "success"})
-            
-            return Response({"status": "pending"})
+            # Hodisa inbox jadvaliga yoziladi; provayderdan holatni so'rash va
+            # to'lovni yangilash process_webhooks buyrug'ida bajariladi
+            event, created = enqueue_webhook(provider.lower(), request.data)
+            return Response(
+                {"status": "accepted", "event_id": event.event_id, "duplicate": not created}
+            )
             
         except Exception as e:
             logger.error(f"Webhook processing failed: {str(e)}")
@@ -0,0 +1,180 @@
+"""
+Webhook inbox.
+
+PaymentWebhookView verifies the signature, stores the event in WebhookEvent
+(deduplicated on provider + event id) and answers immediately. The outbound
+status lookup and the payment/enrollment updates happen here, driven by the
+process_webhooks management command.
+
+Events are claimed per payment: every pending event of a payment is taken by
+one worker with a single conditional UPDATE, so events of the same payment
+are never handled by two workers at once and are applied in arrival order.
+A payment is looked up at the provider once per batch however many events
+it received, and the lookups of a batch run concurrently.
+"""
+import hashlib
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Payment, WebhookEvent
+from .providers import get_provider
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_WORKERS = 4
+MAX_ATTEMPTS = 5
+LEASE_SECONDS = 300
+
+
+def event_id_for(payload):
+    """Provider event id, or a digest of the payload when there is none."""
+    event_id = payload.get('event_id') or payload.get('id')
+    if event_id:
+        return str(event_id)[:128]
+    raw = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def enqueue_webhook(provider, payload):
+    """Store a verified webhook; returns (event, created)."""
+    payload = payload.dict() if hasattr(payload, 'dict') else dict(payload)
+    return WebhookEvent.objects.get_or_create(
+        provider=provider,
+        event_id=event_id_for(payload),
+        defaults={
+            'payment_provider_id': str(payload.get('payment_id')),
+            'payload': payload,
+        },
+    )
+
+
+def release_expired_claims(now=None):
+    """Hand events of crashed workers back to the queue."""
+    now = now or timezone.now()
+    return WebhookEvent.objects.filter(
+        status='processing', claimed_at__lt=now - timedelta(seconds=LEASE_SECONDS)
+    ).update(status='pending', claim_token=None, claimed_at=None)
+
+
+def busy_payments():
+    """Whether another event of the row's payment, same provider and provider id, is being processed."""
+    return Exists(WebhookEvent.objects.filter(
+        status='processing', provider=OuterRef('provider'), payment_provider_id=OuterRef('payment_provider_id')
+    ))
+
+
+def claim_events(batch_size=BATCH_SIZE):
+    """Claim the pending events of up to batch_size payments."""
+    groups = list(
+        WebhookEvent.objects.filter(status='pending')
+        .exclude(busy_payments())
+        .order_by('created_at')
+        .values_list('provider', 'payment_provider_id')[:batch_size * 4]
+    )
+    groups = list(dict.fromkeys(groups))[:batch_size]
+    if not groups:
+        return []
+
+    token = uuid.uuid4().hex
+    claimed = 0
+    for provider in {provider for provider, _ in groups}:
+        payment_ids = [payment_id for name, payment_id in groups if name == provider]
+        # Boshqa worker band qilgan to'lovlar UPDATE ichida ham chiqarib tashlanadi
+        claimed += WebhookEvent.objects.filter(
+            status='pending', provider=provider, payment_provider_id__in=payment_ids
+        ).exclude(
+            busy_payments()
+        ).update(status='processing', claim_token=token, claimed_at=timezone.now())
+    if not claimed:
+        return []
+    return list(WebhookEvent.objects.filter(claim_token=token, status='processing').order_by('created_at'))
+
+
+def _lookup_status(provider_factory, provider_name, payment_id):
+    provider = provider_factory(provider_name)
+    if not provider:
+        raise ValueError(f"Unknown payment provider: {provider_name}")
+    return provider.check_payment_status(payment_id)
+
+
+def _complete_payment(payment):
+    """Mark a payment completed and enroll its user; False if it already was."""
+    with transaction.atomic():
+        current = Payment.objects.select_for_update().filter(pk=payment.pk).values_list('status', flat=True).first()
+        if current is None or current == 'completed':
+            return False
+        payment.status = 'completed'
+        payment.payment_date = timezone.now()
+        payment.save()
+        # Add user to course enrolled students
+        if payment.course_id:
+            payment.course.enrolled_students.add(payment.user)
+        return True
+
+
+def process_webhook_inbox(batch_size=BATCH_SIZE, max_workers=MAX_WORKERS, provider_factory=get_provider):
+    """Process one batch of the inbox and return counters."""
+    stats = {'events': 0, 'payments': 0, 'completed': 0, 'failed': 0}
+    release_expired_claims()
+    events = claim_events(batch_size)
+    if not events:
+        return stats
+
+    groups = {}
+    for event in events:
+        groups.setdefault((event.provider, event.payment_provider_id), []).append(event)
+    stats['events'] = len(events)
+    stats['payments'] = len(groups)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as executor:
+        futures = {
+            key: executor.submit(_lookup_status, provider_factory, *key)
+            for key in groups
+        }
+
+    payments = {
+        payment.payment_provider_id: payment
+        for payment in Payment.objects.filter(
+            payment_provider_id__in=[payment_id for _, payment_id in groups]
+        ).select_related('course', 'user')
+    }
+
+    now = timezone.now()
+    done, retry, failed = [], [], []
+    for key, group in groups.items():
+        try:
+            status_result = futures[key].result()
+            payment = payments.get(key[1])
+            if payment is None:
+                raise Payment.DoesNotExist(f"Payment {key[1]} not found")
+            if status_result == 'completed' and payment.status != 'completed' and _complete_payment(payment):
+                stats['completed'] += 1
+            done.extend(group)
+        except Exception as e:
+            logger.error(f"Webhook processing failed for {key[0]}:{key[1]}: {str(e)}")
+            for event in group:
+                event.attempts += 1
+                event.last_error = str(e)
+                (failed if event.attempts >= MAX_ATTEMPTS else retry).append(event)
+
+    for event in done:
+        event.status, event.processed_at = 'processed', now
+    for event in retry:
+        event.status = 'pending'
+    for event in failed:
+        event.status = 'failed'
+    stats['failed'] = len(failed)
+    for event in events:
+        event.claim_token, event.claimed_at = None, None
+    WebhookEvent.objects.bulk_update(
+        events, ['status', 'processed_at', 'attempts', 'last_error', 'claim_token', 'claimed_at']
+    )
+    return stats
@@ -0,0 +1,360 @@
+"""
+Item analysis of a test's completed results.
+
+The answer sheets are read with one values_list query, decoded with a single
+json.loads call and mapped into students x questions NumPy arrays without a
+per-answer Python loop: the chosen option of every single-choice
+answer and a 0/1 correctness matrix. Every statistic is then a column
+reduction or a matrix-vector product over those arrays:
+
+- difficulty: share of students who answered an item correctly (p-value);
+- discrimination: corrected point-biserial correlation between an item and
+  the rest of the score (total points minus the item's own points);
+- distractors: share of students who chose each answer option, or none;
+- reliability: KR-20 over the 0/1 item scores;
+- score distribution: summary statistics and a 10-point histogram.
+
+When a test samples questions per attempt (questions_per_attempt), an item
+is measured only over the students who were given it and KR-20 is left out,
+since it needs every student to see every item.
+
+The latest result is kept in the shared cache with the test version (answer
+key) and the results version that completed attempts bump. When either has
+moved on, the outdated analysis is still served while one background thread
+rebuilds it, so a submission never makes the next request wait for a full
+pass over the results.
+
+Settings:
+    TEST_ANALYSIS_WORKERS = 1      # thread pool size
+    TEST_ANALYSIS_ASYNC = True     # False rebuilds inline (tests, scripts)
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, repeat
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import TextField
+from django.db.models.functions import Cast
+
+from .answer_keys import get_answer_key, get_results_version, get_version
+from .exams import get_paper
+from .models import TestResult
+
+UNANSWERED = -1
+MULTIPLE = -2
+HISTOGRAM_BINS = np.linspace(0, 100, 11)
+CHUNK_SIZE = 2000
+ANALYSIS_KEY = 'test:{test_id}:analysis'
+REBUILD_KEY = 'test:{test_id}:analysis:rebuilding'
+REBUILD_TIMEOUT = 60 * 10
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _rounded(values, digits=4):
+    return [None if np.isnan(value) else round(float(value), digits) for value in values]
+
+
+def correct_sets(paper, key):
+    return [
+        key.questions[question['id']][0] if key and question['id'] in key.questions else frozenset()
+        for question in paper['questions']
+    ]
+
+
+def _option_index(paper, correct_ids):
+    """
+    Flat option numbering: (option id -> index, number of options, sole-correct
+    flags, correct flags, question of every option).
+    """
+    options, sole_correct, is_correct, owner = {}, [], [], []
+    for j, (question, correct) in enumerate(zip(paper['questions'], correct_ids)):
+        for answer in question['answers']:
+            options[answer['id']] = len(sole_correct)
+            sole_correct.append(correct == {answer['id']})
+            is_correct.append(answer['id'] in correct)
+            owner.append(j)
+    return (options, len(sole_correct), np.array(sole_correct, dtype=bool), np.array(is_correct, dtype=bool),
+            np.array(owner, dtype=np.int64))
+
+
+def load_sheets(test_id):
+    """
+    Answer sheets and drawn question ids of a test's completed results.
+
+    The sheets are fetched as JSON text and decoded with one json.loads call
+    instead of one per row.
+    """
+    rows = (
+        TestResult.objects.filter(test_id=test_id, completed_at__isnull=False)
+        .annotate(raw_answers=Cast('answers', TextField()))
+        .order_by('pk').values_list('raw_answers', 'question_ids')
+    )
+    raw, drawn = [], []
+    for answers, question_ids in rows.iterator(chunk_size=CHUNK_SIZE):
+        raw.append(answers or '{}')
+        drawn.append(question_ids)
+    return json.loads(f"[{','.join(raw)}]"), drawn
+
+
+def _lookup(mapping, keys, count, missing=UNANSWERED):
+    return np.fromiter(map(mapping.get, keys, repeat(missing)), dtype=np.int64, count=count)
+
+
+def presented_matrix(drawn, questions, sampled):
+    """Boolean students x questions matrix of the questions each attempt was given."""
+    presented = np.ones((len(drawn), len(questions)), dtype=bool)
+    if not sampled:
+        return presented
+    given = [i for i, question_ids in enumerate(drawn) if question_ids is not None]
+    if given:
+        lists = [drawn[i] for i in given]
+        lengths = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+        columns = _lookup(questions, chain.from_iterable(lists), int(lengths.sum()))
+        students = np.repeat(np.array(given, dtype=np.int64), lengths)
+        presented[given] = False
+        known = columns >= 0
+        presented[students[known], columns[known]] = True
+    return presented
+
+
+def response_matrix(test_id, paper, correct_ids):
+    """
+    Read the completed answer sheets of a test.
+
+    Returns (choices, correct, presented, option_counts): choices holds the
+    flat option index of a single answer, UNANSWERED or MULTIPLE; correct and
+    presented are boolean students x questions matrices. Every answer is
+    mapped with C-level map() calls into flat arrays; only multi-select
+    answers are unpacked separately.
+    """
+    questions = {question['id']: j for j, question in enumerate(paper['questions'])}
+    options, option_total, sole_correct, correct_option, owner = _option_index(paper, correct_ids)
+    correct_size = np.array([len(correct) for correct in correct_ids], dtype=np.int64)
+    sheets, drawn = load_sheets(test_id)
+    n, m = len(sheets), len(questions)
+    presented = presented_matrix(drawn, questions, bool(paper['questions_per_attempt']))
+
+    # Barcha javoblar tekis massivlarda: (talaba, savol, qiymat)
+    lengths = np.fromiter(map(len, sheets), dtype=np.int64, count=n)
+    size = int(lengths.sum())
+    students = np.repeat(np.arange(n, dtype=np.int64), lengths)
+    columns = _lookup(questions, chain.from_iterable(sheets), size)
+    values = np.fromiter(chain.from_iterable(map(dict.values, sheets)), dtype=object, count=size)
+    valid = columns >= 0
+    # Berilmagan savolga javob hisobga olinmaydi
+    valid[valid] = presented[students[valid], columns[valid]]
+
+    is_list = np.fromiter(map(isinstance, values, repeat(list)), dtype=bool, count=size)
+    listed = np.flatnonzero(is_list & valid)
+    chosen = values[listed]
+    values[is_list] = None
+    picks = _lookup(options, values, size)
+
+    multi_counts = np.zeros(option_total, dtype=np.int64)
+    multi, multi_correct = listed[:0], np.zeros(0, dtype=bool)
+    if len(listed):
+        counts = np.fromiter(map(len, chosen), dtype=np.int64, count=len(chosen))
+        items = _lookup(options, map(str, chain.from_iterable(chosen)), int(counts.sum()))
+        owners = np.repeat(np.arange(len(listed), dtype=np.int64), counts)
+        # Bitta elementli ro'yxat oddiy javob kabi
+        single = counts == 1
+        picks[listed[single]] = items[np.cumsum(counts)[single] - 1]
+        picks[listed[~single]] = MULTIPLE
+
+        in_multi = ~single[owners]
+        owners, items = owners[in_multi], items[in_multi]
+        unknown = np.bincount(owners[items < 0], minlength=len(listed))
+        pairs = np.unique(owners[items >= 0] * option_total + items[items >= 0])
+        owners, items = pairs // option_total, pairs % option_total
+        multi_counts = np.bincount(items, minlength=option_total)
+        hits = correct_option[items] & (owner[items] == columns[listed][owners])
+        distinct = np.bincount(owners, minlength=len(listed))
+        matched = np.bincount(owners[hits], minlength=len(listed))
+        expected = correct_size[columns[listed]]
+        # Tanlangan to'plam to'g'ri javoblar to'plamiga teng bo'lishi kerak
+        is_correct = (unknown == 0) & (distinct == matched) & (matched == expected) & (expected > 0)
+        multi, multi_correct = listed[~single], is_correct[~single]
+
+    choices = np.full((n, m), UNANSWERED, dtype=np.int32)
+    choices[students[valid], columns[valid]] = picks[valid]
+    correct = np.zeros((n, m), dtype=bool)
+    answered = choices >= 0
+    correct[answered] = sole_correct[choices[answered]]
+    correct[students[multi], columns[multi]] = multi_correct
+
+    option_counts = np.bincount(choices[answered], minlength=option_total) + multi_counts
+    return choices, correct, presented, option_counts
+
+
+def point_biserial(correct, presented, points):
+    """
+    Corrected point-biserial correlation of every item, over the students who
+    were given it. Uses only column sums and matrix-vector products.
+    """
+    x = correct.astype(np.float64)
+    total = x @ points
+    if presented.all():
+        n = np.full(len(points), float(len(total)))
+        sum_t = np.full(len(points), total.sum())
+        sum_t2 = np.full(len(points), (total * total).sum())
+    else:
+        p = presented.astype(np.float64)
+        n = p.sum(axis=0)
+        sum_t = p.T @ total
+        sum_t2 = p.T @ (total * total)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sum_x = x.sum(axis=0)
+        sum_xt = x.T @ total
+        # rest = total - points * x, and x * x == x
+        sum_r = sum_t - points * sum_x
+        sum_r2 = sum_t2 - 2 * points * sum_xt + points * points * sum_x
+        sum_xr = sum_xt - points * sum_x
+        mean_x = sum_x / n
+        mean_r = sum_r / n
+        cov = sum_xr / n - mean_x * mean_r
+        var_x = mean_x * (1 - mean_x)
+        var_r = sum_r2 / n - mean_r * mean_r
+        r = cov / np.sqrt(var_x * var_r)
+    r[~np.isfinite(r) | (var_x <= 0) | (var_r <= 1e-12)] = np.nan
+    return r
+
+
+def kr20(correct):
+    """Kuder-Richardson 20 reliability of 0/1 item scores, or None if undefined."""
+    n, k = correct.shape
+    if n < 2 or k < 2:
+        return None
+    p = correct.mean(axis=0)
+    variance = correct.sum(axis=1).var()
+    if variance <= 0:
+        return None
+    return round(float(k / (k - 1) * (1 - (p * (1 - p)).sum() / variance)), 4)
+
+
+def score_distribution(correct, presented, points):
+    possible = presented.astype(np.float64) @ points
+    earned = correct.astype(np.float64) @ points
+    scores = np.divide(earned * 100, possible, out=np.zeros_like(earned), where=possible > 0)
+    counts, _ = np.histogram(scores, bins=HISTOGRAM_BINS)
+    histogram = [
+        {'from': int(low), 'to': int(high), 'count': int(count)}
+        for low, high, count in zip(HISTOGRAM_BINS[:-1], HISTOGRAM_BINS[1:], counts)
+    ]
+    if not len(scores):
+        return {'count': 0, 'mean': None, 'median': None, 'std': None, 'min': None, 'max': None,
+                'histogram': histogram}
+    return {
+        'count': int(len(scores)),
+        'mean': round(float(scores.mean()), 2),
+        'median': round(float(np.median(scores)), 2),
+        'std': round(float(scores.std()), 2),
+        'min': round(float(scores.min()), 2),
+        'max': round(float(scores.max()), 2),
+        'histogram': histogram,
+    }
+
+
+def build_analysis(test_id):
+    """Item analysis of a test as plain data, or None if the test does not exist."""
+    paper = get_paper(test_id)
+    if paper is None:
+        return None
+    correct_ids = correct_sets(paper, get_answer_key(test_id))
+    choices, correct, presented, option_counts = response_matrix(test_id, paper, correct_ids)
+    points = np.array([question['points'] for question in paper['questions']], dtype=np.float64)
+    given = presented.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        difficulty = correct.sum(axis=0) / given
+        omitted = ((choices == UNANSWERED) & presented).sum(axis=0) / given
+    discrimination = point_biserial(correct, presented, points)
+
+    items, offset = [], 0
+    difficulty, discrimination, omitted = _rounded(difficulty), _rounded(discrimination), _rounded(omitted)
+    for j, question in enumerate(paper['questions']):
+        option_rows = []
+        for answer in question['answers']:
+            count = int(option_counts[offset])
+            option_rows.append({
+                'id': answer['id'],
+                'text': answer['text'],
+                'is_correct': answer['id'] in correct_ids[j],
+                'count': count,
+                'rate': round(count / int(given[j]), 4) if given[j] else None,
+            })
+            offset += 1
+        items.append({
+            'id': question['id'],
+            'text': question['text'],
+            'points': question['points'],
+            'responses': int(given[j]),
+            'difficulty': difficulty[j],
+            'discrimination': discrimination[j],
+            'omitted': omitted[j],
+            'options': option_rows,
+        })
+
+    return {
+        'test': {'id': paper['test']['id'], 'title': paper['test']['title']},
+        'students': int(correct.shape[0]),
+        'kr20': None if paper['questions_per_attempt'] else kr20(correct),
+        'scores': score_distribution(correct, presented, points),
+        'items': items,
+    }
+
+
+def analysis_version(test_id):
+    return get_version(test_id), get_results_version(test_id)
+
+
+def refresh_analysis(test_id, version=None):
+    """Build the item analysis of a test and store it as the latest one."""
+    # Versiya hisoblashdan oldin olinadi - shu orada kelgan natijalar keyingi o'qishda hisoblanadi
+    version = version or analysis_version(test_id)
+    data = build_analysis(test_id)
+    cache.set(ANALYSIS_KEY.format(test_id=test_id), {'version': version, 'data': data}, timeout=None)
+    return data
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'TEST_ANALYSIS_WORKERS', 1), thread_name_prefix='test-analysis'
+            )
+        return _executor
+
+
+def _rebuild(test_id):
+    try:
+        refresh_analysis(test_id)
+    except Exception as e:
+        logger.error(f"Test analysis rebuild failed for {test_id}: {str(e)}")
+    finally:
+        cache.delete(REBUILD_KEY.format(test_id=test_id))
+        close_old_connections()
+
+
+def get_analysis(test_id):
+    """
+    Item analysis of a test. An outdated one is served while a single
+    background rebuild runs; only the very first one is built in the request.
+    """
+    version = analysis_version(test_id)
+    latest = cache.get(ANALYSIS_KEY.format(test_id=test_id))
+    if latest is not None and latest['version'] == version:
+        return latest['data']
+    if latest is None or not getattr(settings, 'TEST_ANALYSIS_ASYNC', True):
+        return refresh_analysis(test_id, version)
+    if cache.add(REBUILD_KEY.format(test_id=test_id), 1, timeout=REBUILD_TIMEOUT):
+        get_executor().submit(_rebuild, test_id)
+    return latest['data']
@@ -0,0 +1,126 @@
+"""
+Versioned, cached answer keys per Test.
+
+Every test has a version number in the shared Django cache (Base/versions.py).
+Question, Answer and Test writes bump it once they commit (see signals.py),
+so cached payloads are addressed by (test id, version) and never need to be
+deleted explicitly. Completed
+results bump a second, results version for payloads derived from them. Reads
+go through a small in-process LRU first, then the shared cache, then the
+database.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from Base import versions
+
+from .grading import load_answer_key
+
+VERSION_KEY = 'test:{test_id}:version'
+RESULTS_VERSION_KEY = 'test:{test_id}:results_version'
+PAYLOAD_KEY = 'test:{test_id}:v{version}:{name}'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class LocalLRU:
+    """Thread-safe in-process LRU with a per-entry time-to-live."""
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k[:len(prefix)] == prefix]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LocalLRU(
+    maxsize=getattr(settings, 'ANSWER_KEY_LOCAL_CACHE_SIZE', 256),
+    ttl=getattr(settings, 'ANSWER_KEY_LOCAL_CACHE_TTL', 60),
+)
+
+
+def get_version(test_id):
+    """Current version of a test's cached payloads, or None if the cache is down."""
+    return versions.read_version(VERSION_KEY.format(test_id=test_id))
+
+
+def bump_version(test_id):
+    """Invalidate every cached payload of a test."""
+    local_cache.discard_prefix((str(test_id),))
+    versions.bump_version(VERSION_KEY.format(test_id=test_id))
+
+
+def get_results_version(test_id):
+    """Version of a test's completed results, or None if the cache is down."""
+    return versions.read_version(RESULTS_VERSION_KEY.format(test_id=test_id))
+
+
+def bump_results_version(test_id):
+    """Mark payloads built from a test's completed results (analytics.py) as stale."""
+    versions.bump_version(RESULTS_VERSION_KEY.format(test_id=test_id))
+
+
+def cached_for_test(test_id, name, builder, timeout=CACHE_TIMEOUT):
+    """
+    Return ``builder(test_id)`` cached under the test's current version.
+
+    ``None`` results are cached as well, so tests without questions do not
+    fall through to the database on every call.
+    """
+    version = get_version(test_id)
+    local_key = (str(test_id), name, version)
+    wrapped = local_cache.get(local_key)
+    if wrapped is not None:
+        return wrapped[0]
+
+    shared_key = PAYLOAD_KEY.format(test_id=test_id, version=version, name=name)
+    if version is not None:
+        try:
+            wrapped = cache.get(shared_key)
+        except Exception:
+            wrapped = None
+    if wrapped is None:
+        wrapped = (builder(test_id),)
+        if version is not None:
+            try:
+                cache.set(shared_key, wrapped, timeout=timeout)
+            except Exception:
+                pass
+    local_cache.set(local_key, wrapped)
+    return wrapped[0]
+
+
+def get_answer_key(test_id):
+    """Cached AnswerKey of a test (see grading.AnswerKey)."""
+    return cached_for_test(test_id, 'answer_key', load_answer_key)
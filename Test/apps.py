@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished
 
 
 class TestConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Test'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .drafts import checkpoint_on_request_finished
+        request_finished.connect(checkpoint_on_request_finished, dispatch_uid='exam_draft_checkpoint')
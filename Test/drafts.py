@@ -0,0 +1,198 @@
+"""
+Autosaved exam answers.
+
+While an attempt is open every answer lives in the shared cache under its
+own key (exam:<attempt>:answer:<question>), so a click is one cache write no
+matter how long the paper is. Attempt metadata (owner, test, seed, drawn
+questions, deadline) is cached as well, so autosave requests do not touch the
+database.
+
+Attempts written since the last checkpoint are tracked in an in-process
+dirty set; on request_finished, once CHECKPOINT_INTERVAL seconds have passed,
+their drafts are merged into TestResult.answers with one bulk_update. The
+rest is checkpointed at interpreter exit, and submit/expiry does a final
+write (see exams.py). The finalize_exam_attempts command checkpoints every
+open attempt from the shared cache, which also covers workers that went idle.
+Checkpoint writes only touch attempts that are still open, so they never
+overwrite a submitted answer sheet. A draft missing from the cache falls
+back to the last checkpointed value.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import TestResult
+
+logger = logging.getLogger(__name__)
+
+META_KEY = 'exam:{attempt_id}:meta'
+ANSWER_KEY = 'exam:{attempt_id}:answer:{question_id}'
+CLEARED = ''
+DEFAULTS = {
+    'CHECKPOINT_INTERVAL': 30,
+    'DRAFT_TIMEOUT': 60 * 60 * 24,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'EXAM_DRAFTS', {})}
+
+
+def answer_key(attempt_id, question_id):
+    return ANSWER_KEY.format(attempt_id=attempt_id, question_id=question_id)
+
+
+def remember_attempt(attempt, deadline):
+    cache.set(META_KEY.format(attempt_id=attempt.pk), {
+        'user_id': str(attempt.user_id),
+        'test_id': str(attempt.test_id),
+        'seed': attempt.seed,
+        'question_ids': attempt.question_ids,
+        'deadline': deadline,
+        'completed': bool(attempt.completed_at),
+    }, timeout=get_config()['DRAFT_TIMEOUT'])
+
+
+def attempt_meta(attempt_id):
+    """Cached owner, test, seed, questions and deadline of an attempt, or None if it does not exist."""
+    meta = cache.get(META_KEY.format(attempt_id=attempt_id))
+    if meta is not None:
+        return meta
+    row = (
+        TestResult.objects.filter(pk=attempt_id)
+        .values('id', 'user_id', 'test_id', 'seed', 'question_ids', 'started_at', 'completed_at',
+                'test__duration_minutes')
+        .first()
+    )
+    if row is None:
+        return None
+    attempt = TestResult(id=row['id'], user_id=row['user_id'], test_id=row['test_id'], seed=row['seed'],
+                         question_ids=row['question_ids'], completed_at=row['completed_at'])
+    remember_attempt(attempt, row['started_at'] + timedelta(minutes=row['test__duration_minutes']))
+    return cache.get(META_KEY.format(attempt_id=attempt_id))
+
+
+def mark_completed(attempt_id):
+    key = META_KEY.format(attempt_id=attempt_id)
+    meta = cache.get(key)
+    if meta is not None:
+        cache.set(key, {**meta, 'completed': True}, timeout=get_config()['DRAFT_TIMEOUT'])
+
+
+def save_drafts(attempt_id, answers):
+    """Store answered questions; a None value clears the question."""
+    cache.set_many({
+        answer_key(attempt_id, question_id): CLEARED if value is None else value
+        for question_id, value in answers.items()
+    }, timeout=get_config()['DRAFT_TIMEOUT'])
+    checkpointer.mark(attempt_id)
+
+
+def load_drafts(attempt_id, question_ids):
+    keys = {answer_key(attempt_id, question_id): question_id for question_id in question_ids}
+    return {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+
+
+def clear_drafts(attempt_id, question_ids):
+    cache.delete_many([answer_key(attempt_id, question_id) for question_id in question_ids])
+    checkpointer.discard(attempt_id)
+
+
+def apply_drafts(saved, drafts):
+    """
+    Saved answers overlaid with drafts. A draft lost from the cache falls
+    back to the last checkpoint; a cleared question is a CLEARED marker.
+    """
+    answers = {**(saved or {}), **drafts}
+    return {question_id: value for question_id, value in answers.items() if value != CLEARED}
+
+
+class DraftCheckpointer:
+    def __init__(self):
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._last_checkpoint = time.monotonic()
+
+    def __len__(self):
+        return len(self._dirty)
+
+    def mark(self, attempt_id):
+        with self._lock:
+            self._dirty.add(str(attempt_id))
+
+    def discard(self, attempt_id):
+        with self._lock:
+            self._dirty.discard(str(attempt_id))
+
+    def checkpoint_if_due(self):
+        if self._dirty and time.monotonic() - self._last_checkpoint >= get_config()['CHECKPOINT_INTERVAL']:
+            return self.checkpoint()
+        return 0
+
+    def checkpoint(self):
+        """Write the drafts of dirty attempts to TestResult.answers; returns rows written."""
+        with self._lock:
+            attempt_ids = list(self._dirty)
+            self._dirty.clear()
+            self._last_checkpoint = time.monotonic()
+        if not attempt_ids:
+            return 0
+        try:
+            return write_drafts(
+                TestResult.objects.filter(pk__in=attempt_ids, completed_at__isnull=True)
+                .only('id', 'test_id', 'answers')
+            )
+        except Exception as e:
+            logger.error(f"Exam draft checkpoint failed for {len(attempt_ids)} attempts: {str(e)}")
+            with self._lock:
+                self._dirty.update(attempt_ids)
+            return 0
+
+    def clear(self):
+        with self._lock:
+            self._dirty.clear()
+
+
+def write_drafts(rows):
+    """Merge cached drafts into the answers of open attempts; returns rows written."""
+    from .exams import get_paper
+
+    changed = []
+    for row in rows:
+        paper = get_paper(row.test_id)
+        question_ids = [question['id'] for question in paper['questions']] if paper else []
+        answers = apply_drafts(row.answers, load_drafts(row.pk, question_ids))
+        if answers != row.answers:
+            row.answers = answers
+            row.updated_at = timezone.now()
+            changed.append(row)
+    # Shu orada topshirilgan urinishning yakuniy javoblari ustidan yozilmaydi
+    return TestResult.objects.filter(completed_at__isnull=True).bulk_update(changed, ['answers', 'updated_at'])
+
+
+def checkpoint_open_attempts(chunk_size=500):
+    """Checkpoint the cached drafts of every open attempt; returns rows written."""
+    queryset = TestResult.objects.filter(completed_at__isnull=True).only('id', 'test_id', 'answers').order_by('pk')
+    written, last_pk = 0, None
+    while True:
+        chunk = list((queryset.filter(pk__gt=last_pk) if last_pk else queryset)[:chunk_size])
+        if not chunk:
+            return written
+        last_pk = chunk[-1].pk
+        written += write_drafts(chunk)
+
+
+checkpointer = DraftCheckpointer()
+
+
+def checkpoint_on_request_finished(sender, **kwargs):
+    checkpointer.checkpoint_if_due()
+
+
+atexit.register(checkpointer.checkpoint)
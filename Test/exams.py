@@ -0,0 +1,333 @@
+"""
+Exam sessions: timed attempts with a cached paper and one-shot submission.
+
+An attempt is the TestResult of (test, user); it starts when the row is
+created and must be submitted before started_at + duration_minutes plus
+EXAM_SUBMIT_GRACE_SECONDS. The paper (questions and answer options, never
+is_correct) is built with two queries and cached under the test version
+from answer_keys.py, so starting an exam only reads the attempt row.
+Submissions are graded in memory against the cached answer key.
+
+Tests can shuffle questions and answer options and sample
+questions_per_attempt questions from their pool. Each attempt stores a
+random seed and, for sampled tests, the question ids drawn when it started,
+so later changes to the pool never change what an attempt was given or how
+it is graded. personalize() derives the attempt's paper from the shared
+cached one in O(n) without further queries.
+
+Answers autosaved during the attempt (drafts.py) are merged into the final
+answer sheet on submit, and finalize_expired() closes attempts whose time
+ran out with whatever was saved.
+"""
+import random
+import secrets
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import drafts, leaderboards
+from .answer_keys import bump_results_version, cached_for_test, get_answer_key
+from .grading import apply_grade, attempt_question_ids, grade_answers
+from .models import Question, Test, TestResult
+
+DEFAULT_GRACE_SECONDS = 30
+
+
+class ExamError(Exception):
+    """A request that the exam rules reject; ``code`` becomes the HTTP status."""
+
+    def __init__(self, message, code=400):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+def load_paper(test_id):
+    """The test's paper as plain data, or None if the test does not exist."""
+    test = (
+        Test.objects.filter(pk=test_id)
+        .values('id', 'title', 'description', 'duration_minutes', 'passing_score', 'is_active',
+                'course_id', 'course__instructor_id', 'shuffle_questions', 'shuffle_answers',
+                'questions_per_attempt')
+        .first()
+    )
+    if test is None:
+        return None
+    rows = (
+        Question.objects.filter(test_id=test_id)
+        .order_by('order', 'id', 'answers__created_at', 'answers__id')
+        .values_list('id', 'text', 'points', 'order', 'answers__id', 'answers__text')
+    )
+    questions = []
+    for (question_id, text, points, order), answers in groupby(rows, key=lambda row: row[:4]):
+        questions.append({
+            'id': str(question_id),
+            'text': text,
+            'points': points,
+            'order': order,
+            'answers': [{'id': str(row[4]), 'text': row[5]} for row in answers if row[4] is not None],
+        })
+    return {
+        'test': {
+            'id': str(test['id']),
+            'title': test['title'],
+            'description': test['description'],
+            'duration_minutes': test['duration_minutes'],
+            'passing_score': test['passing_score'],
+            'question_count': len(questions),
+            'total_points': sum(question['points'] for question in questions),
+        },
+        'is_active': test['is_active'],
+        'course_id': str(test['course_id']),
+        'instructor_id': str(test['course__instructor_id']) if test['course__instructor_id'] else None,
+        'shuffle_questions': test['shuffle_questions'],
+        'shuffle_answers': test['shuffle_answers'],
+        'questions_per_attempt': test['questions_per_attempt'],
+        'questions': questions,
+    }
+
+
+def get_paper(test_id):
+    return cached_for_test(test_id, 'paper', load_paper)
+
+
+def new_seed():
+    return secrets.randbits(31)
+
+
+def is_randomized(paper):
+    return paper['shuffle_questions'] or paper['shuffle_answers'] or bool(paper['questions_per_attempt'])
+
+
+def draw_questions(paper, seed):
+    """Question ids sampled for a new attempt, or None when it gets the whole test."""
+    count = paper['questions_per_attempt']
+    if not count or count >= len(paper['questions']):
+        return None
+    picked = sorted(random.Random(seed).sample(range(len(paper['questions'])), count))
+    return [paper['questions'][index]['id'] for index in picked]
+
+
+def personalize(paper, seed, question_ids=None):
+    """The paper of one attempt: its drawn questions, shuffled deterministically from ``seed``."""
+    if paper is None or seed is None or not is_randomized(paper):
+        return paper
+    rng = random.Random(seed)
+    questions = paper['questions']
+    if question_ids is not None:
+        drawn = set(question_ids)
+        questions = [question for question in questions if question['id'] in drawn]
+    if paper['shuffle_questions']:
+        questions = list(questions)
+        rng.shuffle(questions)
+    if paper['shuffle_answers']:
+        shuffled = []
+        for question in questions:
+            # Savol bo'yicha alohida generator - tartib savollar tanloviga bog'liq emas
+            answers = list(question['answers'])
+            random.Random(f"{seed}:{question['id']}").shuffle(answers)
+            shuffled.append({**question, 'answers': answers})
+        questions = shuffled
+    return {
+        **paper,
+        'test': {
+            **paper['test'],
+            'question_count': len(questions),
+            'total_points': sum(question['points'] for question in questions),
+        },
+        'questions': questions,
+    }
+
+
+def deadline(attempt, paper):
+    return attempt.started_at + timedelta(minutes=paper['test']['duration_minutes'])
+
+
+def grace():
+    return timedelta(seconds=getattr(settings, 'EXAM_SUBMIT_GRACE_SECONDS', DEFAULT_GRACE_SECONDS))
+
+
+def can_take(user, paper):
+    if user.role == 'admin' or user.is_staff or str(user.pk) == paper['instructor_id']:
+        return True
+    from Course.models import Course
+    return Course.enrolled_students.through.objects.filter(
+        course_id=paper['course_id'], customeruser_id=user.pk
+    ).exists()
+
+
+def question_ids(paper):
+    return [question['id'] for question in paper['questions']]
+
+
+def current_answers(attempt, paper):
+    """Checkpointed answers of an open attempt overlaid with its drafts."""
+    return drafts.apply_drafts(attempt.answers, drafts.load_drafts(attempt.pk, question_ids(paper)))
+
+
+def session_payload(attempt, paper):
+    return {
+        'attempt': str(attempt.pk),
+        'started_at': attempt.started_at,
+        'expires_at': deadline(attempt, paper),
+        'answers': current_answers(attempt, paper),
+        'test': paper['test'],
+        'questions': paper['questions'],
+    }
+
+
+def start_attempt(user, test_id):
+    """Start or resume the user's attempt; returns (attempt, paper, created)."""
+    paper = get_paper(test_id)
+    if paper is None:
+        raise ExamError("Test topilmadi", code=404)
+    if not paper['is_active']:
+        raise ExamError("Test faol emas", code=403)
+    if not can_take(user, paper):
+        raise ExamError("Testni topshirish uchun kursga yozilishingiz kerak", code=403)
+
+    attempt = TestResult.objects.filter(test_id=test_id, user=user).first()
+    created = False
+    if attempt is None:
+        try:
+            with transaction.atomic():
+                seed = new_seed()
+                attempt = TestResult.objects.create(test_id=test_id, user=user, answers={}, seed=seed,
+                                                    question_ids=draw_questions(paper, seed))
+            created = True
+        except IntegrityError:
+            # Parallel so'rov allaqachon urinishni yaratgan
+            attempt = TestResult.objects.get(test_id=test_id, user=user)
+    paper = personalize(paper, attempt.seed, attempt.question_ids)
+    if attempt.completed_at:
+        raise ExamError("Siz bu testni allaqachon topshirgansiz", code=409)
+    if timezone.now() > deadline(attempt, paper) + grace():
+        finalize(attempt, paper, answers=current_answers(attempt, paper), at=deadline(attempt, paper))
+        raise ExamError("Test vaqti tugagan", code=409)
+    drafts.remember_attempt(attempt, deadline(attempt, paper))
+    return attempt, paper, created
+
+
+def clean_answers(paper, answers, allow_clear=False):
+    """Validate an answer sheet against the paper; returns {question id: id or [ids]}."""
+    if not isinstance(answers, dict):
+        raise ExamError("answers savol ID -> javob ID ko'rinishidagi obyekt bo'lishi kerak")
+    options = {question['id']: {answer['id'] for answer in question['answers']} for question in paper['questions']}
+    cleaned = {}
+    for question_id, value in answers.items():
+        question_id = str(question_id)
+        if question_id not in options:
+            raise ExamError(f"Savol bu testga tegishli emas: {question_id}")
+        if value is None and allow_clear:
+            cleaned[question_id] = None
+            continue
+        chosen = [str(item) for item in value] if isinstance(value, (list, tuple)) else [str(value)]
+        if not set(chosen) <= options[question_id]:
+            raise ExamError(f"Javob savolga tegishli emas: {question_id}")
+        cleaned[question_id] = chosen if isinstance(value, (list, tuple)) else chosen[0]
+    return cleaned
+
+
+def finalize(attempt, paper, answers=None, at=None):
+    """Grade and close an attempt. Does not check the deadline."""
+    if answers is not None:
+        attempt.answers = answers
+    attempt.completed_at = at or timezone.now()
+    key = get_answer_key(attempt.test_id)
+    apply_grade(attempt, key)
+    if attempt.score is None:
+        attempt.passed = False
+    attempt.save(update_fields=['answers', 'completed_at', 'score', 'passed', 'updated_at'])
+    transaction.on_commit(lambda: close_drafts(attempt.pk, paper))
+    return attempt, (grade_answers(key, attempt.answers, attempt_question_ids(attempt)) if key else (0, 0))
+
+
+def close_drafts(attempt_id, paper):
+    drafts.mark_completed(attempt_id)
+    drafts.clear_drafts(attempt_id, question_ids(paper))
+
+
+def save_answers(user, attempt_id, answers):
+    """Autosave part of an answer sheet; returns the attempt deadline."""
+    meta = drafts.attempt_meta(attempt_id)
+    if meta is None or meta['user_id'] != str(user.pk):
+        raise ExamError("Urinish topilmadi", code=404)
+    if meta['completed']:
+        raise ExamError("Siz bu testni allaqachon topshirgansiz", code=409)
+    if timezone.now() > meta['deadline'] + grace():
+        raise ExamError("Test vaqti tugagan", code=409)
+    paper = personalize(get_paper(meta['test_id']), meta.get('seed'), meta.get('question_ids'))
+    cleaned = clean_answers(paper, answers, allow_clear=True)
+    drafts.save_drafts(attempt_id, cleaned)
+    return meta['deadline'], len(cleaned)
+
+
+def submit_attempt(user, attempt_id, answers):
+    """
+    Grade an attempt: autosaved answers overlaid with the submitted ones.
+    Returns (attempt, earned, total).
+    """
+    with transaction.atomic():
+        attempt = (
+            TestResult.objects.select_for_update()
+            .only('id', 'test_id', 'user_id', 'started_at', 'completed_at', 'answers', 'seed', 'question_ids',
+                  'score', 'passed')
+            .filter(pk=attempt_id, user=user)
+            .first()
+        )
+        if attempt is None:
+            raise ExamError("Urinish topilmadi", code=404)
+        if attempt.completed_at:
+            raise ExamError("Siz bu testni allaqachon topshirgansiz", code=409)
+        paper = personalize(get_paper(attempt.test_id), attempt.seed, attempt.question_ids)
+        saved = current_answers(attempt, paper)
+        late = timezone.now() > deadline(attempt, paper) + grace()
+        if late:
+            # Kech yuborilgan javoblar qabul qilinmaydi, urinish saqlangan holatida yopiladi
+            finalize(attempt, paper, answers=saved, at=deadline(attempt, paper))
+        else:
+            answers = {**saved, **clean_answers(paper, answers or {})}
+            attempt, (earned, total) = finalize(attempt, paper, answers=answers)
+    if late:
+        raise ExamError("Test vaqti tugagan", code=409)
+    return attempt, earned, total
+
+
+def finalize_expired(now=None, chunk_size=500):
+    """Close every open attempt past its deadline plus grace; returns the number closed."""
+    now = now or timezone.now()
+    queryset = (
+        TestResult.objects.filter(completed_at__isnull=True, started_at__lt=now - timedelta(minutes=1) - grace())
+        .only('id', 'test_id', 'user_id', 'started_at', 'completed_at', 'answers', 'seed', 'question_ids',
+              'score', 'passed')
+        .order_by('pk')
+    )
+    closed, last_pk = 0, None
+    while True:
+        chunk = list((queryset.filter(pk__gt=last_pk) if last_pk else queryset)[:chunk_size])
+        if not chunk:
+            return closed
+        last_pk = chunk[-1].pk
+        expired = []
+        for attempt in chunk:
+            paper = personalize(get_paper(attempt.test_id), attempt.seed, attempt.question_ids)
+            if paper is None or now <= deadline(attempt, paper) + grace():
+                continue
+            attempt.answers = current_answers(attempt, paper)
+            attempt.completed_at = deadline(attempt, paper)
+            apply_grade(attempt, get_answer_key(attempt.test_id))
+            attempt.updated_at = now
+            expired.append((attempt, paper))
+        TestResult.objects.bulk_update(
+            [attempt for attempt, _ in expired], ['answers', 'completed_at', 'score', 'passed', 'updated_at']
+        )
+        for attempt, paper in expired:
+            close_drafts(attempt.pk, paper)
+        # bulk_update signal yubormaydi
+        for test_id in {attempt.test_id for attempt, _ in expired}:
+            bump_results_version(test_id)
+        leaderboards.record_results([attempt for attempt, _ in expired])
+        closed += len(expired)
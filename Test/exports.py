@@ -0,0 +1,63 @@
+"""
+Bulk export of test results.
+
+Rows are read with values_list().iterator(), so neither the ORM nor the
+writers keep more than one chunk in memory. CSV is streamed as it is
+produced; XLSX is written by XlsxWriter in constant_memory mode to a
+temporary file which is then streamed back.
+"""
+import csv
+import tempfile
+
+import xlsxwriter
+
+EXPORT_HEADERS = ['Test', 'Student', 'Email', 'Score', 'Passed', 'Started At', 'Completed At']
+EXPORT_FIELDS = (
+    'test__title', 'user__username', 'user__email', 'score', 'passed', 'started_at', 'completed_at'
+)
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() just hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset):
+    rows = queryset.order_by('created_at', 'id').values_list(*EXPORT_FIELDS)
+    for title, username, email, score, passed, started_at, completed_at in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield [title, username, email or '', score, 'Yes' if passed else 'No', started_at, completed_at]
+
+
+def stream_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADERS)
+    for row in export_rows(queryset):
+        yield writer.writerow(row)
+
+
+def write_xlsx(queryset):
+    """Write the export to a temporary file and return it rewound."""
+    output = tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'remove_timezone': True})
+    sheet = workbook.add_worksheet('Results')
+    bold = workbook.add_format({'bold': True})
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+    sheet.write_row(0, 0, EXPORT_HEADERS, bold)
+    for row_index, row in enumerate(export_rows(queryset), start=1):
+        title, username, email, score, passed, started_at, completed_at = row
+        sheet.write_string(row_index, 0, title)
+        sheet.write_string(row_index, 1, username)
+        sheet.write_string(row_index, 2, email)
+        if score is not None:
+            sheet.write_number(row_index, 3, float(score))
+        sheet.write_string(row_index, 4, passed)
+        if started_at:
+            sheet.write_datetime(row_index, 5, started_at, date_format)
+        if completed_at:
+            sheet.write_datetime(row_index, 6, completed_at, date_format)
+    workbook.close()
+    output.seek(0)
+    return output
@@ -0,0 +1,164 @@
+"""
+Set-based grading for TestResult submissions.
+
+The answer key of a test is loaded with a single query and every answer sheet
+is scored in memory against it, so the number of queries does not grow with
+the number of questions or submissions.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import groupby
+
+from .models import Question, TestResult
+
+SCORE_QUANT = Decimal('0.01')
+
+
+class AnswerKey:
+    """
+    Compact answer key of one test: question id -> (correct answer ids, points).
+    """
+    __slots__ = ('test_id', 'passing_score', 'questions', 'total_points')
+
+    def __init__(self, test_id, passing_score, questions):
+        self.test_id = str(test_id)
+        self.passing_score = passing_score
+        self.questions = questions
+        self.total_points = sum(points for _, points in questions.values())
+
+    def __getstate__(self):
+        return (self.test_id, self.passing_score, self.questions)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
+def load_answer_keys(test_ids):
+    """Answer keys for several tests, read in one query."""
+    test_ids = list(test_ids)
+    rows = (
+        Question.objects
+        .filter(test_id__in=test_ids)
+        .order_by('test_id', 'id')
+        .values_list('test_id', 'test__passing_score', 'id', 'points', 'answers__id', 'answers__is_correct')
+    )
+    keys = {}
+    for test_id, test_rows in groupby(rows, key=lambda row: row[0]):
+        questions = {}
+        passing_score = 0
+        for _, passing_score, question_id, points, answer_id, is_correct in test_rows:
+            correct, _ = questions.get(str(question_id), (frozenset(), points))
+            if answer_id is not None and is_correct:
+                correct = correct | {str(answer_id)}
+            questions[str(question_id)] = (correct, points)
+        keys[str(test_id)] = AnswerKey(test_id, passing_score, questions)
+    for test_id in test_ids:
+        keys.setdefault(str(test_id), None)
+    return keys
+
+
+def load_answer_key(test_id):
+    """Answer key of a single test, or None if it has no questions."""
+    return load_answer_keys([test_id])[str(test_id)]
+
+
+def _selected_ids(value):
+    if isinstance(value, (list, tuple, set)):
+        return frozenset(str(v) for v in value)
+    if value in (None, ''):
+        return frozenset()
+    return frozenset([str(value)])
+
+
+def grade_answers(key, answers, question_ids=None):
+    """
+    Score an answer sheet against an answer key.
+
+    ``answers`` maps question id to the chosen answer id (or a list of ids for
+    multi-select questions). A question earns its points only when the chosen
+    set equals the set of correct answers. ``question_ids`` limits grading to
+    the questions an attempt was given. Returns (earned points, total points).
+    """
+    if question_ids is None:
+        total = key.total_points
+    else:
+        question_ids = {str(question_id) for question_id in question_ids}
+        total = sum(key.questions[question_id][1] for question_id in question_ids if question_id in key.questions)
+    earned = 0
+    for question_id, value in (answers or {}).items():
+        if question_ids is not None and str(question_id) not in question_ids:
+            continue
+        entry = key.questions.get(str(question_id))
+        if entry is None:
+            continue
+        correct, points = entry
+        if correct and _selected_ids(value) == correct:
+            earned += points
+    return earned, total
+
+
+def score_percent(earned, total):
+    if not total:
+        return None
+    return (Decimal(earned) * 100 / Decimal(total)).quantize(SCORE_QUANT, rounding=ROUND_HALF_UP)
+
+
+def attempt_question_ids(result):
+    """Questions drawn for a sampled attempt, or None if it got the whole test."""
+    return result.question_ids
+
+
+def apply_grade(result, key):
+    """Set score and passed on a result from its answers. Does not save."""
+    if key is None:
+        return result
+    score = score_percent(*grade_answers(key, result.answers, attempt_question_ids(result)))
+    if score is not None:
+        result.score = score
+        result.passed = score >= key.passing_score
+    return result
+
+
+def grade_results(results, batch_size=500):
+    """
+    Grade many results in one pass and persist them with bulk_update.
+
+    Answer keys for every test involved are loaded in a single query.
+    """
+    results = list(results)
+    keys = load_answer_keys({result.test_id for result in results})
+    for result in results:
+        apply_grade(result, keys[str(result.test_id)])
+    TestResult.objects.bulk_update(results, ['score', 'passed'], batch_size=batch_size)
+    from .leaderboards import record_results
+    record_results(results)
+    return results
+
+
+def grade_test(test, chunk_size=2000, regrade=False):
+    """
+    Grade every completed submission of a test in chunks.
+
+    By default only ungraded results are touched; ``regrade=True`` rescoring is
+    used after the answer key changed. Returns the number of graded results.
+    """
+    from .leaderboards import record_results
+
+    key = load_answer_key(test.pk)
+    queryset = TestResult.objects.filter(test_id=test.pk, completed_at__isnull=False)
+    if not regrade:
+        queryset = queryset.filter(score__isnull=True)
+    queryset = queryset.only('id', 'test_id', 'user_id', 'answers', 'question_ids', 'score', 'passed').order_by('id')
+
+    # Chunks are walked by primary key instead of iterator(): SQLite gives no
+    # isolation between an open cursor and writes to the same table.
+    graded = 0
+    last_id = None
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        batch = [apply_grade(result, key) for result in chunk[:chunk_size]]
+        if not batch:
+            return graded
+        TestResult.objects.bulk_update(batch, ['score', 'passed'])
+        record_results(batch)
+        graded += len(batch)
+        last_id = batch[-1].id
@@ -0,0 +1,393 @@
+"""
+Leaderboards of graded results per Test and per Course.
+
+A board lives in the shared cache as a dense histogram of scores in
+hundredths of a percent (BUCKETS counters) plus the TOP_SIZE best
+participants. Rank and percentile of a score are one slice sum over the
+histogram and top-N is a list slice, so reads cost the same for ten or a
+million participants and do not touch the database. A test board ranks
+TestResult.score; a course board ranks each user's mean score over the
+graded tests of the course.
+
+Score changes are applied as deltas after their transaction commits
+(signals.py, and record_results() after the bulk_update calls in grading.py
+and exams.py). The request only reads what changed; a small thread pool
+takes the board's cache.add lock and applies the delta, so no request waits
+for the lock. Results written together with bulk_update are recorded as one
+batch, which reads the course totals of all its users in a single grouped
+query. A board that is missing, expired, or whose top list lost an entry the
+histogram cannot refill is rebuilt from the database with grouped queries on
+its next read, by whichever reader takes the board lock; meanwhile other
+readers get the stale board, or wait for the lock if there is none. Deleted
+results invalidate their boards the same way.
+
+A rebuild may already contain a change whose delta has not been applied
+yet. Every change therefore takes two numbers from a shared cache counter,
+one after its row is written and one after the commit, and every rebuild
+stores the counter before and after its read as the board's watermark. A
+delta committed before the rebuild read is skipped, one written after it is
+applied, and one whose transaction overlapped the read marks the board
+stale.
+
+Settings:
+    LEADERBOARD_WORKERS = 1        # thread pool size
+    LEADERBOARD_ASYNC = True       # False applies deltas inline (tests, scripts)
+"""
+import logging
+import threading
+import time
+from bisect import insort
+from concurrent.futures import ThreadPoolExecutor
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .answer_keys import cached_for_test
+from .models import Test, TestResult
+
+logger = logging.getLogger(__name__)
+
+BOARD_KEY = 'leaderboard:{scope}:{pk}'
+USER_KEY = 'leaderboard:{scope}:{pk}:user:{user_id}'
+SEQUENCE_KEY = 'leaderboard:sequence'
+BOARD_TIMEOUT = 60 * 60 * 24
+LOCK_TIMEOUT = 60
+LOCK_WAIT = 0.05
+USER_TIMEOUT = 60 * 60 * 24
+TOP_SIZE = 100
+BUCKETS = 10001
+NO_SCORE = -1
+TEST, COURSE = 'test', 'course'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def to_bucket(score):
+    if score is None:
+        return None
+    bucket = int((Decimal(str(score)) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+    return min(max(bucket, 0), BUCKETS - 1)
+
+
+def from_bucket(bucket):
+    return (Decimal(bucket) / 100).quantize(Decimal('0.01'))
+
+
+def mean_bucket(total, count):
+    return to_bucket(Decimal(str(total)) / count) if count else None
+
+
+def _entry_key(entry):
+    bucket, user_id = entry
+    return -bucket, user_id
+
+
+def course_of(test_id):
+    def load(pk):
+        course_id = Test.objects.filter(pk=pk).values_list('course_id', flat=True).first()
+        return str(course_id) if course_id else None
+    return cached_for_test(test_id, 'course_id', load)
+
+
+def course_totals(course_id, user_id):
+    """(sum of scores, number of graded tests) of a user in a course."""
+    row = TestResult.objects.filter(
+        test__course_id=course_id, user_id=user_id, score__isnull=False
+    ).aggregate(total=Sum('score'), count=Count('id'))
+    return row['total'] or 0, row['count']
+
+
+def course_totals_many(pairs):
+    """course_totals() for many (course_id, user_id) pairs in one grouped query."""
+    if not pairs:
+        return {}
+    rows = (
+        TestResult.objects.filter(
+            test__course_id__in={course_id for course_id, _ in pairs},
+            user_id__in={user_id for _, user_id in pairs},
+            score__isnull=False,
+        )
+        .values_list('test__course_id', 'user_id').annotate(total=Sum('score'), count=Count('id')).order_by()
+    )
+    return {(str(course_id), str(user_id)): (total or 0, count) for course_id, user_id, total, count in rows}
+
+
+# === BUILD ===
+def build(scope, pk):
+    """A board computed from the database."""
+    counts = [0] * BUCKETS
+    if scope == TEST:
+        scored = TestResult.objects.filter(test_id=pk, score__isnull=False)
+        for score, count in scored.values_list('score').annotate(count=Count('id')).order_by():
+            counts[to_bucket(score)] += count
+        top = [
+            (to_bucket(score), str(user_id))
+            for user_id, score in scored.order_by('-score', 'user_id').values_list('user_id', 'score')[:TOP_SIZE]
+        ]
+    else:
+        entries = []
+        rows = (
+            TestResult.objects.filter(test__course_id=pk, score__isnull=False)
+            .values_list('user_id').annotate(total=Sum('score'), count=Count('id')).order_by()
+        )
+        for user_id, total, count in rows:
+            bucket = mean_bucket(total, count)
+            counts[bucket] += 1
+            entries.append((bucket, str(user_id)))
+        top = sorted(entries, key=_entry_key)[:TOP_SIZE]
+    return {'counts': counts, 'total': sum(counts), 'top': top, 'stale': False}
+
+
+def tick():
+    """Next value of the shared counter that orders commits and rebuilds, or None if the cache is down."""
+    try:
+        try:
+            return cache.incr(SEQUENCE_KEY)
+        except ValueError:
+            cache.add(SEQUENCE_KEY, 0, timeout=None)
+            return cache.incr(SEQUENCE_KEY)
+    except Exception:
+        return None
+
+
+def _acquire(key, wait=False):
+    """Take the board lock; with ``wait`` poll until it expires at the latest."""
+    lock = f'{key}:lock'
+    deadline = time.monotonic() + (LOCK_TIMEOUT if wait else 0)
+    while not cache.add(lock, 1, timeout=LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(LOCK_WAIT)
+    return lock
+
+
+def _store(key, board):
+    cache.set(key, board, timeout=max(int(board.get('expires', 0) - time.time()), 1))
+
+
+def _compute(scope, pk):
+    started = tick()
+    board = build(scope, pk)
+    board.update(watermark=(started, tick()), expires=time.time() + BOARD_TIMEOUT)
+    return board
+
+
+def rebuild(scope, pk):
+    """Recompute a board under its lock and store it; returns the board, or None if the lock never freed."""
+    key = BOARD_KEY.format(scope=scope, pk=pk)
+    lock = _acquire(key, wait=True)
+    if lock is None:
+        return None
+    try:
+        board = _compute(scope, pk)
+        _store(key, board)
+        return board
+    finally:
+        cache.delete(lock)
+
+
+def get_board(scope, pk):
+    key = BOARD_KEY.format(scope=scope, pk=pk)
+    board = cache.get(key)
+    if board is not None and not board['stale']:
+        return board
+    # Eskirgan reyting bo'lsa kutilmaydi - uni qulf egasi qayta quradi
+    lock = _acquire(key, wait=board is None)
+    if lock is None:
+        return board if board is not None else _compute(scope, pk)
+    try:
+        current = cache.get(key)
+        if current is not None and not current['stale']:
+            # Qulf kutilayotganda boshqa so'rov qayta qurib bo'lgan
+            return current
+        board = _compute(scope, pk)
+        _store(key, board)
+        return board
+    finally:
+        cache.delete(lock)
+
+
+def invalidate(scope, pk, user_id=None):
+    cache.delete(BOARD_KEY.format(scope=scope, pk=pk))
+    if user_id is not None:
+        cache.delete(USER_KEY.format(scope=scope, pk=pk, user_id=user_id))
+
+
+# === UPDATE ===
+def _move(scope, pk, user_id, old, new, written, committed):
+    """
+    Move a participant from bucket ``old`` to ``new``; None means not on the
+    board. ``written`` and ``committed`` are tick()s taken after the row was
+    written and after its transaction committed.
+    """
+    if old == new:
+        return
+    key = BOARD_KEY.format(scope=scope, pk=pk)
+    lock = _acquire(key, wait=True)
+    if lock is None:
+        # Qulf muddati tugaguncha ham bo'shamasa - reyting qayta quriladi
+        cache.delete(key)
+        return
+    try:
+        board = cache.get(key)
+        if board is None:
+            return
+        started, finished = board.get('watermark', (None, None))
+        if None not in (started, committed) and committed < started:
+            # Qayta qurish bu o'zgarishni allaqachon o'z ichiga olgan
+            return
+        if None in (finished, written) or written < finished:
+            # Tranzaksiya qayta qurish bilan ustma-ust tushgan - natija noma'lum
+            board['stale'] = True
+            _store(key, board)
+            return
+        counts = board['counts']
+        if old is not None:
+            counts[old] -= 1
+        if new is not None:
+            counts[new] += 1
+        board['total'] += (new is not None) - (old is not None)
+
+        top = [entry for entry in board['top'] if entry[1] != user_id]
+        others = board['total'] - (new is not None)
+        if new is not None:
+            entry = (new, user_id)
+            if len(top) >= others or (top and _entry_key(entry) < _entry_key(top[-1])):
+                insort(top, entry, key=_entry_key)
+                del top[TOP_SIZE:]
+        board['top'] = top
+        board['stale'] = board['stale'] or len(top) < min(TOP_SIZE, board['total'])
+        _store(key, board)
+    finally:
+        cache.delete(lock)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'LEADERBOARD_WORKERS', 1), thread_name_prefix='leaderboards'
+            )
+        return _executor
+
+
+def _apply(moves):
+    for move in moves:
+        try:
+            _move(*move)
+        except Exception as e:
+            logger.error(f"Leaderboard update failed for {move[0]} {move[1]}: {str(e)}")
+
+
+def record(changes, written=None):
+    """
+    Apply committed score changes, (test_id, user_id, old_score, new_score)
+    tuples, to their test and course boards.
+    """
+    try:
+        committed = tick()
+        written = committed if written is None else written
+        changes = [(str(test_id), str(user_id), old, new) for test_id, user_id, old, new in changes]
+        courses = {test_id: course_of(test_id) for test_id in {change[0] for change in changes}}
+        moves, deltas = [], {}
+        for test_id, user_id, old_score, new_score in changes:
+            moves.append((TEST, test_id, user_id, to_bucket(old_score), to_bucket(new_score)))
+            if courses[test_id] is not None:
+                delta = deltas.setdefault((courses[test_id], user_id), [0, 0])
+                delta[0] += (new_score or 0) - (old_score or 0)
+                delta[1] += (new_score is not None) - (old_score is not None)
+        totals = course_totals_many(deltas)
+        for (course_id, user_id), (delta_total, delta_count) in deltas.items():
+            total, count = totals.get((course_id, user_id), (0, 0))
+            # O'zgarishdan oldingi holat = hozirgi holat - delta
+            moves.append((COURSE, course_id, user_id, mean_bucket(total - delta_total, count - delta_count),
+                          mean_bucket(total, count)))
+        cache.set_many({
+            USER_KEY.format(scope=scope, pk=pk, user_id=user_id): NO_SCORE if new is None else new
+            for scope, pk, user_id, old, new in moves
+        }, timeout=USER_TIMEOUT)
+        moves = [(*move, written, committed) for move in moves]
+        if getattr(settings, 'LEADERBOARD_ASYNC', True):
+            get_executor().submit(_apply, moves)
+        else:
+            _apply(moves)
+    except Exception as e:
+        logger.error(f"Leaderboard update failed for {len(changes)} results: {str(e)}")
+
+
+def _change(result):
+    old, new = getattr(result, '_loaded_score', None), result.score
+    result._loaded_score = new
+    return None if old == new else (result.test_id, result.user_id, old, new)
+
+
+def schedule(result):
+    """Record a saved result's score change once the transaction commits."""
+    change = _change(result)
+    if change is not None:
+        written = tick()
+        transaction.on_commit(lambda: record([change], written))
+
+
+def record_results(results):
+    """schedule() for results written with bulk_update, which sends no signals, as one batch."""
+    changes = [change for change in map(_change, results) if change is not None]
+    if changes:
+        written = tick()
+        transaction.on_commit(lambda: record(changes, written))
+
+
+def discard(result):
+    """Invalidate the boards of a deleted result."""
+    test_id, user_id = str(result.test_id), str(result.user_id)
+    invalidate(TEST, test_id, user_id)
+    course_id = course_of(test_id)
+    if course_id:
+        invalidate(COURSE, course_id, user_id)
+
+
+# === READ ===
+def user_bucket(scope, pk, user_id):
+    key = USER_KEY.format(scope=scope, pk=pk, user_id=user_id)
+    bucket = cache.get(key)
+    if bucket is None:
+        if scope == TEST:
+            score = TestResult.objects.filter(test_id=pk, user_id=user_id).values_list('score', flat=True).first()
+            bucket = to_bucket(score)
+        else:
+            bucket = mean_bucket(*course_totals(pk, user_id))
+        cache.set(key, NO_SCORE if bucket is None else bucket, timeout=USER_TIMEOUT)
+    return None if bucket == NO_SCORE else bucket
+
+
+def top(scope, pk, limit=10):
+    """The best ``limit`` participants with competition ranks (ties share a rank)."""
+    board = get_board(scope, pk)
+    rows, rank, previous = [], 0, None
+    for position, (bucket, user_id) in enumerate(board['top'][:limit], start=1):
+        if bucket != previous:
+            rank, previous = position, bucket
+        rows.append({'rank': rank, 'user_id': user_id, 'score': from_bucket(bucket)})
+    return {'participants': board['total'], 'top': rows}
+
+
+def standing(scope, pk, user_id):
+    """Rank and percentile (share of participants below, ties counted half) of a user."""
+    board = get_board(scope, pk)
+    bucket = user_bucket(scope, pk, str(user_id))
+    if bucket is None or not board['total']:
+        return {'participants': board['total'], 'score': None, 'rank': None, 'percentile': None}
+    counts = board['counts']
+    above = sum(counts[bucket + 1:])
+    below = board['total'] - above - counts[bucket]
+    return {
+        'participants': board['total'],
+        'score': from_bucket(bucket),
+        'rank': above + 1,
+        'percentile': round(100 * (below + counts[bucket] / 2) / board['total'], 1),
+    }
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from Test.drafts import checkpoint_open_attempts
+from Test.exams import finalize_expired
+
+
+class Command(BaseCommand):
+    help = "Checkpoint autosaved exam answers and close attempts whose time ran out"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Attempts read per batch")
+
+    def handle(self, *args, **options):
+        checkpointed = checkpoint_open_attempts(chunk_size=options['chunk_size'])
+        closed = finalize_expired(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Checkpointed {checkpointed} attempts, closed {closed} expired attempts"
+        ))
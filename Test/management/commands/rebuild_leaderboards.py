@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from Test import leaderboards
+from Test.models import TestResult
+
+
+class Command(BaseCommand):
+    help = "Rebuild test and course leaderboards from graded results"
+
+    def handle(self, *args, **options):
+        scored = TestResult.objects.filter(score__isnull=False).order_by()
+        boards = [(leaderboards.TEST, test_id) for test_id in scored.values_list('test_id', flat=True).distinct()]
+        boards += [(leaderboards.COURSE, course_id)
+                   for course_id in scored.values_list('test__course_id', flat=True).distinct()]
+        rebuilt = {leaderboards.TEST: 0, leaderboards.COURSE: 0}
+        skipped = 0
+        for scope, pk in boards:
+            # rebuild() qulfni kutadi; qulf bo'shamasa reyting o'tkazib yuboriladi
+            if leaderboards.rebuild(scope, str(pk)) is None:
+                skipped += 1
+            else:
+                rebuilt[scope] += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rebuilt[leaderboards.TEST]} test and {rebuilt[leaderboards.COURSE]} course leaderboards, "
+            f"skipped {skipped} locked"
+        ))
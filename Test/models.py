@@ -13,6 +13,10 @@ class Test(BaseModel):
     passing_score = models.IntegerField()
     is_active = models.BooleanField(default=True)
     created_by = models.ForeignKey(CustomerUser, on_delete=models.SET_NULL, null=True, related_name='created_tests')
+    shuffle_questions = models.BooleanField(default=False)
+    shuffle_answers = models.BooleanField(default=False)
+    # Har bir urinish uchun savollar bankidan tanlanadigan savollar soni (bo'sh - hammasi)
+    questions_per_attempt = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self):
         return self.title
@@ -58,21 +62,33 @@ class TestResult(BaseModel):
     started_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True)
     answers = models.JSONField(default=dict)
+    # Urinish varaqasidagi savollar tartibi shu seed'dan qayta quriladi
+    seed = models.PositiveIntegerField(null=True, blank=True)
+    # Savollar bankidan tanlangan savollar (bo'sh - testning barcha savollari)
+    question_ids = models.JSONField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.test.title} - {self.user.email}"
 
     def save(self, *args, **kwargs):
         if self.completed_at and not self.score:
-            # Calculate score when test is completed
-            total_questions = self.test.questions.count()
-            if total_questions > 0:
-                correct_answers = sum(1 for q_id, a_id in self.answers.items() 
-                                   if Answer.objects.get(id=a_id).is_correct)
-                self.score = (correct_answers / total_questions) * 100
-                self.passed = self.score >= self.test.passing_score
+            # Calculate score when test is completed (answer key is cached per test version)
+            from .answer_keys import get_answer_key
+            from .grading import apply_grade
+            apply_grade(self, get_answer_key(self.test_id))
         super().save(*args, **kwargs)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Reyting jadvali deltalari uchun asl ball
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
+
     class Meta:
         ordering = ['-created_at']
-        unique_together = ['test', 'user']
\ No newline at end of file
+        unique_together = ['test', 'user']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='testresult_keyset_idx'),
+            models.Index(fields=['test', 'score'], name='testresult_score_idx'),
+        ]
\ No newline at end of file
@@ -15,7 +15,8 @@ class TestSerializer(serializers.ModelSerializer):
     class Meta:
         model = Test
         fields = ['id', 'course', 'course_id', 'title', 'description', 'duration_minutes', 
-                 'passing_score', 'is_active', 'created_by', 'created_at', 'updated_at']
+                 'passing_score', 'is_active', 'shuffle_questions', 'shuffle_answers',
+                 'questions_per_attempt', 'created_by', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
     def validate_duration_minutes(self, value):
@@ -28,6 +29,11 @@ class TestSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("O'tish balli 0 dan 100 gacha bo'lishi kerak")
         return value
 
+    def validate_questions_per_attempt(self, value):
+        if value is not None and value < 1:
+            raise serializers.ValidationError("Urinishdagi savollar soni kamida 1 bo'lishi kerak")
+        return value
+
     def create(self, validated_data):
         course_id = validated_data.pop('course_id')
         course = Course.objects.get(id=course_id)
@@ -0,0 +1,43 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from Base.versions import bump_on_commit
+
+from . import leaderboards
+from .answer_keys import bump_results_version, bump_version
+from .models import Answer, Question, Test, TestResult
+
+
+@receiver(post_save, sender=Test)
+def test_saved(sender, instance, **kwargs):
+    # passing_score is part of the cached answer key
+    bump_on_commit(bump_version, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    bump_on_commit(bump_version, instance.test_id)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    if Answer.question.is_cached(instance):
+        test_id = instance.question.test_id
+    else:
+        test_id = Question.objects.filter(pk=instance.question_id).values_list('test_id', flat=True).first()
+    if test_id:
+        bump_on_commit(bump_version, test_id)
+
+
+@receiver(post_save, sender=TestResult)
+def result_saved(sender, instance, **kwargs):
+    # Ochiq urinishlar tahlilga kirmaydi
+    if instance.completed_at:
+        bump_on_commit(bump_results_version, instance.test_id)
+    leaderboards.schedule(instance)
+
+
+@receiver(post_delete, sender=TestResult)
+def result_deleted(sender, instance, **kwargs):
+    bump_on_commit(bump_results_version, instance.test_id)
+    leaderboards.discard(instance)
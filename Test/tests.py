@@ -1,12 +1,27 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
-from rest_framework import status
+from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
+from rest_framework import serializers, status
 from .models import Test, Question, Answer, TestResult
+from . import answer_keys, drafts, exams, leaderboards
+from .answer_keys import get_answer_key
+from .grading import grade_test
+from .serializers import AnswerSerializer
+from .views import AnswerDetailAPIView, AnswerListAPIView
+from Base.serializers import Sideloader, plan_queryset
+from CustomerUser.serializers import CustomerUserSerializer
 from Course.models import Course, Category
 from CustomerUser.models import CustomerUser
-from datetime import timedelta
+from datetime import datetime, timedelta
+from decimal import Decimal
 from unittest.mock import patch
+import io
+import statistics
+import zipfile
+from django.core.cache import cache
+from django.core.management import call_command
 from django.utils import timezone
 
 class TestModelTests(TestCase):
@@ -441,4 +456,930 @@ class TestResultAPITests(APITestCase):
         )
         result.save()  # This will trigger score calculation
         self.assertEqual(result.score, 100)
-        self.assertTrue(result.passed)
\ No newline at end of file
+        self.assertTrue(result.passed)
+
+class GradingTests(TestCase):
+    def setUp(self):
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100,
+            category=self.category,
+            instructor=self.user,
+            duration=timedelta(hours=2)
+        )
+        self.test = Test.objects.create(
+            course=self.course,
+            title='Test Test',
+            description='Test Description',
+            duration_minutes=30,
+            passing_score=70
+        )
+        self.questions = []
+        self.correct = []
+        self.wrong = []
+        for order, points in enumerate([1, 3, 1, 5], start=1):
+            question = Question.objects.create(test=self.test, text=f'Q{order}', points=points, order=order)
+            self.questions.append(question)
+            self.correct.append(Answer.objects.create(question=question, text='A', is_correct=True))
+            self.wrong.append(Answer.objects.create(question=question, text='B', is_correct=False))
+
+    def test_points_weighting(self):
+        """Savol ballari bo'yicha vaznli hisoblashni tekshirish"""
+        answers = {
+            str(self.questions[0].id): str(self.correct[0].id),
+            str(self.questions[1].id): str(self.wrong[1].id),
+            str(self.questions[2].id): str(self.correct[2].id),
+            str(self.questions[3].id): str(self.correct[3].id),
+        }
+        result = TestResult.objects.create(
+            test=self.test, user=self.user, answers=answers, completed_at=timezone.now()
+        )
+        self.assertEqual(result.score, Decimal('70.00'))
+        self.assertTrue(result.passed)
+
+    def test_score_uses_constant_queries(self):
+        """Ball hisoblash so'rovlar soni savollar soniga bog'liq emasligini tekshirish"""
+        answers = {str(q.id): str(a.id) for q, a in zip(self.questions, self.correct)}
+        result = TestResult(test=self.test, user=self.user, answers=answers, completed_at=timezone.now())
+        with self.assertNumQueries(2):  # answer key + insert
+            result.save()
+        self.assertEqual(result.score, Decimal('100.00'))
+
+    def test_unknown_answer_ids_are_wrong(self):
+        """Noma'lum javob identifikatorlari noto'g'ri deb hisoblanishini tekshirish"""
+        result = TestResult.objects.create(
+            test=self.test, user=self.user,
+            answers={str(self.questions[3].id): 'not-an-answer'},
+            completed_at=timezone.now()
+        )
+        self.assertEqual(result.score, Decimal('0.00'))
+        self.assertFalse(result.passed)
+
+    def test_grade_test_batch(self):
+        """Bitta testning barcha natijalarini birdaniga baholashni tekshirish"""
+        students = [
+            CustomerUser.objects.create_user(username=f'student{i}', email=f's{i}@example.com', password='x')
+            for i in range(3)
+        ]
+        answers = {str(q.id): str(a.id) for q, a in zip(self.questions, self.correct)}
+        TestResult.objects.bulk_create([
+            TestResult(test=self.test, user=student, answers=answers, completed_at=timezone.now())
+            for student in students
+        ])
+        with self.assertNumQueries(4):  # key, chunk, bulk_update, empty chunk
+            graded = grade_test(self.test)
+        self.assertEqual(graded, 3)
+        self.assertEqual(
+            set(TestResult.objects.filter(test=self.test).values_list('score', flat=True)),
+            {Decimal('100.00')}
+        )
+
+    @override_settings(LEADERBOARD_ASYNC=False)
+    def test_grade_test_leaderboard_queries_constant(self):
+        """Reyting yangilanishi natijalar soniga qarab so'rov qo'shmasligini tekshirish"""
+        answers = {str(q.id): str(a.id) for q, a in zip(self.questions, self.correct)}
+        for count, queries in ((3, 6), (12, 5)):
+            TestResult.objects.bulk_create([
+                TestResult(test=self.test, user=CustomerUser.objects.create_user(
+                    username=f'student{count}-{i}', email=f's{count}-{i}@example.com', password='x'
+                ), answers=answers, completed_at=timezone.now())
+                for i in range(count)
+            ])
+            # key, chunk, bulk_update, empty chunk, kurs yig'indilari (+ birinchi marta kurs identifikatori)
+            with self.assertNumQueries(queries), self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(grade_test(self.test), count)
+
+
+class AnswerKeyCacheTests(TestCase):
+    def setUp(self):
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100,
+            category=self.category,
+            instructor=self.user,
+            duration=timedelta(hours=2)
+        )
+        self.test = Test.objects.create(
+            course=self.course,
+            title='Test Test',
+            description='Test Description',
+            duration_minutes=30,
+            passing_score=70
+        )
+        self.question = Question.objects.create(test=self.test, text='Q1', points=1, order=1)
+        self.correct = Answer.objects.create(question=self.question, text='A', is_correct=True)
+        self.wrong = Answer.objects.create(question=self.question, text='B', is_correct=False)
+
+    def test_cached_key_needs_no_queries(self):
+        """Keshlangan javob kaliti bazaga murojaat qilmasligini tekshirish"""
+        get_answer_key(self.test.id)
+        with self.assertNumQueries(0):
+            key = get_answer_key(self.test.id)
+        self.assertEqual(key.questions[str(self.question.id)], (frozenset([str(self.correct.id)]), 1))
+
+    def test_shared_cache_survives_local_eviction(self):
+        """Lokal LRU tozalansa ham umumiy keshdan o'qilishini tekshirish"""
+        get_answer_key(self.test.id)
+        answer_keys.local_cache.clear()
+        with self.assertNumQueries(0):
+            get_answer_key(self.test.id)
+
+    def test_answer_write_bumps_version(self):
+        """Javob o'zgarganda kesh versiyasi yangilanishini tekshirish"""
+        get_answer_key(self.test.id)
+        version = answer_keys.get_version(self.test.id)
+        self.wrong.is_correct = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.wrong.save()
+            # Tranzaksiya tasdiqlanmaguncha versiya o'zgarmaydi
+            self.assertEqual(answer_keys.get_version(self.test.id), version)
+        self.assertNotEqual(answer_keys.get_version(self.test.id), version)
+        key = get_answer_key(self.test.id)
+        self.assertEqual(
+            key.questions[str(self.question.id)][0],
+            frozenset([str(self.correct.id), str(self.wrong.id)])
+        )
+
+    def test_question_delete_bumps_version(self):
+        """Savol o'chirilganda kalit qayta qurilishini tekshirish"""
+        get_answer_key(self.test.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.delete()
+        self.assertIsNone(get_answer_key(self.test.id))
+
+
+class SerializerQueryPlanTests(APITestCase):
+    def setUp(self):
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            role='teacher'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100,
+            category=self.category,
+            instructor=self.user,
+            duration=timedelta(hours=2)
+        )
+        self.test = Test.objects.create(
+            course=self.course,
+            title='Test Test',
+            description='Test Description',
+            duration_minutes=30,
+            passing_score=70,
+            created_by=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def add_questions(self, count):
+        for order in range(count):
+            question = Question.objects.create(test=self.test, text=f'Q{order}', points=1, order=order)
+            Answer.objects.create(question=question, text='A', is_correct=True)
+            Answer.objects.create(question=question, text='B', is_correct=False)
+
+    def list_answers(self, query=''):
+        request = APIRequestFactory().get('/answers/' + query)
+        force_authenticate(request, user=self.user)
+        return AnswerListAPIView.as_view()(request)
+
+    def test_plan_for_nested_serializers(self):
+        """Ichma-ich serializerlar uchun select/prefetch yo'llarini tekshirish"""
+        queryset = plan_queryset(Answer.objects.all(), AnswerSerializer)
+        self.assertEqual(
+            queryset.query.select_related,
+            {'question': {'test': {'course': {}, 'created_by': {}}}}
+        )
+        self.assertEqual(queryset._prefetch_related_lookups, ('question__test__course__enrolled_students',))
+
+    def test_answer_list_constant_queries(self):
+        """Javoblar ro'yxati qatorlar soniga bog'liq bo'lmagan so'rovlar sonini ishlatishini tekshirish"""
+        self.add_questions(2)
+        with CaptureQueriesContext(connection) as small:
+            self.list_answers()
+        self.add_questions(10)
+        with CaptureQueriesContext(connection) as large:
+            response = self.list_answers()
+        self.assertEqual(len(response.data), 24)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_compact_representation(self):
+        """Ixcham ko'rinishda bog'liq obyektlar bir marta yuborilishini tekshirish"""
+        self.add_questions(3)
+        response = self.list_answers('?compact=true')
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(len(response.data['included']['question']), 3)
+        self.assertEqual(list(response.data['included']['test']), [str(self.test.id)])
+        self.assertEqual(list(response.data['included']['course']), [str(self.course.id)])
+        test_data = response.data['included']['test'][str(self.test.id)]
+        self.assertEqual(test_data['course'], str(self.course.id))
+        self.assertEqual(test_data['created_by'], str(self.user.id))
+
+    def test_compact_bucket_per_serializer(self):
+        """Bir model turli serializerlar bilan chiqsa, har biri o'z bo'limiga yozilishini tekshirish"""
+        class CreatorSerializer(serializers.Serializer):
+            username = serializers.CharField()
+
+        class BriefTestSerializer(serializers.ModelSerializer):
+            created_by = CreatorSerializer(read_only=True)
+
+            class Meta:
+                model = Test
+                fields = ('id', 'created_by')
+
+        class ResultRowSerializer(serializers.ModelSerializer):
+            user = CustomerUserSerializer(read_only=True)
+            test = BriefTestSerializer(read_only=True)
+
+            class Meta:
+                model = TestResult
+                fields = ('id', 'user', 'test')
+
+        result = TestResult.objects.create(test=self.test, user=self.user)
+        included = Sideloader().render(ResultRowSerializer, [result])['included']
+        user_id = str(self.user.id)
+        self.assertEqual(included['customeruser:CreatorSerializer'][user_id], {'username': 'testuser'})
+        self.assertIn('email', included['customeruser:CustomerUserSerializer'][user_id])
+        self.assertNotIn('customeruser', included)
+        self.assertEqual(list(included['test']), [str(self.test.id)])
+
+    def test_answer_key_hidden_from_students(self):
+        """Talaba javoblar ro'yxati orqali to'g'ri javoblarni ko'ra olmasligini tekshirish"""
+        self.add_questions(1)
+        student = CustomerUser.objects.create_user(
+            username='student', email='student@example.com', password='testpass123', role='student'
+        )
+        self.course.enrolled_students.add(student)
+        self.user = student
+        self.assertEqual(len(self.list_answers().data), 0)
+        request = APIRequestFactory().get('/answers/')
+        force_authenticate(request, user=student)
+        response = AnswerDetailAPIView.as_view()(request, pk=Answer.objects.first().pk)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_question_list_compact(self):
+        """Savollar ro'yxatini ixcham ko'rinishda olishni tekshirish"""
+        self.add_questions(2)
+        response = self.client.get(reverse('question-list') + '?compact=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['test'], str(self.test.id))
+
+
+class TestResultPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = CustomerUser.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            role='teacher'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100,
+            category=self.category,
+            instructor=self.user,
+            duration=timedelta(hours=2)
+        )
+        self.test = Test.objects.create(
+            course=self.course,
+            title='Test Test',
+            description='Test Description',
+            duration_minutes=30,
+            passing_score=70
+        )
+        for i in range(5):
+            student = CustomerUser.objects.create_user(username=f'student{i}', email=f's{i}@example.com', password='x')
+            TestResult.objects.create(test=self.test, user=student, score=50 + i)
+        self.client.force_authenticate(user=self.user)
+
+    def test_keyset_pages(self):
+        """Natijalarni kursor bo'yicha sahifalashni tekshirish"""
+        url = reverse('testresult-list') + '?page_size=2'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        expected = [str(pk) for pk in TestResult.objects.order_by('-created_at', '-id').values_list('id', flat=True)]
+        self.assertEqual(seen, expected)
+
+    def test_unpaginated_by_default(self):
+        """Parametrsiz so'rov oddiy ro'yxat qaytarishini tekshirish"""
+        response = self.client.get(reverse('testresult-list'))
+        self.assertEqual(len(response.data), 5)
+
+    def test_invalid_cursor(self):
+        """Noto'g'ri kursor uchun 404 qaytishini tekshirish"""
+        response = self.client.get(reverse('testresult-list') + '?cursor=broken')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestResultBulkExportTests(APITestCase):
+    def setUp(self):
+        self.teacher = CustomerUser.objects.create_user(
+            username='teacher',
+            email='teacher@example.com',
+            password='testpass123',
+            role='teacher'
+        )
+        self.other_teacher = CustomerUser.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='testpass123',
+            role='teacher'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course',
+            description='Test Description',
+            price=100,
+            category=self.category,
+            instructor=self.teacher,
+            duration=timedelta(hours=2)
+        )
+        self.other_course = Course.objects.create(
+            title='Other Course',
+            description='Other Description',
+            price=100,
+            category=self.category,
+            instructor=self.other_teacher,
+            duration=timedelta(hours=2)
+        )
+        self.test = Test.objects.create(
+            course=self.course, title='Test Test', description='D', duration_minutes=30, passing_score=70
+        )
+        self.other_test = Test.objects.create(
+            course=self.other_course, title='Other Test', description='D', duration_minutes=30, passing_score=70
+        )
+        for i in range(3):
+            student = CustomerUser.objects.create_user(username=f'student{i}', email=f's{i}@example.com', password='x')
+            TestResult.objects.create(test=self.test, user=student, score=80, passed=True, completed_at=timezone.now())
+            TestResult.objects.create(test=self.other_test, user=student, score=40, completed_at=timezone.now())
+        self.url = reverse('testresult-bulk-export')
+        self.client.force_authenticate(user=self.teacher)
+
+    def test_csv_is_streamed(self):
+        """CSV eksport oqim sifatida qaytishini tekshirish"""
+        response = self.client.get(self.url + f'?test={self.test.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().strip().splitlines()
+        self.assertEqual(lines[0], 'Test,Student,Email,Score,Passed,Started At,Completed At')
+        self.assertEqual(len(lines), 4)
+
+    def test_teacher_sees_only_own_courses(self):
+        """O'qituvchi faqat o'z kurslari natijalarini eksport qilishini tekshirish"""
+        response = self.client.get(self.url)
+        body = b''.join(response.streaming_content).decode()
+        self.assertNotIn('Other Test', body)
+        self.assertEqual(body.count('Test Test'), 3)
+
+    def test_xlsx_export(self):
+        """XLSX eksport yaroqli fayl qaytarishini tekshirish"""
+        response = self.client.get(self.url + f'?course={self.course.id}&file_type=xlsx')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b''.join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIn('xl/worksheets/sheet1.xml', archive.namelist())
+
+    def test_malformed_filters_rejected(self):
+        """Noto'g'ri UUID yoki sana 400 qaytarishini tekshirish"""
+        for query in ('?test=abc', '?course=abc', '?completed_before=2024-13-01', '?completed_after=kecha'):
+            response = self.client.get(self.url + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+    def test_completed_before_date_includes_whole_day(self):
+        """Faqat sana berilganda completed_before o'sha kunni to'liq qamrashini tekshirish"""
+        day = timezone.localdate()
+        TestResult.objects.filter(test=self.test).update(
+            completed_at=timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=15)
+        )
+        response = self.client.get(self.url + f'?test={self.test.id}&completed_before={day.isoformat()}')
+        lines = b''.join(response.streaming_content).decode().strip().splitlines()
+        self.assertEqual(len(lines), 4)
+        response = self.client.get(self.url + f'?test={self.test.id}&completed_before={(day - timedelta(days=1)).isoformat()}')
+        lines = b''.join(response.streaming_content).decode().strip().splitlines()
+        self.assertEqual(len(lines), 1)
+
+    def test_student_cannot_export(self):
+        """Talaba eksport qila olmasligini tekshirish"""
+        student = CustomerUser.objects.get(username='student0')
+        self.client.force_authenticate(user=student)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ExamSessionTests(APITestCase):
+    def setUp(self):
+        self.teacher = CustomerUser.objects.create_user(
+            username='teacher', email='teacher@example.com', password='testpass123', role='teacher'
+        )
+        self.student = CustomerUser.objects.create_user(
+            username='student', email='student@example.com', password='testpass123', role='student'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course', description='Test Description', price=100, category=self.category,
+            instructor=self.teacher, duration=timedelta(hours=2)
+        )
+        self.course.enrolled_students.add(self.student)
+        self.test = Test.objects.create(
+            course=self.course, title='Exam', description='Exam', duration_minutes=30, passing_score=50
+        )
+        self.questions, self.correct, self.wrong = [], [], []
+        for order in range(1, 4):
+            question = Question.objects.create(test=self.test, text=f'Q{order}', points=order, order=order)
+            self.questions.append(question)
+            self.correct.append(Answer.objects.create(question=question, text='Right', is_correct=True))
+            self.wrong.append(Answer.objects.create(question=question, text='Wrong', is_correct=False))
+        self.client.force_authenticate(user=self.student)
+        self.start_url = reverse('exam-start', args=[self.test.id])
+        drafts.checkpointer.clear()
+
+    def tearDown(self):
+        drafts.checkpointer.clear()
+
+    def start(self):
+        response = self.client.post(self.start_url)
+        self.assertIn(response.status_code, (status.HTTP_200_OK, status.HTTP_201_CREATED))
+        return response.data
+
+    def test_paper_hides_correct_answers(self):
+        """Savollar varaqasida to'g'ri javob belgisi yo'qligini tekshirish"""
+        response = self.client.post(self.start_url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([question['text'] for question in response.data['questions']], ['Q1', 'Q2', 'Q3'])
+        self.assertEqual(response.data['test']['total_points'], 6)
+        self.assertNotIn('is_correct', str(response.data))
+        self.assertEqual(response.data['expires_at'] - response.data['started_at'], timedelta(minutes=30))
+
+        # Qayta boshlash o'sha urinishni qaytaradi, varaq keshdan olinadi
+        with self.assertNumQueries(2):
+            response = self.client.post(self.start_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_enrollment_required(self):
+        """Kursga yozilmagan talaba testni boshlay olmasligini tekshirish"""
+        self.course.enrolled_students.remove(self.student)
+        self.assertEqual(self.client.post(self.start_url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_submit_grades_answer_sheet(self):
+        """Barcha javoblar bitta so'rovda baholanishini tekshirish"""
+        attempt = self.start()['attempt']
+        answers = {
+            str(self.questions[0].id): str(self.correct[0].id),
+            str(self.questions[1].id): str(self.wrong[1].id),
+            str(self.questions[2].id): [str(self.correct[2].id)],
+        }
+        response = self.client.post(reverse('exam-submit', args=[attempt]), {'answers': answers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['earned_points'], response.data['total_points']), (4, 6))
+        self.assertEqual(response.data['score'], Decimal('66.67'))
+        self.assertTrue(response.data['passed'])
+
+        response = self.client.post(reverse('exam-submit', args=[attempt]), {'answers': answers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.client.post(self.start_url).status_code, status.HTTP_409_CONFLICT)
+
+    def test_submit_rejects_foreign_answers(self):
+        """Boshqa savolga tegishli javob rad etilishini tekshirish"""
+        attempt = self.start()['attempt']
+        answers = {str(self.questions[0].id): str(self.correct[1].id)}
+        response = self.client.post(reverse('exam-submit', args=[attempt]), {'answers': answers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIsNone(TestResult.objects.get(pk=attempt).completed_at)
+
+    def test_late_submission_is_closed(self):
+        """Muddatdan keyin yuborilgan javoblar qabul qilinmasligini tekshirish"""
+        attempt = self.start()['attempt']
+        TestResult.objects.filter(pk=attempt).update(started_at=timezone.now() - timedelta(minutes=45))
+        answers = {str(self.questions[0].id): str(self.correct[0].id)}
+        response = self.client.post(reverse('exam-submit', args=[attempt]), {'answers': answers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        result = TestResult.objects.get(pk=attempt)
+        self.assertIsNotNone(result.completed_at)
+        self.assertEqual(result.answers, {})
+        self.assertFalse(result.passed)
+
+    def test_other_users_attempt_not_found(self):
+        """Boshqa foydalanuvchining urinishiga javob yuborib bo'lmasligini tekshirish"""
+        attempt = self.start()['attempt']
+        self.client.force_authenticate(user=self.teacher)
+        response = self.client.post(reverse('exam-submit', args=[attempt]), {'answers': {}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(EXAM_DRAFTS={'CHECKPOINT_INTERVAL': 3600})
+    def test_autosave_and_checkpoint(self):
+        """Javoblar keshga saqlanib, keyin bazaga yozilishini tekshirish"""
+        attempt = self.start()['attempt']
+        url = reverse('exam-answers', args=[attempt])
+        q1, q2 = str(self.questions[0].id), str(self.questions[1].id)
+        with self.assertNumQueries(0):
+            response = self.client.patch(url, {'answers': {q1: str(self.wrong[0].id)}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.patch(url, {'answers': {q1: str(self.correct[0].id), q2: str(self.wrong[1].id)}}, format='json')
+        self.assertEqual(TestResult.objects.get(pk=attempt).answers, {})
+        self.assertEqual(self.start()['answers'], {q1: str(self.correct[0].id), q2: str(self.wrong[1].id)})
+
+        self.assertEqual(drafts.checkpointer.checkpoint(), 1)
+        self.assertEqual(TestResult.objects.get(pk=attempt).answers,
+                         {q1: str(self.correct[0].id), q2: str(self.wrong[1].id)})
+        self.client.patch(url, {'answers': {q2: None}}, format='json')
+        drafts.checkpointer.checkpoint()
+        self.assertEqual(TestResult.objects.get(pk=attempt).answers, {q1: str(self.correct[0].id)})
+
+        response = self.client.patch(url, {'answers': {q1: str(self.correct[1].id)}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(EXAM_DRAFTS={'CHECKPOINT_INTERVAL': 3600})
+    def test_command_checkpoints_from_cache(self):
+        """Buyruq jarayon xotirasisiz keshdagi javoblarni bazaga yozishini tekshirish"""
+        attempt = self.start()['attempt']
+        q1 = str(self.questions[0].id)
+        self.client.patch(reverse('exam-answers', args=[attempt]),
+                          {'answers': {q1: str(self.correct[0].id)}}, format='json')
+        # Boshqa jarayon: dirty to'plami bo'sh
+        drafts.checkpointer.clear()
+        output = io.StringIO()
+        call_command('finalize_exam_attempts', stdout=output)
+        self.assertIn('Checkpointed 1 attempts', output.getvalue())
+        self.assertEqual(TestResult.objects.get(pk=attempt).answers, {q1: str(self.correct[0].id)})
+
+    def test_checkpoint_does_not_overwrite_submission(self):
+        """Topshirilgan urinish javoblari eski checkpoint bilan almashtirilmasligini tekshirish"""
+        attempt = self.start()['attempt']
+        q1 = str(self.questions[0].id)
+        self.client.patch(reverse('exam-answers', args=[attempt]),
+                          {'answers': {q1: str(self.wrong[0].id)}}, format='json')
+        stale = list(TestResult.objects.filter(pk=attempt).only('id', 'test_id', 'answers'))
+        self.client.post(reverse('exam-submit', args=[attempt]),
+                         {'answers': {q1: str(self.correct[0].id)}}, format='json')
+        self.assertEqual(drafts.write_drafts(stale), 0)
+        result = TestResult.objects.get(pk=attempt)
+        self.assertEqual(result.answers, {q1: str(self.correct[0].id)})
+
+    def test_submit_includes_autosaved_answers(self):
+        """Yakunlashda avtomatik saqlangan javoblar hisobga olinishini tekshirish"""
+        attempt = self.start()['attempt']
+        self.client.patch(reverse('exam-answers', args=[attempt]),
+                          {'answers': {str(self.questions[2].id): str(self.correct[2].id)}}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('exam-submit', args=[attempt]),
+                                        {'answers': {str(self.questions[0].id): str(self.correct[0].id)}},
+                                        format='json')
+        self.assertEqual(response.data['earned_points'], 4)
+        response = self.client.patch(reverse('exam-answers', args=[attempt]),
+                                     {'answers': {str(self.questions[1].id): str(self.correct[1].id)}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_expired_attempts_are_finalized(self):
+        """Vaqti tugagan urinishlar saqlangan javoblar bilan yopilishini tekshirish"""
+        attempt = self.start()['attempt']
+        self.client.patch(reverse('exam-answers', args=[attempt]),
+                          {'answers': {str(self.questions[2].id): str(self.correct[2].id)}}, format='json')
+        TestResult.objects.filter(pk=attempt).update(started_at=timezone.now() - timedelta(minutes=45))
+        call_command('finalize_exam_attempts', stdout=io.StringIO())
+        result = TestResult.objects.get(pk=attempt)
+        self.assertEqual(result.answers, {str(self.questions[2].id): str(self.correct[2].id)})
+        self.assertEqual(result.score, Decimal('50.00'))
+        self.assertTrue(result.passed)
+
+    def test_seeded_paper_is_sampled_and_stable(self):
+        """Urinish varaqasi seed'dan tanlanib, qayta boshlashda o'zgarmasligini tekshirish"""
+        self.test.shuffle_questions = True
+        self.test.shuffle_answers = True
+        self.test.questions_per_attempt = 2
+        self.test.save()
+        data = self.start()
+        ids = [question['id'] for question in data['questions']]
+        self.assertEqual(len(ids), 2)
+        points = {str(question.id): question.points for question in self.questions}
+        self.assertEqual(data['test']['total_points'], sum(points[question_id] for question_id in ids))
+
+        with self.assertNumQueries(2):
+            resumed = self.client.post(self.start_url).data
+        self.assertEqual(resumed['questions'], data['questions'])
+
+        paper = exams.get_paper(self.test.id)
+        orders = {tuple(question['id'] for question in exams.personalize(paper, seed)['questions'])
+                  for seed in range(20)}
+        self.assertGreater(len(orders), 1)
+
+        submit_url = reverse('exam-submit', args=[data['attempt']])
+        skipped = next(question for question in self.questions if str(question.id) not in ids)
+        answers = {str(skipped.id): str(self.correct[self.questions.index(skipped)].id)}
+        response = self.client.post(submit_url, {'answers': answers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        correct = {str(question.id): str(answer.id) for question, answer in zip(self.questions, self.correct)}
+        answers = {question_id: correct[question_id] for question_id in ids}
+        response = self.client.post(submit_url, {'answers': answers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['earned_points'], response.data['total_points'])
+        self.assertEqual(response.data['score'], Decimal('100.00'))
+        grade_test(self.test, regrade=True)
+        self.assertEqual(TestResult.objects.get(pk=data['attempt']).score, Decimal('100.00'))
+
+    def test_sampled_questions_survive_pool_changes(self):
+        """Savollar bankiga savol qo'shilsa, boshlangan urinish savollari va bahosi o'zgarmasligini tekshirish"""
+        self.test.questions_per_attempt = 2
+        self.test.save()
+        data = self.start()
+        ids = [question['id'] for question in data['questions']]
+        self.assertEqual(TestResult.objects.get(pk=data['attempt']).question_ids, ids)
+
+        question = Question.objects.create(test=self.test, text='Q0', points=5, order=0)
+        Answer.objects.create(question=question, text='Right', is_correct=True)
+        resumed = self.client.post(self.start_url).data
+        self.assertEqual([question['id'] for question in resumed['questions']], ids)
+        self.assertEqual(resumed['test']['total_points'], data['test']['total_points'])
+
+        correct = {str(question.id): str(answer.id) for question, answer in zip(self.questions, self.correct)}
+        response = self.client.post(reverse('exam-submit', args=[data['attempt']]),
+                                    {'answers': {question_id: correct[question_id] for question_id in ids}},
+                                    format='json')
+        self.assertEqual(response.data['score'], Decimal('100.00'))
+        grade_test(self.test, regrade=True)
+        self.assertEqual(TestResult.objects.get(pk=data['attempt']).score, Decimal('100.00'))
+
+
+@override_settings(TEST_ANALYSIS_ASYNC=False)
+class TestAnalysisTests(APITestCase):
+    def setUp(self):
+        self.teacher = CustomerUser.objects.create_user(
+            username='teacher', email='teacher@example.com', password='testpass123', role='teacher'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course', description='Test Description', price=100, category=self.category,
+            instructor=self.teacher, duration=timedelta(hours=2)
+        )
+        self.test = Test.objects.create(
+            course=self.course, title='Exam', description='Exam', duration_minutes=30, passing_score=50
+        )
+        self.questions, self.correct, self.wrong = [], [], []
+        for order in range(1, 4):
+            question = Question.objects.create(test=self.test, text=f'Q{order}', points=order, order=order)
+            self.questions.append(question)
+            self.correct.append(Answer.objects.create(question=question, text='Right', is_correct=True))
+            self.wrong.append(Answer.objects.create(question=question, text='Wrong', is_correct=False))
+        # 1 - to'g'ri, 0 - noto'g'ri, None - javobsiz
+        self.sheets = [(1, 1, 1), (1, 0, 1), (1, 0, None), (0, 1, 0)]
+        for number, sheet in enumerate(self.sheets):
+            self.submit(number, sheet)
+        self.url = reverse('test-analysis', args=[self.test.id])
+        self.client.force_authenticate(user=self.teacher)
+
+    def submit(self, number, sheet):
+        student = CustomerUser.objects.create_user(
+            username=f'student{number}', email=f'student{number}@example.com', password='testpass123'
+        )
+        answers = {}
+        for j, value in enumerate(sheet):
+            if value is not None:
+                answers[str(self.questions[j].id)] = str((self.correct if value else self.wrong)[j].id)
+        if sheet[1]:
+            # Ko'p tanlovli ko'rinishdagi bitta javob
+            answers[str(self.questions[1].id)] = [answers[str(self.questions[1].id)]]
+        TestResult.objects.create(test=self.test, user=student, answers=answers, completed_at=timezone.now())
+
+    def test_item_statistics(self):
+        """Qiyinlik, ajrata olish, variantlar va KR-20 hisoblanishini tekshirish"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data
+        self.assertEqual(data['students'], 4)
+        items = data['items']
+        self.assertEqual([item['difficulty'] for item in items], [0.75, 0.5, 0.5])
+        self.assertEqual(items[2]['omitted'], 0.25)
+        self.assertEqual([(option['is_correct'], option['rate']) for option in items[0]['options']],
+                         [(True, 0.75), (False, 0.25)])
+
+        matrix = [[value or 0 for value in sheet] for sheet in self.sheets]
+        totals = [sum(value * points for value, points in zip(row, (1, 2, 3))) for row in matrix]
+        rest = [total - row[0] for total, row in zip(totals, matrix)]
+        expected = statistics.correlation([row[0] for row in matrix], rest)
+        self.assertAlmostEqual(items[0]['discrimination'], expected, places=4)
+
+        p = [sum(row[j] for row in matrix) / 4 for j in range(3)]
+        variance = statistics.pvariance([sum(row) for row in matrix])
+        expected = 3 / 2 * (1 - sum(value * (1 - value) for value in p) / variance)
+        self.assertAlmostEqual(data['kr20'], expected, places=4)
+        self.assertEqual(data['scores']['max'], 100.0)
+        self.assertEqual(sum(bucket['count'] for bucket in data['scores']['histogram']), 4)
+
+    def test_cached_until_new_result(self):
+        """Tahlil keshlanib, yangi natijadan keyin qayta hisoblanishini tekshirish"""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['students'], 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submit(4, (1, 1, 1))
+        self.assertEqual(self.client.get(self.url).data['students'], 5)
+
+    @override_settings(TEST_ANALYSIS_ASYNC=True)
+    def test_stale_analysis_served_during_rebuild(self):
+        """Yangi natijadan keyin eski tahlil qaytarilib, fonda bir marta qayta hisoblanishini tekshirish"""
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submit(4, (1, 1, 1))
+        with patch('Test.analytics.get_executor') as executor:
+            self.assertEqual(self.client.get(self.url).data['students'], 4)
+            self.assertEqual(self.client.get(self.url).data['students'], 4)
+        executor.return_value.submit.assert_called_once()
+        rebuild, test_id = executor.return_value.submit.call_args.args
+        with patch('Test.analytics.close_old_connections'):
+            rebuild(test_id)
+        self.assertEqual(self.client.get(self.url).data['students'], 5)
+
+    def test_only_course_instructor(self):
+        """Boshqa o'qituvchi va talaba tahlilni ko'ra olmasligini tekshirish"""
+        other = CustomerUser.objects.create_user(
+            username='other', email='other@example.com', password='testpass123', role='teacher'
+        )
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=CustomerUser.objects.get(username='student0'))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(LEADERBOARD_ASYNC=False)
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        self.teacher = CustomerUser.objects.create_user(
+            username='teacher', email='teacher@example.com', password='testpass123', role='teacher'
+        )
+        self.category = Category.objects.create(name='Test Category')
+        self.course = Course.objects.create(
+            title='Test Course', description='Test Description', price=100, category=self.category,
+            instructor=self.teacher, duration=timedelta(hours=2)
+        )
+        self.first = Test.objects.create(
+            course=self.course, title='First', description='First', duration_minutes=30, passing_score=50
+        )
+        self.second = Test.objects.create(
+            course=self.course, title='Second', description='Second', duration_minutes=30, passing_score=50
+        )
+        self.students = []
+        for number in range(5):
+            student = CustomerUser.objects.create_user(
+                username=f'student{number}', email=f'student{number}@example.com', password='testpass123'
+            )
+            self.course.enrolled_students.add(student)
+            self.students.append(student)
+        # Reyting birinchi o'qishda bazadan quriladi
+        leaderboards.get_board(leaderboards.TEST, str(self.first.id))
+        leaderboards.get_board(leaderboards.COURSE, str(self.course.id))
+        self.results = [self.grade(self.first, student, score)
+                        for student, score in zip(self.students, ('90', '75.5', '75.5', '40', '60'))]
+
+    def grade(self, test, student, score):
+        with self.captureOnCommitCallbacks(execute=True):
+            return TestResult.objects.create(test=test, user=student, score=Decimal(score),
+                                             completed_at=timezone.now())
+
+    def assert_matches_database(self, scope, pk):
+        board = leaderboards.get_board(scope, str(pk))
+        expected = leaderboards.build(scope, str(pk))
+        self.assertEqual({name: board[name] for name in expected}, expected)
+
+    def test_incremental_updates_match_rebuild(self):
+        """Ketma-ket yangilanishlar bazadan qurilgan reyting bilan bir xil bo'lishini tekshirish"""
+        self.assert_matches_database(leaderboards.TEST, self.first.id)
+        result = TestResult.objects.get(pk=self.results[0].pk)
+        result.score = Decimal('10')
+        with self.captureOnCommitCallbacks(execute=True):
+            result.save()
+        self.assert_matches_database(leaderboards.TEST, self.first.id)
+        self.grade(self.second, self.students[3], '100')
+        self.assert_matches_database(leaderboards.COURSE, self.course.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TestResult.objects.filter(pk=self.results[1].pk).first().delete()
+        self.assertEqual(leaderboards.get_board(leaderboards.TEST, str(self.first.id))['total'], 4)
+
+    def test_top_and_rank(self):
+        """Eng yaxshilar ro'yxati va foydalanuvchi o'rnini tekshirish"""
+        self.client.force_authenticate(user=self.students[4])
+        response = self.client.get(reverse('test-leaderboard', args=[self.first.id]), {'limit': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['participants'], 5)
+        self.assertEqual([(row['rank'], row['score']) for row in response.data['top']],
+                         [(1, Decimal('90.00')), (2, Decimal('75.50')), (2, Decimal('75.50'))])
+        self.assertEqual(response.data['top'][0]['username'], 'student0')
+
+        response = self.client.get(reverse('test-leaderboard-me', args=[self.first.id]))
+        self.assertEqual((response.data['rank'], response.data['percentile']), (4, 30.0))
+        with self.assertNumQueries(0):
+            leaderboards.standing(leaderboards.TEST, str(self.first.id), self.students[4].pk)
+
+        self.client.force_authenticate(user=self.teacher)
+        response = self.client.get(reverse('test-leaderboard-me', args=[self.first.id]))
+        self.assertIsNone(response.data['rank'])
+
+    def test_course_ranks_mean_score(self):
+        """Kurs reytingi testlardagi o'rtacha ball bo'yicha tuzilishini tekshirish"""
+        self.grade(self.second, self.students[3], '100')
+        self.client.force_authenticate(user=self.students[3])
+        response = self.client.get(reverse('course-leaderboard-me', args=[self.course.id]))
+        self.assertEqual((response.data['score'], response.data['rank']), (Decimal('70.00'), 4))
+
+        outsider = CustomerUser.objects.create_user(
+            username='outsider', email='outsider@example.com', password='testpass123'
+        )
+        self.client.force_authenticate(user=outsider)
+        response = self.client.get(reverse('course-leaderboard', args=[self.course.id]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_regrade_updates_board(self):
+        """bulk_update orqali qayta baholash reytingni yangilashini tekshirish"""
+        question = Question.objects.create(test=self.first, text='Q1', points=1, order=1)
+        right = Answer.objects.create(question=question, text='Right', is_correct=True)
+        TestResult.objects.filter(pk=self.results[3].pk).update(answers={str(question.id): str(right.id)})
+        with self.captureOnCommitCallbacks(execute=True):
+            grade_test(self.first, regrade=True)
+        self.assert_matches_database(leaderboards.TEST, self.first.id)
+        self.assert_matches_database(leaderboards.COURSE, self.course.id)
+        self.assertEqual(leaderboards.standing(leaderboards.TEST, str(self.first.id), self.students[3].pk)['rank'], 1)
+
+    def test_rebuild_before_delta_is_not_counted_twice(self):
+        """Tranzaksiya va uning delta'si orasidagi qayta qurish ballni ikki marta sanamasligini tekshirish"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            result = TestResult.objects.create(test=self.first, user=self.teacher, score=Decimal('80'),
+                                               completed_at=timezone.now())
+        leaderboards.rebuild(leaderboards.TEST, str(self.first.id))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(leaderboards.get_board(leaderboards.TEST, str(self.first.id))['total'], 6)
+        self.assert_matches_database(leaderboards.TEST, self.first.id)
+
+        # Qayta qurishdan oldin tasdiqlangan o'zgarish o'tkazib yuboriladi
+        board = leaderboards.rebuild(leaderboards.TEST, str(self.first.id))
+        started = board['watermark'][0]
+        leaderboards._move(leaderboards.TEST, str(self.first.id), str(self.teacher.pk),
+                           None, leaderboards.to_bucket(result.score), started - 2, started - 1)
+        self.assert_matches_database(leaderboards.TEST, self.first.id)
+
+    def test_stale_board_served_while_locked(self):
+        """Qulf band bo'lsa eskirgan reyting qayta qurilmasdan qaytarilishini tekshirish"""
+        key = leaderboards.BOARD_KEY.format(scope=leaderboards.TEST, pk=self.first.id)
+        board = cache.get(key)
+        board['stale'] = True
+        cache.set(key, board)
+        cache.add(f'{key}:lock', 1)
+        try:
+            with self.assertNumQueries(0):
+                self.assertTrue(leaderboards.get_board(leaderboards.TEST, str(self.first.id))['stale'])
+        finally:
+            cache.delete(f'{key}:lock')
+        self.assertFalse(leaderboards.get_board(leaderboards.TEST, str(self.first.id))['stale'])
+        with self.assertNumQueries(0):
+            leaderboards.get_board(leaderboards.TEST, str(self.first.id))
+
+    def test_rebuild_command_skips_locked_boards(self):
+        """Buyruq qulfi bo'shamagan reytinglarni qayta qurilgan deb hisoblamasligini tekshirish"""
+        key = leaderboards.BOARD_KEY.format(scope=leaderboards.COURSE, pk=self.course.id)
+        cache.add(f'{key}:lock', 1)
+        out = io.StringIO()
+        try:
+            with patch.object(leaderboards, 'LOCK_TIMEOUT', 0):
+                call_command('rebuild_leaderboards', stdout=out)
+        finally:
+            cache.delete(f'{key}:lock')
+        self.assertIn('Rebuilt 1 test and 0 course leaderboards, skipped 1 locked', out.getvalue())
+
+    @override_settings(LEADERBOARD_ASYNC=True)
+    def test_locked_board_does_not_block_commit(self):
+        """Reyting qulflangan bo'lsa ham natija saqlanishi kutmasligini tekshirish"""
+        key = leaderboards.BOARD_KEY.format(scope=leaderboards.TEST, pk=self.first.id)
+        cache.add(f'{key}:lock', 1)
+        try:
+            with patch('Test.leaderboards.get_executor') as executor:
+                self.grade(self.first, self.teacher, '80')
+            executor.return_value.submit.assert_called_once()
+        finally:
+            cache.delete(f'{key}:lock')
+        leaderboards._apply(*executor.return_value.submit.call_args.args[1:])
+        self.assert_matches_database(leaderboards.TEST, self.first.id)
@@ -3,8 +3,11 @@ from .views import (
     TestListAPIView, TestDetailAPIView,
     QuestionListAPIView, QuestionDetailAPIView,
     TestResultListAPIView, TestResultDetailAPIView,
-    TestResultExportView
+    TestResultExportView, TestResultBulkExportView,
+    ExamStartAPIView, ExamAnswersAPIView, ExamSubmitAPIView,
+    TestAnalysisAPIView, LeaderboardAPIView, LeaderboardMeAPIView
 )
+from .leaderboards import COURSE
 
 urlpatterns = [
     # Test URLs
@@ -18,5 +21,21 @@ urlpatterns = [
     # Test Result URLs
     path('results/', TestResultListAPIView.as_view(), name='testresult-list'),
     path('results/<uuid:pk>/', TestResultDetailAPIView.as_view(), name='testresult-detail'),
-    path('results/export/', TestResultExportView.as_view(), name='testresult-export'),
+    path('results/<uuid:pk>/export/', TestResultExportView.as_view(), name='testresult-export'),
+    path('results/export/', TestResultBulkExportView.as_view(), name='testresult-bulk-export'),
+
+    # Exam session URLs
+    path('tests/<uuid:pk>/attempts/', ExamStartAPIView.as_view(), name='exam-start'),
+    path('attempts/<uuid:pk>/answers/', ExamAnswersAPIView.as_view(), name='exam-answers'),
+    path('attempts/<uuid:pk>/submit/', ExamSubmitAPIView.as_view(), name='exam-submit'),
+
+    # Analytics URLs
+    path('tests/<uuid:pk>/analysis/', TestAnalysisAPIView.as_view(), name='test-analysis'),
+
+    # Leaderboard URLs
+    path('tests/<uuid:pk>/leaderboard/', LeaderboardAPIView.as_view(), name='test-leaderboard'),
+    path('tests/<uuid:pk>/leaderboard/me/', LeaderboardMeAPIView.as_view(), name='test-leaderboard-me'),
+    path('courses/<uuid:pk>/leaderboard/', LeaderboardAPIView.as_view(scope=COURSE), name='course-leaderboard'),
+    path('courses/<uuid:pk>/leaderboard/me/', LeaderboardMeAPIView.as_view(scope=COURSE),
+         name='course-leaderboard-me'),
 ]
\ No newline at end of file
@@ -4,14 +4,45 @@ from rest_framework import status
 from django.shortcuts import get_object_or_404
 from .models import Test, Question, Answer, TestResult
 from .serializers import TestSerializer, QuestionSerializer, QuestionCreateSerializer, AnswerSerializer, TestResultSerializer
-from .permissions import IsCourseInstructorOrAdmin
+from .permissions import IsCourseInstructorOrAdmin, IsAdminOrTeacher
+from .exports import stream_csv, write_xlsx
+from .exams import ExamError, can_take, get_paper, save_answers, session_payload, start_attempt, submit_attempt
+from . import leaderboards
+from .analytics import get_analysis
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound
 from django.db.models import Q
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from Base.pagination import KeysetPaginationMixin
+from Base.serializers import Sideloader, plan_queryset, wants_compact
+from Course.models import Course
+from CustomerUser.models import CustomerUser
 import logging
+import uuid
+from datetime import datetime, timedelta
 logger = logging.getLogger(__name__)
 
+
+def list_response(request, queryset, serializer_class, view=None):
+    """
+    Serialize a list with planned joins; ?compact=true sideloads nested objects.
+    Views with KeysetPaginationMixin are paginated when the client asks for it.
+    """
+    queryset = plan_queryset(queryset, serializer_class)
+    page = view.paginate_queryset(queryset) if isinstance(view, KeysetPaginationMixin) else None
+    rows = queryset if page is None else page
+    if wants_compact(request):
+        data = Sideloader().render(serializer_class, rows)
+    else:
+        data = serializer_class(rows, many=True).data
+    if page is not None:
+        return view.get_paginated_response(data)
+    return Response(data)
+
 # === TEST ===
-class TestListAPIView(APIView):
+class TestListAPIView(KeysetPaginationMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -34,8 +65,9 @@ class TestListAPIView(APIView):
             elif request.user.role == 'teacher':
                 queryset = queryset.filter(course__instructor=request.user)
 
-            serializer = TestSerializer(queryset, many=True)
-            return Response(serializer.data)
+            return list_response(request, queryset, TestSerializer, view=self)
+        except NotFound:
+            raise
         except Exception as e:
             logger.error(f"Test list error: {str(e)}")
             return Response({"detail": "Testlarni olishda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -56,7 +88,7 @@ class TestDetailAPIView(APIView):
 
     def get(self, request, pk):
         try:
-            test = get_object_or_404(Test, pk=pk)
+            test = get_object_or_404(plan_queryset(Test.objects.all(), TestSerializer), pk=pk)
             serializer = TestSerializer(test)
             return Response(serializer.data)
         except Exception as e:
@@ -99,8 +131,7 @@ class QuestionListAPIView(APIView):
             if ordering:
                 queryset = queryset.order_by(ordering)
 
-            serializer = QuestionSerializer(queryset, many=True)
-            return Response(serializer.data)
+            return list_response(request, queryset, QuestionSerializer)
         except Exception as e:
             logger.error(f"Question list error: {str(e)}")
             return Response({"detail": "Savollarni olishda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -121,7 +152,7 @@ class QuestionDetailAPIView(APIView):
 
     def get(self, request, pk):
         try:
-            question = get_object_or_404(Question, pk=pk)
+            question = get_object_or_404(plan_queryset(Question.objects.all(), QuestionSerializer), pk=pk)
             serializer = QuestionSerializer(question)
             return Response(serializer.data)
         except Exception as e:
@@ -150,17 +181,23 @@ class QuestionDetailAPIView(APIView):
             return Response({"detail": "Savolni o'chirishda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # === ANSWER ===
+def visible_answers(user):
+    queryset = Answer.objects.all()
+    if user.role != 'admin' and not user.is_staff:
+        # is_correct - test kaliti, faqat kurs o'qituvchisiga ko'rinadi
+        queryset = queryset.filter(question__test__course__instructor=user)
+    return queryset
+
 class AnswerListAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         try:
-            queryset = Answer.objects.all()
+            queryset = visible_answers(request.user)
             question_id = request.query_params.get('question')
             if question_id:
                 queryset = queryset.filter(question_id=question_id)
-            serializer = AnswerSerializer(queryset, many=True)
-            return Response(serializer.data)
+            return list_response(request, queryset, AnswerSerializer)
         except Exception as e:
             logger.error(f"Answer list error: {str(e)}")
             return Response({"detail": "Javoblarni olishda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -180,7 +217,7 @@ class AnswerDetailAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
-        answer = get_object_or_404(Answer, pk=pk)
+        answer = get_object_or_404(visible_answers(request.user), pk=pk)
         serializer = AnswerSerializer(answer)
         return Response(serializer.data)
 
@@ -204,7 +241,29 @@ class AnswerDeleteAPIView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 # === TEST RESULT ===
-class TestResultListAPIView(APIView):
+def completed_at_filter(value, before=False):
+    """
+    The completed_at lookup for ?completed_after= / ?completed_before=, or
+    None if the value is malformed. A bare date covers its whole day, so
+    ?completed_before=<date> ends at the next midnight.
+    """
+    try:
+        day = parse_date(value)
+        if day is not None:
+            if before:
+                day += timedelta(days=1)
+            moment = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+            return {'completed_at__lt' if before else 'completed_at__gte': moment}
+        moment = parse_datetime(value)
+    except ValueError:
+        return None
+    if moment is None:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return {'completed_at__lte' if before else 'completed_at__gte': moment}
+
+class TestResultListAPIView(KeysetPaginationMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -218,8 +277,9 @@ class TestResultListAPIView(APIView):
             if user_id:
                 queryset = queryset.filter(user_id=user_id)
 
-            serializer = TestResultSerializer(queryset, many=True)
-            return Response(serializer.data)
+            return list_response(request, queryset, TestResultSerializer, view=self)
+        except NotFound:
+            raise
         except Exception as e:
             logger.error(f"Test result list error: {str(e)}")
             return Response({"detail": "Test natijalarini olishda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -240,7 +300,7 @@ class TestResultDetailAPIView(APIView):
 
     def get(self, request, pk):
         try:
-            result = get_object_or_404(TestResult, pk=pk)
+            result = get_object_or_404(plan_queryset(TestResult.objects.all(), TestResultSerializer), pk=pk)
             serializer = TestResultSerializer(result)
             return Response(serializer.data)
         except Exception as e:
@@ -305,14 +365,200 @@ class TestResultExportView(APIView):
             logger.error(f"Test result export error: {str(e)}")
             return Response({"detail": "Natijani eksport qilishda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class TestResultBulkExportView(APIView):
+    """
+    Streams results filtered by ?test=, ?course=, ?completed_after= and
+    ?completed_before=. ?file_type=xlsx returns a workbook instead of CSV.
+    """
+    permission_classes = [IsAdminOrTeacher]
+
+    def get(self, request):
+        queryset = TestResult.objects.all()
+        params = request.query_params
+        for param, lookup in (('test', 'test_id'), ('course', 'test__course_id')):
+            if params.get(param):
+                try:
+                    queryset = queryset.filter(**{lookup: uuid.UUID(params[param])})
+                except ValueError:
+                    return Response({param: "Noto'g'ri identifikator"}, status=status.HTTP_400_BAD_REQUEST)
+        for param in ('completed_after', 'completed_before'):
+            if params.get(param):
+                lookup = completed_at_filter(params[param], before=param == 'completed_before')
+                if lookup is None:
+                    return Response({param: "Noto'g'ri sana formati"}, status=status.HTTP_400_BAD_REQUEST)
+                queryset = queryset.filter(**lookup)
+        if request.user.role != 'admin' and not request.user.is_staff:
+            queryset = queryset.filter(test__course__instructor=request.user)
+
+        file_type = params.get('file_type', 'csv')
+        if file_type == 'xlsx':
+            return FileResponse(
+                write_xlsx(queryset),
+                as_attachment=True,
+                filename='test_results.xlsx',
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+        if file_type != 'csv':
+            return Response({"file_type": "Faqat csv yoki xlsx"}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(stream_csv(queryset), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="test_results.csv"'
+        return response
+
 class TestResultMyResultsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         try:
             results = TestResult.objects.filter(user=request.user).order_by('-created_at')
-            serializer = TestResultSerializer(results, many=True)
-            return Response(serializer.data)
+            return list_response(request, results, TestResultSerializer)
         except Exception as e:
             logger.error(f"My results error: {str(e)}")
-            return Response({"detail": "Natijalarni olishda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({"detail": "Natijalarni olishda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# === EXAM SESSION ===
+class ExamStartAPIView(APIView):
+    """
+    Urinishni boshlaydi yoki davom ettiradi va savollar varaqasini
+    (to'g'ri javob belgilarisiz) bitta javobda qaytaradi.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            attempt, paper, created = start_attempt(request.user, pk)
+            return Response(session_payload(attempt, paper),
+                            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+        except ExamError as e:
+            return Response({"detail": e.message}, status=e.code)
+        except Exception as e:
+            logger.error(f"Exam start error: {str(e)}")
+            return Response({"detail": "Testni boshlashda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class ExamAnswersAPIView(APIView):
+    """
+    Javoblarni avtomatik saqlash: {"answers": {savol_id: javob_id | [javob_id, ...] | null}}.
+    Faqat yuborilgan savollar yoziladi, null javobni tozalaydi.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def patch(self, request, pk):
+        try:
+            expires_at, saved = save_answers(request.user, pk, request.data.get('answers', {}))
+            return Response({"saved": saved, "expires_at": expires_at})
+        except ExamError as e:
+            return Response({"detail": e.message}, status=e.code)
+        except Exception as e:
+            logger.error(f"Exam autosave error: {str(e)}")
+            return Response({"detail": "Javoblarni saqlashda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class ExamSubmitAPIView(APIView):
+    """
+    Testni yakunlaydi: {"answers": {savol_id: javob_id | [javob_id, ...]}}.
+    Avtomatik saqlangan javoblar ham hisobga olinadi, yuborilganlari ustun.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            attempt, earned, total = submit_attempt(request.user, pk, request.data.get('answers', {}))
+            return Response({
+                "attempt": str(attempt.pk),
+                "score": attempt.score,
+                "passed": attempt.passed,
+                "earned_points": earned,
+                "total_points": total,
+                "completed_at": attempt.completed_at,
+            })
+        except ExamError as e:
+            return Response({"detail": e.message}, status=e.code)
+        except Exception as e:
+            logger.error(f"Exam submit error: {str(e)}")
+            return Response({"detail": "Javoblarni yuborishda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# === ANALYTICS ===
+class TestAnalysisAPIView(APIView):
+    """
+    Test savollari tahlili: qiyinlik, ajrata olish (point-biserial),
+    javob variantlari tanlanishi, KR-20 ishonchliligi va ballar taqsimoti.
+    """
+    permission_classes = [IsAdminOrTeacher]
+
+    def get(self, request, pk):
+        try:
+            paper = get_paper(pk)
+            if paper is None:
+                return Response({"detail": "Test topilmadi"}, status=status.HTTP_404_NOT_FOUND)
+            if (request.user.role != 'admin' and not request.user.is_staff
+                    and paper['instructor_id'] != str(request.user.pk)):
+                return Response({"detail": "Faqat kurs o'qituvchisi tahlilni ko'ra oladi"},
+                                status=status.HTTP_403_FORBIDDEN)
+            return Response(get_analysis(pk))
+        except Exception as e:
+            logger.error(f"Test analysis error: {str(e)}")
+            return Response({"detail": "Test tahlilini olishda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# === LEADERBOARDS ===
+def leaderboard_scope(request, scope, pk):
+    """Return an error Response if the user may not see the board, else None."""
+    if scope == leaderboards.TEST:
+        paper = get_paper(pk)
+        if paper is None:
+            return Response({"detail": "Test topilmadi"}, status=status.HTTP_404_NOT_FOUND)
+        allowed = can_take(request.user, paper)
+    else:
+        course = Course.objects.filter(pk=pk).values('instructor_id').first()
+        if course is None:
+            return Response({"detail": "Kurs topilmadi"}, status=status.HTTP_404_NOT_FOUND)
+        allowed = (request.user.role == 'admin' or request.user.is_staff
+                   or course['instructor_id'] == request.user.pk
+                   or Course.enrolled_students.through.objects.filter(
+                       course_id=pk, customeruser_id=request.user.pk).exists())
+    if not allowed:
+        return Response({"detail": "Reytingni ko'rish uchun kursga yozilishingiz kerak"},
+                        status=status.HTTP_403_FORBIDDEN)
+    return None
+
+
+class LeaderboardAPIView(APIView):
+    """
+    Eng yaxshi natijalar: ?limit= (standart 10, ko'pi bilan 100).
+    Teng ball olganlar bir xil o'rinni egallaydi.
+    """
+    permission_classes = [IsAuthenticated]
+    scope = leaderboards.TEST
+
+    def get(self, request, pk):
+        try:
+            error = leaderboard_scope(request, self.scope, pk)
+            if error:
+                return error
+            try:
+                limit = min(max(int(request.query_params.get('limit', 10)), 1), leaderboards.TOP_SIZE)
+            except ValueError:
+                return Response({"limit": "Butun son bo'lishi kerak"}, status=status.HTTP_400_BAD_REQUEST)
+            data = leaderboards.top(self.scope, str(pk), limit)
+            names = dict(
+                CustomerUser.objects.filter(pk__in=[row['user_id'] for row in data['top']])
+                .values_list('id', 'username')
+            )
+            for row in data['top']:
+                row['username'] = names.get(uuid.UUID(row['user_id']))
+            return Response(data)
+        except Exception as e:
+            logger.error(f"Leaderboard error: {str(e)}")
+            return Response({"detail": "Reytingni olishda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class LeaderboardMeAPIView(APIView):
+    """Foydalanuvchining o'rni va persentili (o'zidan past ball olganlar ulushi)."""
+    permission_classes = [IsAuthenticated]
+    scope = leaderboards.TEST
+
+    def get(self, request, pk):
+        try:
+            error = leaderboard_scope(request, self.scope, pk)
+            if error:
+                return error
+            return Response(leaderboards.standing(self.scope, str(pk), request.user.pk))
+        except Exception as e:
+            logger.error(f"Leaderboard rank error: {str(e)}")
+            return Response({"detail": "Reytingni olishda xato"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
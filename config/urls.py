@@ -15,9 +15,9 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from django.views.static import serve
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
@@ -43,11 +43,20 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('CustomerUser.urls')),
     path('api/tests/', include('Test.urls')),  # Test app URLs
+    path('api/courses/', include('Course.urls')),  # Course app URLs
     path('api/payments/', include('Payment.urls')),  # Payment app URLs
+    path('api/media/', include('Base.urls')),  # Range/ETag bilan media fayllar
     path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/password_reset/', include('django_rest_passwordreset.urls', namespace='password_reset')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
+
+if settings.DEBUG:
+    # Dars videolari faqat api/media/ orqali (kursga yozilganlik tekshiruvi bilan) beriladi
+    urlpatterns += [
+        re_path(r'^%s(?!videos/)(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve,
+                {'document_root': settings.MEDIA_ROOT}),
+    ]